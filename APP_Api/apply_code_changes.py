@@ -1,11 +1,214 @@
 # filename: apply_full_overwrite_func.py
 from __future__ import annotations
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+from difflib import SequenceMatcher
+from functools import partial
 from pathlib import Path
-from datetime import datetime
 
+from backup_store import BackupStore
 
-def apply_code_overwrite(response_path: str | Path, repo_root: str | Path):
+# Patch mode: how far (in lines) a hunk may drift from its stated position,
+# and how similar (0..1) the "remove" lines must be when they don't match exactly.
+DEFAULT_WINDOW = 40
+FUZZ_THRESHOLD = 0.85
+
+# What to do when a file changed after its content went into the prompt:
+# refuse = skip the file, flag = apply but report it, force = don't check.
+CONFLICT_POLICIES = ("refuse", "flag", "force")
+
+# Context modes whose prompt sections were excerpts (numbered slices), not
+# whole files: the model never saw the full file, so its "code" can't replace it.
+PARTIAL_CONTEXT_MODES = ("slice", "log")
+
+# Mode a plain open() would give a new file: 0o666 minus the process umask.
+# os.umask() can only be read by setting it, so it is done once, at import,
+# rather than per file while other threads may be creating files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def normalized_hash(data: bytes) -> str:
+    """
+    sha256 of the content with line endings unified, trailing whitespace and
+    trailing blank lines dropped — formatting noise doesn't count as a change.
+    """
+    text = data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    norm = "\n".join(line.rstrip() for line in text.split("\n")).strip("\n")
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def _load_prompt_meta(response_path: Path) -> dict:
+    try:
+        return json.loads((response_path.parent / "prompt.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_source_hashes(response_path: Path) -> dict[str, str]:
+    """prompt.json → {"<relative_path>": normalized_hash} recorded when the prompt was built."""
+    return _load_prompt_meta(response_path).get("source_hashes") or {}
+
+
+def load_context_mode(response_path: Path) -> str | None:
+    """prompt.json → how the code context was collected ("file", "slice", "log")."""
+    return _load_prompt_meta(response_path).get("context_mode")
+
+
+def _conflict(rel_path: str, current: bytes | None, source_hashes: dict, on_conflict: str) -> bool:
+    """True if rel_path no longer matches the content the model was shown."""
+    expected = source_hashes.get(rel_path)
+    if on_conflict == "force" or expected is None:
+        return False
+    return current is None or normalized_hash(current) != expected
+
+
+def _backup_target(response_path: Path, backups: BackupStore | None) -> tuple[BackupStore, str]:
+    """
+    Backups go to a content-addressed store outside the source tree, one
+    manifest per analysis session (default: <reports dir>/.backups).
+    """
+    if backups is None:
+        backups = BackupStore(response_path.resolve().parent.parent / ".backups")
+    return backups, response_path.resolve().parent.name
+
+
+def _backup(backups: BackupStore, session: str, repo_root: Path, dest_paths: list[Path]) -> None:
+    """Stores the current content of dest_paths under the session's manifest."""
+    if not dest_paths:
+        return
+    backups.backup(session, repo_root, dest_paths)
+    names = ", ".join(p.name for p in dest_paths)
+    print(f"🗂️  Backup stored: {names} → {backups.root} [{session}]")
+
+
+class ApplyTransaction:
+    """
+    Batched, all-or-nothing multi-file write.
+
+        with ApplyTransaction() as tx:
+            tx.stage(path_a, new_bytes_a)
+            tx.stage(path_b, new_bytes_b)
+        # → commit() on success, discard() on exception
+
+    - stage(): writes the new content to a hidden temp file in the target's
+      directory (same filesystem → rename is atomic) and fsyncs it; the current
+      content is copied to a private staging dir as the rollback source
+    - commit(): os.replace()s every staged file in one tight loop, so the dev
+      server's watcher sees a single burst instead of a half-patched tree;
+      if any rename fails, the files already replaced are restored from the
+      staged originals (atomically, the same way) and files that did not
+      exist before are removed
+    - The staged originals only live as long as the with-block: there is no
+      rollback after it exits. Undoing a finished apply goes through the
+      BackupStore (--restore <session>).
+    """
+
+    def __init__(self):
+        self._staged: list[tuple[Path, Path, Path | None]] = []  # (dest, tmp, orig)
+        self._orig_dir: Path | None = None
+        self.committed: list[Path] = []
+
+    def _stage_bytes(self, dest: Path, data: bytes) -> Path:
+        fd, tmp = tempfile.mkstemp(prefix=f".{dest.name}.", suffix=".tmp", dir=dest.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if dest.exists():
+                shutil.copymode(dest, tmp)
+            else:
+                os.chmod(tmp, _NEW_FILE_MODE)  # mkstemp creates 0600
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return Path(tmp)
+
+    def stage(self, dest_path: str | Path, data: bytes) -> None:
+        dest = Path(dest_path)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        orig = None
+        if dest.exists():
+            if self._orig_dir is None:
+                self._orig_dir = Path(tempfile.mkdtemp(prefix="apply_tx_"))
+            orig = self._orig_dir / f"{len(self._staged)}_{dest.name}"
+            shutil.copy2(dest, orig)
+        self._staged.append((dest, self._stage_bytes(dest, data), orig))
+
+    def commit(self) -> list[Path]:
+        try:
+            for dest, tmp, _ in self._staged:
+                os.replace(tmp, dest)
+                self.committed.append(dest)
+        except BaseException:
+            self._rollback()
+            raise
+        finally:
+            self._discard_tmp()
+        _fsync_dirs(self.committed)
+        return list(self.committed)
+
+    def _rollback(self) -> None:
+        origs = {dest: orig for dest, _, orig in self._staged}
+        for dest in reversed(self.committed):
+            orig = origs.get(dest)
+            if orig is None:
+                dest.unlink(missing_ok=True)
+            else:
+                os.replace(self._stage_bytes(dest, orig.read_bytes()), dest)
+        _fsync_dirs(self.committed)
+        self.committed = []
+
+    def _discard_tmp(self) -> None:
+        for _, tmp, _ in self._staged:
+            if tmp.exists():
+                tmp.unlink()
+
+    def discard(self) -> None:
+        """Drops staged temp files and originals without touching the targets."""
+        self._discard_tmp()
+        if self._orig_dir is not None:
+            shutil.rmtree(self._orig_dir, ignore_errors=True)
+            self._orig_dir = None
+        self._staged = []
+
+    def __enter__(self) -> "ApplyTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.discard()
+
+
+def _fsync_dirs(paths) -> None:
+    """Makes the renames durable (POSIX); silently skipped where unsupported."""
+    for d in {p.parent for p in paths}:
+        try:
+            fd = os.open(d, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def apply_code_overwrite(
+    response_path: str | Path,
+    repo_root: str | Path,
+    backups: BackupStore | None = None,
+    on_conflict: str = "refuse",
+) -> dict:
     """
     Reads a response.json file containing:
     {
@@ -16,14 +219,37 @@ def apply_code_overwrite(response_path: str | Path, repo_root: str | Path):
       }
     }
 
-    and overwrites each target file with the new code,
-    while creating a timestamped .bak backup if the file already exists.
+    and overwrites each target file with the new code, after storing the
+    previous content in the backup store (BackupStore; restore by session).
+    All files are written together through an ApplyTransaction: either every
+    file gets its new content or (on error) none of them changes.
+
+    - Files whose new code equals the current content (normalized_hash) are
+      not written at all, so the dev server doesn't rebuild for nothing
+    - If prompt.json next to response.json has "source_hashes" and a file has
+      changed since the prompt was built, on_conflict decides: "refuse" (skip
+      the file), "flag" (write it and report) or "force" (don't check)
+    - Sessions whose context was collected as slices (prompt.json
+      "context_mode" in PARTIAL_CONTEXT_MODES) are refused with ValueError:
+      the "code" there is rebuilt from excerpts, not the whole file
+
+    Returns {"updated_files", "unchanged", "conflicts": [{"path", "action"}]}
     """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
     response_path = Path(response_path)
-    repo_root = Path(repo_root)
+    repo_root = Path(repo_root).resolve()
 
     if not response_path.exists():
         raise FileNotFoundError(f"Response file not found: {response_path}")
+    context_mode = load_context_mode(response_path)
+    if context_mode in PARTIAL_CONTEXT_MODES:
+        raise ValueError(
+            f"Session {response_path.parent.name} was collected in {context_mode!r} mode; "
+            "its code is not a full file. Apply it in diff mode (without --overwrite)."
+        )
+    backups, session = _backup_target(response_path, backups)
+    source_hashes = load_source_hashes(response_path)
 
     data = json.loads(response_path.read_text(encoding="utf-8"))
     code_change = data.get("code_change") or {}
@@ -31,35 +257,280 @@ def apply_code_overwrite(response_path: str | Path, repo_root: str | Path):
     if not isinstance(code_change, dict) or not code_change:
         raise ValueError("No valid 'code_change' found in JSON.")
 
-    updated_files = []
-    for rel_path, payload in code_change.items():
-        if not isinstance(payload, dict):
-            print(f"⚠️  Skipping invalid entry for {rel_path}")
+    updated_files, unchanged, conflicts = [], [], []
+    with ApplyTransaction() as tx:
+        for rel_path, payload in code_change.items():
+            if not isinstance(payload, dict):
+                print(f"⚠️  Skipping invalid entry for {rel_path}")
+                continue
+
+            code = payload.get("code")
+            # Only-CHANGES entries carry code="" — never blank out a file
+            if not isinstance(code, str) or not code.strip():
+                print(f"⚠️  Missing or invalid 'code' for {rel_path}")
+                continue
+
+            dest_path = (repo_root / rel_path).resolve()
+            if not dest_path.is_relative_to(repo_root):
+                print(f"⚠️  Skipping path outside repo root: {rel_path}")
+                continue
+
+            if not code.endswith("\n"):
+                code += "\n"
+            new = code.encode("utf-8")
+            current = dest_path.read_bytes() if dest_path.exists() else None
+
+            # No-op: same content → no write, no hot reload
+            if current is not None and normalized_hash(current) == normalized_hash(new):
+                unchanged.append(str(dest_path))
+                print(f"⏭️  Unchanged, skipped: {dest_path}")
+                continue
+
+            if _conflict(rel_path, current, source_hashes, on_conflict):
+                action = "refused" if on_conflict == "refuse" else "applied"
+                conflicts.append({"path": str(dest_path), "action": action})
+                print(f"⛔ Changed since the prompt was built ({action}): {dest_path}")
+                if on_conflict == "refuse":
+                    continue
+
+            # Stage new code (written to disk on commit)
+            tx.stage(dest_path, new)
+            updated_files.append(str(dest_path))
+
+        # Back up the whole batch once every file staged cleanly, right before
+        # the commit (a missing file is recorded as "created")
+        _backup(backups, session, repo_root, [Path(p) for p in updated_files])
+
+    for path in updated_files:
+        print(f"✅ Updated file: {path}")
+    print(
+        f"\n✨ Done. Total updated files: {len(updated_files)}"
+        f" (unchanged: {len(unchanged)}, conflicts: {len(conflicts)})"
+    )
+    return {"updated_files": updated_files, "unchanged": unchanged, "conflicts": conflicts}
+
+
+# ---------- Patch mode ----------
+def _norm(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _locate(lines: list[bytes], remove: list[str], expected: int, window: int, encoding: str):
+    """
+    Finds where the "remove" block sits, starting at the stated (0-based) line and
+    searching outwards up to ±window lines. Exact matches (ignoring whitespace)
+    win over fuzzy ones; among equals the smallest offset wins.
+    Returns (start, score) or (None, best_score).
+    """
+    k = len(remove)
+    want = [_norm(x) for x in remove]
+    n = len(lines)
+    best, best_score = None, 0.0
+    cache: dict[int, str] = {}
+
+    def text(i: int) -> str:
+        if i not in cache:
+            cache[i] = _norm(lines[i].decode(encoding, errors="replace"))
+        return cache[i]
+
+    for delta in range(window + 1):
+        for start in ((expected,) if delta == 0 else (expected - delta, expected + delta)):
+            if start < 0 or start + k > n:
+                continue
+            got = [text(start + j) for j in range(k)]
+            if got == want:
+                return start, 1.0
+            score = sum(SequenceMatcher(None, a, b).ratio() for a, b in zip(got, want)) / k
+            if score > best_score:
+                best, best_score = start, score
+    if best is not None and best_score >= FUZZ_THRESHOLD:
+        return best, best_score
+    return None, best_score
+
+
+def apply_code_changes(
+    response_json_path: str | Path,
+    repo_root: str | Path,
+    dry_run: bool = False,
+    window: int = 0,
+    atomic: bool = True,
+    backups: BackupStore | None = None,
+    on_conflict: str = "refuse",
+) -> dict:
+    """
+    Applies the per-line hunks in response.json:
+    {
+      "code_change": {
+        "<relative_path>": {
+          "changes": {
+            "<0-based line>": {"remove": [...], "add": [...]}
+          }
+        }
+      }
+    }
+
+    - Each hunk's "remove" lines are located near the stated line (±window,
+      0 = DEFAULT_WINDOW) with whitespace-insensitive, then fuzzy matching
+    - "add"-only hunks are inserted at the stated line, shifted by the drift
+      of the closest hunk above that was matched
+    - Previous contents go to the backup store (see apply_code_overwrite)
+    - The file's line endings are kept, everything outside the hunks is untouched
+    - atomic=True: all patched files are committed together through an
+      ApplyTransaction (temp file + fsync + rename), so every patched file is
+      rewritten in full; atomic=False (--in-place) rewrites only the bytes from
+      the first changed line onwards, but a crash mid-apply can leave some
+      files patched and others not (backups are still taken first)
+    - Hunks that cannot be located (or overlap an earlier one) are skipped
+      and reported; dry_run=True only reports
+    - Files that end up identical (normalized_hash) are not written; files that
+      changed since the prompt was built follow on_conflict (see
+      apply_code_overwrite)
+
+    Returns {"dry_run", "applied", "failed", "files": {path: {...}}}
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+    response_json_path = Path(response_json_path)
+    repo_root = Path(repo_root).resolve()
+    window = window if window > 0 else DEFAULT_WINDOW
+
+    if not response_json_path.exists():
+        raise FileNotFoundError(f"Response file not found: {response_json_path}")
+    backup = partial(_backup, *_backup_target(response_json_path, backups), repo_root)
+    source_hashes = load_source_hashes(response_json_path)
+
+    data = json.loads(response_json_path.read_text(encoding="utf-8"))
+    code_change = data.get("code_change") or {}
+    if not isinstance(code_change, dict) or not code_change:
+        raise ValueError("No valid 'code_change' found in JSON.")
+
+    report = {"dry_run": dry_run, "applied": 0, "failed": 0, "files": {}}
+    with ApplyTransaction() as tx:
+        for rel_path, payload in code_change.items():
+            changes = payload.get("changes") if isinstance(payload, dict) else None
+            if not changes:
+                continue
+            file_report = _apply_file_hunks(
+                repo_root, rel_path, changes, dry_run, window, backup,
+                tx if atomic else None, source_hashes, on_conflict,
+            )
+            report["files"][rel_path] = file_report
+            report["applied"] += len(file_report["applied"])
+            report["failed"] += len(file_report["failed"])
+        if atomic:
+            # Staged files are backed up as one batch, right before the commit
+            backup([Path(f["path"]) for f in report["files"].values() if f["written"]])
+
+    verb = "Would apply" if dry_run else "Applied"
+    print(f"\n✨ Done. {verb} {report['applied']} hunk(s), {report['failed']} failed.")
+    return report
+
+
+def _apply_file_hunks(
+    repo_root: Path,
+    rel_path: str,
+    changes: dict,
+    dry_run: bool,
+    window: int,
+    backup,
+    tx: ApplyTransaction | None = None,
+    source_hashes: dict | None = None,
+    on_conflict: str = "refuse",
+) -> dict:
+    dest_path = (repo_root / rel_path).resolve()
+    file_report = {
+        "path": str(dest_path), "applied": [], "failed": [], "written": False,
+        "unchanged": False, "conflict": False,
+    }
+
+    def fail(line, reason: str):
+        file_report["failed"].append({"line": line, "reason": reason})
+        print(f"❌ {rel_path}:{line} → {reason}")
+
+    if not dest_path.is_relative_to(repo_root):
+        fail(None, "path escapes repo root")
+        return file_report
+    if not dest_path.exists():
+        fail(None, "file not found")
+        return file_report
+
+    raw = dest_path.read_bytes()
+    if _conflict(rel_path, raw, source_hashes or {}, on_conflict):
+        file_report["conflict"] = True
+        if on_conflict == "refuse":
+            fail(None, "file changed since the prompt was built")
+            return file_report
+        print(f"⛔ {rel_path} changed since the prompt was built (applying anyway)")
+    encoding = "utf-8"
+    lines = raw.splitlines(keepends=True)
+    newline = b"\r\n" if b"\r\n" in raw else b"\n"
+
+    hunks = []
+    for key, chg in changes.items():
+        try:
+            line = int(key)
+        except (TypeError, ValueError):
+            fail(key, "invalid line number")
             continue
+        hunks.append((line, chg.get("remove") or [], chg.get("add") or []))
+    hunks.sort(key=lambda h: h[0])
 
-        code = payload.get("code")
-        if not isinstance(code, str):
-            print(f"⚠️  Missing or invalid 'code' for {rel_path}")
+    # Resolve every hunk against the original file (top → bottom)
+    resolved = []  # (start, end, add, line, offset, score)
+    drift = 0
+    taken_until = 0
+    for line, remove, add in hunks:
+        if remove:
+            start, score = _locate(lines, remove, line + drift, window, encoding)
+            if start is None and drift:
+                start, score = _locate(lines, remove, line, window, encoding)
+            if start is None:
+                fail(line, f"remove lines not found within ±{window} (best {score:.2f})")
+                continue
+            drift = start - line
+        else:
+            start, score = min(max(line + drift, 0), len(lines)), None
+        end = start + len(remove)
+        if start < taken_until:
+            fail(line, "overlaps a previous hunk")
             continue
+        taken_until = end
+        resolved.append((start, end, add, line, start - line, score))
 
-        dest_path = (repo_root / rel_path).resolve()
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+    if not resolved:
+        return file_report
 
-        # Backup existing file
-        if dest_path.exists():
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = dest_path.with_suffix(dest_path.suffix + f".bak.{ts}")
-            backup_path.write_text(
-                dest_path.read_text(encoding="utf-8", errors="ignore"), encoding="utf-8"
-            )
-            print(f"🗂️  Backup created: {backup_path}")
+    # Splice bottom → top so earlier indices stay valid
+    first = resolved[0][0]
+    if lines and not lines[-1].endswith((b"\n", b"\r")) and resolved[-1][1] == len(lines):
+        lines[-1] += newline  # a hunk touches the unterminated last line
+    for start, end, add, line, offset, score in reversed(resolved):
+        lines[start:end] = [a.encode(encoding) + newline for a in add]
+        file_report["applied"].append(
+            {"line": line, "at": start, "offset": offset,
+             "fuzzy": score is not None and score < 1.0,
+             "removed": end - start, "added": len(add)}
+        )
+    file_report["applied"].reverse()
+    for h in file_report["applied"]:
+        print(f"✅ {rel_path}:{h['line']} → @{h['at']}" + (f" (offset {h['offset']:+d})" if h["offset"] else ""))
 
-        # Write new code
-        if not code.endswith("\n"):
-            code += "\n"
-        dest_path.write_text(code, encoding="utf-8")
-        updated_files.append(str(dest_path))
-        print(f"✅ Updated file: {dest_path}")
+    if normalized_hash(b"".join(lines)) == normalized_hash(raw):
+        file_report["unchanged"] = True
+        print(f"⏭️  {rel_path}: hunks leave the file unchanged, skipped")
+        return file_report
+    if dry_run:
+        return file_report
 
-    print(f"\n✨ Done. Total updated files: {len(updated_files)}")
-    return updated_files
+    file_report["written"] = True
+    if tx is not None:
+        tx.stage(dest_path, b"".join(lines))  # the caller backs up the batch
+        return file_report
+    backup([dest_path])
+    prefix_len = sum(len(x) for x in lines[:first])
+    tail = b"".join(lines[first:])
+    with open(dest_path, "r+b") as f:
+        f.seek(prefix_len)
+        f.write(tail)
+        f.truncate()
+    return file_report
@@ -0,0 +1,373 @@
+# filename: async_api.py
+from __future__ import annotations
+import asyncio
+import json
+from typing import AsyncIterator, Callable
+from urllib.parse import urlsplit
+
+from python_api import (
+    _PREFIX_CONTEXTS,
+    PRIME_PROMPT,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CircuitBreaker,
+    HTTPStatusError,
+    RetryBudget,
+    StreamAccumulator,
+    _build_payload,
+    _parse_generate_body,
+    _prefix_key,
+    classify_exception,
+    failed_result,
+    failure_info,
+    generate_metrics,
+    get_circuit_breaker,
+    get_port_forward,
+)
+
+# ---------- Ayarlar ----------
+MAX_CONCURRENCY = 4  # aynı anda uçuşta olan model isteği
+_MAX_LINE = 65536
+
+
+class AsyncOllamaClient:
+    """
+    Ollama /api/generate için asyncio istemcisi (HTTP/1.1 keep-alive).
+
+    - Aynı anda en fazla max_concurrency istek gönderilir (asyncio.Semaphore)
+    - Gövdesi tamamen okunmuş bağlantılar boşta tutulup yeniden kullanılır
+    - SSH üzerinden kullanım için `over_ssh` yerel bir port yönlendirmesi açar
+      (python_api.LocalPortForward); asyncio akışları bu porta bağlanır
+
+    send_prompt sonucu senkron python_api.send_prompt ile aynı biçimdedir;
+    send_prompt_with_retry aynı RetryBudget mantığını (deneme, süre bütçesi,
+    devre kesici) asyncio.sleep ile uygular. Sadece HTTP taşır (curl yok).
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 11434,
+        path: str = "/api/generate",
+        max_concurrency: int = MAX_CONCURRENCY,
+        breaker: CircuitBreaker | None = None,
+        api_url: str | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.path = path
+        # api_url: önek önbelleği/devre kesici anahtarı (SSH'de uzak URL)
+        self.api_url = api_url or f"http://{host}:{port}{path}"
+        self.breaker = breaker or CircuitBreaker()
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    @classmethod
+    def over_ssh(
+        cls,
+        ssh,
+        api_url: str = "http://127.0.0.1:11434/api/generate",
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> "AsyncOllamaClient":
+        """
+        ssh: paramiko.SSHClient ya da python_api.SSHConnectionManager.
+        Devre kesici senkron yolla paylaşılır (python_api.get_circuit_breaker).
+        """
+        parts = urlsplit(api_url)
+        fwd = get_port_forward(ssh, parts.hostname or "127.0.0.1", parts.port or 80)
+        return cls(
+            fwd.local_host,
+            fwd.local_port,
+            parts.path or "/",
+            max_concurrency,
+            breaker=get_circuit_breaker(ssh, api_url),
+            api_url=api_url,
+        )
+
+    # ---------- Bağlantı ----------
+    async def _connect(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=_MAX_LINE)
+        return reader, writer, False
+
+    async def _request(self, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("ascii")
+        for attempt in (0, 1):
+            reader, writer, reused = await self._connect()
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                status, headers = await _read_head(reader)
+                return reader, writer, status, headers
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                if attempt or not reused:
+                    raise
+                # boşta beklerken kapanmış keep-alive bağlantısı → yenisiyle dene
+            except BaseException:
+                # wait_for zaman aşımı / iptal: yarım kalan bağlantı havuza dönemez
+                writer.close()
+                raise
+
+    def _release(self, reader, writer, headers: dict, finished: bool) -> None:
+        if finished and headers.get("connection", "").lower() != "close":
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    # ---------- İstekler ----------
+    async def post_json(self, payload: dict, timeout: float | None = None):
+        """payload'ı POST eder. Dönen: (status:int, body:bytes)"""
+        async with self._sem:
+            return await asyncio.wait_for(self._post_json(payload), timeout)
+
+    async def _post_json(self, payload: dict):
+        reader, writer, status, headers = await self._request(payload)
+        finished = False
+        try:
+            data = b"".join([part async for part in _iter_body(reader, headers)])
+            finished = "content-length" in headers or _is_chunked(headers)
+            return status, data
+        finally:
+            self._release(reader, writer, headers, finished)
+
+    async def post_stream(
+        self, payload: dict, timeout: float | None = None
+    ) -> AsyncIterator[dict]:
+        """
+        NDJSON yanıtını satır satır (dict olarak) verir. timeout her okuma
+        için uygulanır. Üreteç erken kapatılırsa bağlantı kapatılır.
+        """
+        async with self._sem:
+            reader, writer, status, headers = await asyncio.wait_for(
+                self._request(payload), timeout
+            )
+            finished = False
+            try:
+                if status != 200:
+                    data = b"".join([part async for part in _iter_body(reader, headers)])
+                    finished = True
+                    raise HTTPStatusError(status, data.decode("utf-8", errors="ignore"))
+                buf = b""
+                body = _iter_body(reader, headers)
+                while True:
+                    try:
+                        part = await asyncio.wait_for(body.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    buf += part
+                    *lines, buf = buf.split(b"\n")
+                    for line in lines:
+                        if line.strip():
+                            yield json.loads(line)
+                if buf.strip():
+                    yield json.loads(buf)
+                finished = True
+            finally:
+                self._release(reader, writer, headers, finished)
+
+    async def send_prompt(
+        self,
+        prompt: str,
+        model: str = "llama3.1:8b",
+        options: dict | None = None,
+        timeout: int = 600,
+        system: str | None = None,
+        stream: bool = False,
+        on_token: Callable[[str], None] | None = None,
+        stop_when: Callable[[str], bool] | None = None,
+        context: list[int] | None = None,
+        prefix_reuse: str = "system",
+        deadline_at: float | None = None,
+    ) -> dict:
+        """
+        python_api.send_prompt'un async karşılığı (aynı dönüş biçimi).
+        prefix_reuse="context": önek self.prefix_context ile bir kez hazırlanır
+        context: önceden hazırlanmış önek token dizisi (verilirse priming yapılmaz)
+        deadline_at: time.monotonic() cinsinden mutlak bitiş; akış o anda kesilir
+        Dönen: {"ok", "text", "raw", "stderr", "failure", "metrics"[, "stream"], "prefix"}
+        """
+        if context is None and prefix_reuse == "context" and system:
+            context = await self.prefix_context(model, system, options, timeout)
+        res = await self._send(
+            prompt, model, options, timeout, system, stream, on_token, stop_when,
+            context, deadline_at,
+        )
+        res["prefix"] = {"mode": "context" if context else "system",
+                         "context_tokens": len(context) if context else 0}
+        return res
+
+    async def _send(
+        self, prompt, model, options, timeout, system, stream, on_token, stop_when,
+        context, deadline_at,
+    ) -> dict:
+        payload = _build_payload(prompt, model, options, system, stream=stream, context=context)
+        if stream:
+            acc = StreamAccumulator(on_token, stop_when, deadline_at)
+            chunks = self.post_stream(payload, timeout=timeout)
+            try:
+                async for chunk in chunks:
+                    if acc.feed(chunk):
+                        break
+            except Exception as e:
+                acc.fail(e)
+            finally:
+                await chunks.aclose()
+            return acc.result()
+
+        err, failure = "", None
+        try:
+            status, body = await self.post_json(payload, timeout=timeout)
+            out = body.decode("utf-8", errors="ignore")
+            if status != 200:
+                err, failure = f"HTTP {status}", failure_info("http", status=status)
+        except Exception as e:
+            out, err, failure = "", f"{type(e).__name__}: {e}", classify_exception(e)
+        text, obj = _parse_generate_body(out)
+        if obj.get("error"):
+            err = err or str(obj["error"])
+            failure = failure or failure_info("error")
+        return {
+            "ok": bool(text),
+            "text": text.strip(),
+            "raw": out,
+            "stderr": err,
+            "failure": None if text else failure,
+            "metrics": generate_metrics(obj),
+        }
+
+    async def send_prompt_with_retry(
+        self,
+        prompt: str,
+        timeout: int = 600,
+        attempts: int = RETRY_ATTEMPTS,
+        deadline: float | None = None,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        **kwargs,
+    ) -> dict:
+        """
+        python_api.send_prompt_with_retry'nin async karşılığı (aynı RetryBudget:
+        deneme sayısı, toplam süre bütçesi, self.breaker). Başarıda sonuç
+        ("retry" eklenmiş), aksi halde ModelCallError. kwargs → send_prompt.
+        """
+        budget = RetryBudget(
+            self.breaker, self.api_url, timeout, attempts, deadline, base_delay, max_delay
+        )
+        while True:
+            attempt_timeout = budget.next_attempt()
+            try:
+                res = await self.send_prompt(
+                    prompt, timeout=attempt_timeout, deadline_at=budget.deadline_at, **kwargs
+                )
+            except OSError as e:  # port yönlendirmesi açılamadı vb.
+                res = failed_result(e)
+            delay = budget.outcome(res)
+            if delay is None:
+                return res
+            await asyncio.sleep(delay)
+
+    async def prefix_context(
+        self, model: str, system: str, options: dict | None = None, timeout: int = 600
+    ) -> list[int] | None:
+        """
+        python_api.prefix_context'in async karşılığı; önbellek senkron yolla
+        paylaşılır (anahtar self.api_url). context dönmezse None.
+        """
+        key = _prefix_key(self.api_url, model, system, options)
+        ctx = _PREFIX_CONTEXTS.get(key)
+        if ctx is None:
+            prime_opts = dict(options or {}, num_predict=1, temperature=0)
+            payload = _build_payload(PRIME_PROMPT, model, prime_opts, system, stream=False)
+            try:
+                status, body = await self.post_json(payload, timeout=timeout)
+            except Exception:
+                return None
+            if status != 200:
+                return None
+            _, obj = _parse_generate_body(body.decode("utf-8", errors="ignore"))
+            ctx = obj.get("context") or None
+            if ctx:
+                _PREFIX_CONTEXTS[key] = ctx
+                m = generate_metrics(obj) or {}
+                print(
+                    f"[*] Prefix primed: {len(ctx)} tokens "
+                    f"(prefill {m.get('prompt_eval_ms')} ms, bir kez)"
+                )
+        return ctx
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+async def send_prompt(client: AsyncOllamaClient, prompt: str, **kwargs) -> dict:
+    """Modül seviyesinde kısayol: `await send_prompt(client, prompt, model=...)`."""
+    return await client.send_prompt(prompt, **kwargs)
+
+
+# ---------- HTTP/1.1 ayrıştırma ----------
+async def _read_head(reader: asyncio.StreamReader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Sunucu bağlantıyı kapattı")
+    parts = status_line.decode("latin-1").split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ValueError(f"Geçersiz HTTP yanıtı: {status_line[:80]!r}")
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+def _is_chunked(headers: dict) -> bool:
+    return "chunked" in headers.get("transfer-encoding", "").lower()
+
+
+async def _iter_body(reader: asyncio.StreamReader, headers: dict) -> AsyncIterator[bytes]:
+    if _is_chunked(headers):
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailer
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)  # CRLF
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            part = await reader.read(min(remaining, _MAX_LINE))
+            if not part:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(part)
+            yield part
+    else:
+        while True:
+            part = await reader.read(_MAX_LINE)
+            if not part:
+                return
+            yield part
@@ -0,0 +1,201 @@
+# filename: backup_store.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# ---------- Ayarlar ----------
+MANIFEST_VERSION = 1
+COMPRESS_LEVEL = 6
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class BackupStore:
+    """
+    Kaynak ağacının dışında, içerik adresli yedek deposu (.bak dosyaları yerine).
+
+        <root>/blobs/<h[:2]>/<sha256>.z     zlib ile sıkıştırılmış dosya içeriği
+        <root>/manifests/<session>.json     {"version", "session", "created",
+                                             "repo_root", "files": {rel: {...}}}
+
+    - Aynı içerik tek kez saklanır (aynı dosya her apply'da tekrar yazılmaz)
+    - Manifest, bir analiz oturumunda değiştirilen dosyaların apply öncesi
+      hallerini tutar: {"hash", "size", "mode"} ya da dosya yoktuysa {"hash": None}
+    - restore(): oturumun tamamını ya da tek dosyayı geri yükler
+    - prune(): yaş/adet sınırını aşan manifestleri ve artık kullanılmayan
+      blob'ları siler
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.manifest_dir = self.root / "manifests"
+
+    # ---------- Blob ----------
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.z"
+
+    def put_blob(self, data: bytes) -> str:
+        digest = content_hash(data)
+        path = self._blob_path(digest)
+        if not path.exists():
+            _write_atomic(path, zlib.compress(data, COMPRESS_LEVEL))
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        data = zlib.decompress(self._blob_path(digest).read_bytes())
+        if content_hash(data) != digest:
+            raise ValueError(f"Bozuk yedek blob: {digest}")
+        return data
+
+    # ---------- Manifest ----------
+    def _manifest_path(self, session: str) -> Path:
+        return self.manifest_dir / f"{session}.json"
+
+    def load_manifest(self, session: str) -> Optional[dict]:
+        try:
+            data = json.loads(self._manifest_path(session).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return data if data.get("version") == MANIFEST_VERSION else None
+
+    def _save_manifest(self, manifest: dict) -> None:
+        _write_atomic(
+            self._manifest_path(manifest["session"]),
+            json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"),
+        )
+
+    def sessions(self) -> List[dict]:
+        """Tüm manifestler, eskiden yeniye."""
+        out = []
+        for p in self.manifest_dir.glob("*.json"):
+            m = self.load_manifest(p.stem)
+            if m is not None:
+                out.append(m)
+        return sorted(out, key=lambda m: (m["created"], m["session"]))
+
+    # ---------- Yedekleme ----------
+    def backup(self, session: str, repo_root: Path, paths: Iterable[Path]) -> dict:
+        """
+        paths'in şu anki hallerini oturum manifestine ekler. Oturumda zaten
+        kayıtlı bir dosya tekrar yedeklenmez (ilk, yani apply öncesi hal korunur).
+        """
+        repo_root = Path(repo_root).resolve()
+        manifest = self.load_manifest(session) or {
+            "version": MANIFEST_VERSION,
+            "session": session,
+            "created": time.time(),
+            "repo_root": str(repo_root),
+            "files": {},
+        }
+        for path in paths:
+            path = Path(path).resolve()
+            rel = path.relative_to(repo_root).as_posix()
+            if rel in manifest["files"]:
+                continue
+            if path.exists():
+                data = path.read_bytes()
+                manifest["files"][rel] = {
+                    "hash": self.put_blob(data),
+                    "size": len(data),
+                    "mode": path.stat().st_mode & 0o7777,
+                }
+            else:
+                manifest["files"][rel] = {"hash": None}
+        self._save_manifest(manifest)
+        return manifest
+
+    # ---------- Geri yükleme ----------
+    def restore(
+        self,
+        session: str,
+        files: Optional[Iterable[str]] = None,
+        repo_root: Optional[Path] = None,
+    ) -> List[str]:
+        """
+        Oturumdaki dosyaları (ya da sadece `files`) apply öncesi haline döndürür;
+        hepsi tek bir ApplyTransaction ile yazılır. Dönen: geri yüklenen yollar.
+        """
+        # apply_code_changes bu modülü kullanır; döngüsel import olmasın diye burada
+        from apply_code_changes import ApplyTransaction
+
+        manifest = self.load_manifest(session)
+        if manifest is None:
+            raise FileNotFoundError(f"Yedek oturumu bulunamadı: {session}")
+        root = Path(repo_root or manifest["repo_root"])
+        wanted = set(files) if files is not None else None
+        entries = {
+            rel: e for rel, e in manifest["files"].items() if wanted is None or rel in wanted
+        }
+        with ApplyTransaction() as tx:
+            for rel, entry in entries.items():
+                if entry["hash"] is not None:
+                    tx.stage(root / rel, self.get_blob(entry["hash"]))
+        restored: List[str] = []
+        for rel, entry in entries.items():
+            dest = root / rel
+            if entry["hash"] is None:
+                # Apply ile oluşturulmuş dosya: geri almak = silmek
+                if not dest.exists():
+                    continue
+                dest.unlink()
+            elif entry.get("mode"):
+                os.chmod(dest, entry["mode"])
+            restored.append(str(dest))
+        return restored
+
+    def restore_file(self, rel_path: str, session: Optional[str] = None) -> List[str]:
+        """Tek dosyayı verilen (ya da onu içeren en son) oturumdan geri yükler."""
+        if session is None:
+            for m in reversed(self.sessions()):
+                if rel_path in m["files"]:
+                    session = m["session"]
+                    break
+            else:
+                raise FileNotFoundError(f"Yedekte bulunamadı: {rel_path}")
+        return self.restore(session, files=[rel_path])
+
+    # ---------- Budama ----------
+    def prune(self, keep: Optional[int] = None, max_age_days: Optional[float] = None) -> Dict[str, int]:
+        """
+        En yeni `keep` oturum dışındakileri ve `max_age_days`'ten eski olanları
+        siler; sonra hiçbir manifestin göstermediği blob'ları temizler.
+        """
+        sessions = self.sessions()
+        now = time.time()
+        drop = set()
+        if keep is not None and len(sessions) > keep:
+            drop.update(m["session"] for m in sessions[: len(sessions) - keep])
+        if max_age_days is not None:
+            limit = now - max_age_days * 86400
+            drop.update(m["session"] for m in sessions if m["created"] < limit)
+        for session in drop:
+            self._manifest_path(session).unlink(missing_ok=True)
+
+        live = {
+            e["hash"]
+            for m in sessions
+            if m["session"] not in drop
+            for e in m["files"].values()
+            if e.get("hash")
+        }
+        blobs = 0
+        for p in self.blob_dir.glob("*/*.z"):
+            if p.stem not in live:
+                p.unlink(missing_ok=True)
+                blobs += 1
+        return {"sessions": len(drop), "blobs": blobs}
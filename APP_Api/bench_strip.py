@@ -0,0 +1,163 @@
+# filename: bench_strip.py
+"""
+strip_js_like_comments_and_tighten için benchmark: eski karakter-karakter
+Python döngüsü ile regex tokenizer motorunu karşılaştırır ve çıktıların
+birebir aynı olduğunu doğrular.
+
+    python APP_Api/bench_strip.py                      # myapp build bundle'ları
+    python APP_Api/bench_strip.py path/a.js path/b.js --repeat 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+APP_API_DIR = Path(__file__).resolve().parent
+REPO_ROOT = APP_API_DIR.parent
+if str(APP_API_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_API_DIR))
+
+from find_func import read_text_safely, strip_js_like_comments_and_tighten
+
+
+# ---------- Referans (eski) uygulama ----------
+def legacy_strip_js_like_comments_and_tighten(text: str) -> str:
+    """Eski per-karakter döngü; sadece karşılaştırma için."""
+    n = len(text)
+    i = 0
+    out: List[str] = []
+    in_sl_comment = in_ml_comment = in_s = in_d = in_bt = escape = False
+
+    while i < n:
+        ch = text[i]
+        nxt = text[i + 1] if i + 1 < n else ""
+
+        if in_sl_comment:
+            if ch == "\n":
+                in_sl_comment = False
+                out.append(ch)
+            i += 1
+            continue
+        if in_ml_comment:
+            if ch == "*" and nxt == "/":
+                in_ml_comment = False
+                i += 2
+            else:
+                i += 1
+            continue
+        if in_s:
+            out.append(ch)
+            if not escape and ch == "'":
+                in_s = False
+            escape = ch == "\\" and not escape
+            i += 1
+            continue
+        if in_d:
+            out.append(ch)
+            if not escape and ch == '"':
+                in_d = False
+            escape = ch == "\\" and not escape
+            i += 1
+            continue
+        if in_bt:
+            out.append(ch)
+            if not escape and ch == "`":
+                in_bt = False
+            escape = ch == "\\" and not escape
+            i += 1
+            continue
+
+        if ch == "/" and nxt:
+            if nxt == "/":
+                in_sl_comment = True
+                i += 2
+                continue
+            if nxt == "*":
+                in_ml_comment = True
+                i += 2
+                continue
+
+        if ch == "'":
+            in_s = True
+            out.append(ch)
+            escape = False
+            i += 1
+            continue
+        if ch == '"':
+            in_d = True
+            out.append(ch)
+            escape = False
+            i += 1
+            continue
+        if ch == "`":
+            in_bt = True
+            out.append(ch)
+            escape = False
+            i += 1
+            continue
+
+        out.append(ch)
+        i += 1
+
+    raw = "".join(out)
+    lines = [ln.rstrip() for ln in raw.splitlines()]
+    tightened = []
+    blank = False
+    for ln in lines:
+        if ln == "":
+            if not blank:
+                tightened.append("")
+                blank = True
+        else:
+            tightened.append(ln)
+            blank = False
+    return "\n".join(tightened).strip() + "\n"
+
+
+# ---------- Ölçüm ----------
+def _best_of(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Comment stripper benchmark")
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    paths = [Path(p) for p in args.paths] or sorted(
+        (REPO_ROOT / "TESTS_Main" / "myapp" / "build" / "static" / "js").glob("*.js")
+    )
+    if not paths:
+        raise SystemExit("❌ Ölçülecek dosya bulunamadı.")
+
+    total_old = total_new = 0.0
+    for p in paths:
+        text = read_text_safely(p)
+        if legacy_strip_js_like_comments_and_tighten(text) != (
+            strip_js_like_comments_and_tighten(text)
+        ):
+            raise SystemExit(f"❌ Çıktı farklı: {p}")
+        t_old = _best_of(legacy_strip_js_like_comments_and_tighten, text, args.repeat)
+        t_new = _best_of(strip_js_like_comments_and_tighten, text, args.repeat)
+        total_old += t_old
+        total_new += t_new
+        print(
+            f"{p.name:40s} {len(text):>10,d} chars  "
+            f"old {t_old * 1000:8.1f} ms  new {t_new * 1000:8.1f} ms  "
+            f"x{t_old / max(t_new, 1e-9):.1f}"
+        )
+    print(
+        f"{'TOPLAM':40s} {'':>16s}  old {total_old * 1000:8.1f} ms  "
+        f"new {total_new * 1000:8.1f} ms  x{total_old / max(total_new, 1e-9):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# filename: ctx_slice.py
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from find_func import mask_js_comments_and_strings
+
+# ---------- Ayarlar ----------
+CONTEXT_LINES = 3  # Fonksiyon dışındaki referanslar için ± satır
+MAX_BODY_LINES = 200  # Bundan uzun gövdeler yerine hit etrafı pencere alınır
+GAP_MARKER = "..."
+
+_CONTROL_WORDS = {"if", "for", "while", "switch", "catch", "with", "return"}
+_IDENT_RE = re.compile(r"[A-Za-z_$][\w$]*")
+_IMPORT_RE = re.compile(
+    r"^[ \t]*import\b(?P<body>[^'\"`;]*?)['\"][ ]*['\"][ \t]*;?", re.MULTILINE
+)
+_IMPORT_SKIP = {"import", "from", "as", "type", "typeof"}
+
+
+def _definition_patterns(target: str) -> List["re.Pattern[str]"]:
+    t = re.escape(target)
+    return [
+        re.compile(rf"\bfunction\s*\*?\s*(?P<name>{t})\s*\("),
+        re.compile(rf"\b(?:const|let|var)\s+(?P<name>{t})\s*="),
+        re.compile(rf"\bclass\s+(?P<name>{t})\b"),
+        re.compile(rf"(?<![\w$.])(?P<name>{t})\s*[:=]\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>|[\w$]+\s*=>)"),
+        re.compile(rf"^[ \t]*(?:async\s+)?(?P<name>{t})\s*\([^)]*\)\s*\{{", re.MULTILINE),
+    ]
+
+
+# ---------- Yapı ----------
+class _Source:
+    """Maskelenmiş metin üzerinde satır/parantez hesapları."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.masked = mask_js_comments_and_strings(text)
+        self.line_starts = [0] + [m.end() for m in re.finditer(r"\n", text)]
+        self.blocks: List[Tuple[int, int]] = []  # (open, close), open'a göre sıralı
+        stack: List[int] = []
+        for m in re.finditer(r"[{}]", self.masked):
+            if m.group() == "{":
+                stack.append(m.start())
+            elif stack:
+                self.blocks.append((stack.pop(), m.start()))
+        self.blocks.sort()
+        self.close_of: Dict[int, int] = dict(self.blocks)
+
+    def line_of(self, pos: int) -> int:
+        return bisect_right(self.line_starts, pos) - 1
+
+    def enclosing_blocks(self, pos: int) -> List[Tuple[int, int]]:
+        """pos'u içeren bloklar, dıştan içe."""
+        return [(o, c) for o, c in self.blocks if o < pos < c]
+
+    def is_function_block(self, open_pos: int) -> bool:
+        s = self.masked
+        j = open_pos - 1
+        while j >= 0 and s[j].isspace():
+            j -= 1
+        if j >= 1 and s[j - 1 : j + 1] == "=>":
+            return True
+        if j < 0 or s[j] != ")":
+            return False
+        depth = 0
+        while j >= 0:
+            if s[j] == ")":
+                depth += 1
+            elif s[j] == "(":
+                depth -= 1
+                if depth == 0:
+                    break
+            j -= 1
+        m = re.search(r"([\w$]+)\s*$", s[max(0, j - 64) : max(0, j)])
+        return not (m and m.group(1) in _CONTROL_WORDS)
+
+    def statement_start(self, pos: int) -> int:
+        """pos'un ait olduğu ifadenin başladığı satır."""
+        s = self.masked
+        depth = 0
+        i = pos - 1
+        while i >= 0:
+            c = s[i]
+            if c in ")]":
+                depth += 1
+            elif c in "([":
+                depth -= 1
+            elif c in ";{}" and depth <= 0:
+                break
+            i -= 1
+        i += 1
+        while i < pos and s[i].isspace():
+            i += 1
+        return self.line_of(i)
+
+    def statement_end(self, pos: int, limit: int) -> int:
+        """pos'tan başlayan tanımın bittiği satır ({...} gövdesi ya da ;)."""
+        s = self.masked
+        depth = 0
+        i = pos
+        while i < limit:
+            c = s[i]
+            if c in "([":
+                depth += 1
+            elif c in ")]":
+                depth -= 1
+            elif depth <= 0 and c == "{":
+                return self.line_of(self.close_of.get(i, i))
+            elif depth <= 0 and c in ";}":
+                return self.line_of(i)
+            i += 1
+        return self.line_of(max(pos, limit - 1))
+
+
+# ---------- Dilimleme ----------
+def merge_spans(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for a, b in sorted(ranges):
+        if merged and a <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def _hit_ranges(
+    src: _Source,
+    pos: int,
+    is_definition: bool,
+    context_lines: int,
+    max_body_lines: int,
+) -> List[Tuple[int, int]]:
+    """Tek bir konum için seçilecek satır aralıkları."""
+    last_line = len(src.line_starts) - 1
+    hit_line = src.line_of(pos)
+    funcs = [b for b in src.enclosing_blocks(pos) if src.is_function_block(b[0])]
+
+    # Dış fonksiyon/bileşen başlıkları (imza satırları)
+    ranges = [(src.statement_start(o), src.line_of(o)) for o, _ in funcs]
+
+    if is_definition:
+        limit = funcs[-1][1] if funcs else len(src.masked)
+        ranges.append((src.statement_start(pos), src.statement_end(pos, limit)))
+        return ranges
+
+    if funcs:
+        o, c = funcs[-1]
+        first, last = src.statement_start(o), src.line_of(c)
+        if last - first + 1 <= max_body_lines:
+            ranges.append((first, last))
+            return ranges
+    ranges.append(
+        (max(0, hit_line - context_lines), min(last_line, hit_line + context_lines))
+    )
+    return ranges
+
+
+def _finish_spans(
+    src: _Source, ranges: List[Tuple[int, int]], imports: List["re.Match[str]"]
+) -> List[Tuple[int, int]]:
+    """Seçilen aralıklarda kullanılan isimleri bağlayan import'ları ekler."""
+    masked_lines = src.masked.split("\n")
+    used: Set[str] = set()
+    for a, b in merge_spans(ranges):
+        used.update(_IDENT_RE.findall("\n".join(masked_lines[a : b + 1])))
+    for m in imports:
+        names = set(_IDENT_RE.findall(m.group("body"))) - _IMPORT_SKIP
+        if names & used:
+            ranges.append((src.line_of(m.start("body")), src.line_of(m.end() - 1)))
+
+    last_line = len(masked_lines) - 1
+    return [(a, min(b, last_line)) for a, b in merge_spans(ranges)]
+
+
+def _definition_positions(src: _Source, target: str) -> Set[int]:
+    found: Set[int] = set()
+    for rx in _definition_patterns(target):
+        for m in rx.finditer(src.masked):
+            found.add(m.start("name"))
+    return found
+
+
+def find_definition_lines(text: str, target: str) -> List[int]:
+    """Hedefin tanımlandığı satırlar (0 tabanlı)."""
+    src = _Source(text)
+    return sorted({src.line_of(p) for p in _definition_positions(src, target)})
+
+
+def slice_spans(
+    text: str,
+    target: str,
+    context_lines: int = CONTEXT_LINES,
+    max_body_lines: int = MAX_BODY_LINES,
+) -> List[Tuple[int, int]]:
+    """
+    Hedefin tanımı, çağrı yerleri, onları saran fonksiyon/bileşen gövdeleri ve
+    gereken import'lar için (ilk, son) satır aralıkları (0 tabanlı, dahil).
+    Hedef (yorum/string dışında) hiç geçmiyorsa boş liste.
+    """
+    src = _Source(text)
+    definitions = _definition_positions(src, target)
+    imports = list(_IMPORT_RE.finditer(src.masked))
+    hits = [
+        m.start()
+        for m in re.finditer(rf"(?<![\w$]){re.escape(target)}(?![\w$])", src.masked)
+        if not any(im.start() <= m.start() < im.end() for im in imports)
+    ]
+    if not hits:
+        return []
+
+    ranges: List[Tuple[int, int]] = []
+    for pos in hits:
+        ranges.extend(
+            _hit_ranges(src, pos, pos in definitions, context_lines, max_body_lines)
+        )
+    return _finish_spans(src, ranges, imports)
+
+
+def slice_positions(
+    text: str,
+    positions: Iterable[Tuple[int, int]],
+    context_lines: int = CONTEXT_LINES,
+    max_body_lines: int = MAX_BODY_LINES,
+) -> List[Tuple[int, int]]:
+    """
+    Verilen (satır, sütun) konumlarını (0 tabanlı; örn. stack frame'leri) saran
+    fonksiyon gövdeleri + gereken import'lar için satır aralıkları.
+    """
+    src = _Source(text)
+    imports = list(_IMPORT_RE.finditer(src.masked))
+    last_line = len(src.line_starts) - 1
+    ranges: List[Tuple[int, int]] = []
+    for line, col in positions:
+        if not 0 <= line <= last_line:
+            continue
+        start = src.line_starts[line]
+        end = src.line_starts[line + 1] - 1 if line < last_line else len(src.masked)
+        pos = min(start + max(col, 0), max(start, end - 1))
+        ranges.extend(_hit_ranges(src, pos, False, context_lines, max_body_lines))
+    if not ranges:
+        return []
+    return _finish_spans(src, ranges, imports)
+
+
+def render_slices(text: str, spans: List[Tuple[int, int]]) -> str:
+    """Aralıkları orijinal (0 tabanlı) satır numaralarıyla yazar; boşluklar '...' ile."""
+    lines = text.split("\n")
+    width = len(str(len(lines)))
+    out: List[str] = []
+    prev_end: Optional[int] = None
+    for a, b in spans:
+        if prev_end is None and a > 0 or prev_end is not None and a > prev_end + 1:
+            out.append(GAP_MARKER)
+        for n in range(a, b + 1):
+            out.append(f"{n:>{width}}| {lines[n].rstrip()}")
+        prev_end = b
+    if prev_end is not None and prev_end < len(lines) - 1:
+        out.append(GAP_MARKER)
+    return "\n".join(out) + "\n" if out else ""
+
+
+_SLICE_LINE_RE = re.compile(r"^\s*\d+\| ")
+
+
+def is_sliced_section(section: str) -> bool:
+    """`>>> path` bölümü render_slices çıktısı mı (tam dosya değil mi)?"""
+    body = section.split("\n", 2)[1:2]
+    return bool(body) and (body[0] == GAP_MARKER or bool(_SLICE_LINE_RE.match(body[0])))
+
+
+def slice_context(text: str, target: str) -> str:
+    return render_slices(text, slice_spans(text, target))
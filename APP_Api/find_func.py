@@ -1,8 +1,12 @@
 # filename: collect_ctx.py
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Set
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
 
+from symbol_index import SymbolIndex, is_indexable_symbol
 
 PROJECT_PATH = "TESTS_Main\myapp"
 FUNCTION = "handleLogging"
@@ -44,100 +48,76 @@ def read_text_safely(p: Path) -> str:
 
 
 def contains_target_symbol(text: str, target: str) -> bool:
-    import re
-
     rx = re.compile(rf"\b{re.escape(target)}\b")
     return rx.search(text) is not None
 
 
+def compile_symbols_matcher(targets: Iterable[str]) -> "re.Pattern[str]":
+    """Birden çok sembol için tek alternation regex'i (`\b(?:a|b|...)\b`)."""
+    alts = sorted({re.escape(t) for t in targets}, key=lambda x: (-len(x), x))
+    return re.compile(rf"\b({'|'.join(alts)})\b")
+
+
+def find_matching_symbols(text: str, matcher: "re.Pattern[str]") -> Set[str]:
+    return set(matcher.findall(text))
+
+
 def normalize_rel_path(p: Path, root: Path) -> str:
     return p.relative_to(root).as_posix()
 
 
 # ---------- JS/TS temizleyici ----------
-def strip_js_like_comments_and_tighten(text: str) -> str:
-    """Yorumları ve gereksiz boşlukları siler (anlamı korur)."""
-    n = len(text)
-    i = 0
-    out: List[str] = []
-    in_sl_comment = in_ml_comment = in_s = in_d = in_bt = escape = False
-
-    while i < n:
-        ch = text[i]
-        nxt = text[i + 1] if i + 1 < n else ""
-
-        if in_sl_comment:
-            if ch == "\n":
-                in_sl_comment = False
-                out.append(ch)
-            i += 1
-            continue
-        if in_ml_comment:
-            if ch == "*" and nxt == "/":
-                in_ml_comment = False
-                i += 2
-            else:
-                i += 1
-            continue
-        if in_s:
-            out.append(ch)
-            if not escape and ch == "'":
-                in_s = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
-        if in_d:
-            out.append(ch)
-            if not escape and ch == '"':
-                in_d = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
-        if in_bt:
-            out.append(ch)
-            if not escape and ch == "`":
-                in_bt = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
+# Tek geçişli tokenizer: string'ler (' " `, kaçışlarla) olduğu gibi korunur,
+# // ve /* */ yorumları silinir. Kapanmamış string/yorum dosya sonuna kadar sürer.
+_JS_TOKEN_RE = re.compile(
+    r"""
+    (?P<str>
+        '[^'\\]*(?:\\.[^'\\]*)*'?
+      | "[^"\\]*(?:\\.[^"\\]*)*"?
+      | `[^`\\]*(?:\\.[^`\\]*)*`?
+    )
+    | //[^\n]*
+    | /\*.*?\*/
+    | /\*.*
+    """,
+    re.S | re.X,
+)
 
-        if ch == "/" and nxt:
-            if nxt == "/":
-                in_sl_comment = True
-                i += 2
-                continue
-            if nxt == "*":
-                in_ml_comment = True
-                i += 2
-                continue
 
-        if ch == "'":
-            in_s = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
-        if ch == '"':
-            in_d = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
-        if ch == "`":
-            in_bt = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
+def _keep_strings(m: "re.Match[str]") -> str:
+    return m.group("str") or ""
+
+
+def strip_js_like_comments(text: str) -> str:
+    """Sadece yorumları siler; boşluklara dokunmaz (slice-only mod)."""
+    return _JS_TOKEN_RE.sub(_keep_strings, text)
+
+
+_NON_NL_RE = re.compile(r"[^\n]")
+
+
+def _mask_token(m: "re.Match[str]") -> str:
+    tok = m.group(0)
+    if m.group("str") is None:
+        return _NON_NL_RE.sub(" ", tok)
+    tail = tok[-1] if len(tok) > 1 and tok[-1] == tok[0] else ""
+    return tok[0] + _NON_NL_RE.sub(" ", tok[1 : len(tok) - len(tail)]) + tail
+
+
+def mask_js_comments_and_strings(text: str) -> str:
+    """
+    Yorumları ve string içlerini boşlukla maskeler; uzunluk ve satır sonları
+    korunur (offset/satır numarası hesapları için).
+    """
+    return _JS_TOKEN_RE.sub(_mask_token, text)
 
-        out.append(ch)
-        i += 1
 
-    raw = "".join(out)
-    lines = [ln.rstrip() for ln in raw.splitlines()]
+def tighten_whitespace(raw: str) -> str:
+    """Satır sonu boşluklarını siler, 2+ boş satırı teke indirir."""
     tightened = []
     blank = False
-    for ln in lines:
+    for ln in raw.splitlines():
+        ln = ln.rstrip()
         if ln == "":
             if not blank:
                 tightened.append("")
@@ -148,33 +128,420 @@ def strip_js_like_comments_and_tighten(text: str) -> str:
     return "\n".join(tightened).strip() + "\n"
 
 
+def strip_js_like_comments_and_tighten(text: str, tighten: bool = True) -> str:
+    """Yorumları ve gereksiz boşlukları siler (anlamı korur)."""
+    raw = strip_js_like_comments(text)
+    return tighten_whitespace(raw) if tighten else raw
+
+
 # ---------- Ana İş ----------
+MERGED_KEY = "*"  # scan sonuçlarında birleşik çıktının anahtarı
+
+
+def open_symbol_index(index_path: Path, project_root: Path, exts=DEFAULT_EXTS) -> SymbolIndex:
+    """İndeksi açar ve değişen klasör/dosyalara göre günceller (kapatmak çağırana ait)."""
+    index = SymbolIndex.open(index_path, project_root, exts, SKIP_DIRS)
+    index.refresh()
+    index.save()
+    return index
+
+
+def find_files_with_index(
+    project_root: Path, targets: Iterable[str], index_path: Path, exts=DEFAULT_EXTS
+) -> List[Path]:
+    """
+    Kalıcı sembol indeksini günceller (sadece değişen dosyalar) ve hedef(ler)i
+    içeren dosyaların birleşimini döner.
+    """
+    if isinstance(targets, str):
+        targets = [targets]
+    found: Set[Path] = set()
+    with open_symbol_index(index_path, project_root, exts) as index:
+        for target in targets:
+            found.update(index.lookup(target))
+    return sorted(found, key=lambda x: x.as_posix())
+
+
+def _scan_file(job: Tuple[Path, Tuple[str, ...], str, bool]) -> Dict[str, str]:
+    """
+    Worker: dosyayı tek sefer okur, tüm hedefleri tek regex ile arar ve
+    temizlenmiş içeriği (mode="slice" ise sadece ilgili satır aralıklarını) döner.
+    Dönen: {sembol: metin} (merge=True ise {MERGED_KEY: metin}); eşleşme yoksa {}.
+    """
+    path, targets, mode, merge = job
+    text = read_text_safely(path)
+    if not text:
+        return {}
+    matched = sorted(find_matching_symbols(text, compile_symbols_matcher(targets)))
+    if not matched:
+        return {}
+
+    if mode == "slice":
+        from ctx_slice import merge_spans, render_slices, slice_spans
+
+        spans = {sym: slice_spans(text, sym) for sym in matched}
+        if merge:
+            union = merge_spans([s for sym in matched for s in spans[sym]])
+            return {MERGED_KEY: render_slices(text, union)} if union else {}
+        return {sym: render_slices(text, sp) for sym, sp in spans.items() if sp}
+
+    cleaned = strip_js_like_comments_and_tighten(text)
+    if merge:
+        return {MERGED_KEY: cleaned}
+    return {sym: cleaned for sym in matched}
+
+
+def iter_scan_files(
+    paths: List[Path],
+    targets: Iterable[str],
+    workers: Optional[int] = None,
+    mode: str = "file",
+    merge: bool = True,
+) -> Iterator[Tuple[Path, Dict[str, str]]]:
+    """
+    Dosyaları tek geçişte tarar ve eşleşenleri geldikçe (path, {anahtar: metin})
+    olarak üretir; sıra `paths` ile aynıdır.
+    workers: None/1 → seri, 0 → CPU sayısı kadar, N → N süreçlik havuz.
+    """
+    targets = (targets,) if isinstance(targets, str) else tuple(targets)
+    jobs = [(p, targets, mode, merge) for p in paths]
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers and workers > 1 and len(jobs) > 1:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for p, res in zip(paths, pool.map(_scan_file, jobs, chunksize=chunksize)):
+                if res:
+                    yield p, res
+        return
+    for p, job in zip(paths, jobs):
+        res = _scan_file(job)
+        if res:
+            yield p, res
+
+
+def scan_files(
+    paths: List[Path],
+    targets: Iterable[str],
+    workers: Optional[int] = None,
+    mode: str = "file",
+    merge: bool = True,
+) -> List[Tuple[Path, Dict[str, str]]]:
+    return list(iter_scan_files(paths, targets, workers, mode, merge))
+
+
+def symbol_out_path(out_path: Path, symbol: str) -> Path:
+    """merge=False iken her sembolün bağlam dosyası: <out_dir>/ctx_<symbol>_files.txt"""
+    return out_path.parent / f"ctx_{symbol}_files.txt"
+
+
+class ContextWriter:
+    """
+    Bağlam parçalarını geldikçe dosyaya yazar; tüm metni bellekte tutmaz.
+    Çıktı `"\n".join(chunks).strip() + "\n"` ile birebir aynıdır (parça yoksa "").
+    """
+
+    def __init__(self, out_path: Path):
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(out_path, "w", encoding="utf-8")
+        self._pending: Optional[str] = None
+        self.count = 0
+
+    def add(self, chunk: str) -> None:
+        if self._pending is None:
+            chunk = chunk.lstrip()
+        else:
+            self._f.write(self._pending)
+            self._f.write("\n")
+        self._pending = chunk
+        self.count += 1
+
+    def close(self) -> None:
+        if self._pending is not None:
+            self._f.write(self._pending.rstrip() + "\n")
+            self._pending = None
+        self._f.close()
+
+    def __enter__(self) -> "ContextWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_chunks(out_path: Path, chunks: Iterable[str]) -> int:
+    """Parçaları akış halinde yazar; dönen: parça (dosya) sayısı."""
+    with ContextWriter(out_path) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+    return writer.count
+
+
+def _candidate_files(
+    project_root: Path, targets: List[str], exts, index_path: Optional[Path]
+) -> List[Path]:
+    if index_path is not None and all(is_indexable_symbol(t) for t in targets):
+        return find_files_with_index(project_root, targets, index_path, exts)
+    return sorted(iter_files(project_root, exts), key=lambda x: x.as_posix())
+
+
+def iter_context_chunks(
+    project_root: Path,
+    target: Union[str, Iterable[str]],
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    mode: str = "file",
+) -> Iterator[str]:
+    """
+    collect_context'in birleşik (merge=True) çıktısını dosyaya yazmadan,
+    `>>> path` başlıklı parçalar halinde üretir (örn. doğrudan prompt'a).
+    """
+    targets = [target] if isinstance(target, str) else sorted(set(target))
+    candidates = _candidate_files(project_root, targets, exts, index_path)
+    for p, res in iter_scan_files(candidates, targets, workers, mode, merge=True):
+        yield f"{HEADER_PREFIX}{normalize_rel_path(p, project_root)}\n{res[MERGED_KEY]}"
+
+
 def collect_context(
-    project_root: Path, target: str, out_path: Path, exts=DEFAULT_EXTS
+    project_root: Path,
+    target: Union[str, Iterable[str]],
+    out_path: Path,
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    mode: str = "file",
+    merge: bool = True,
 ) -> int:
-    files = []
-    for p in iter_files(project_root, exts):
-        text = read_text_safely(p)
-        if text and contains_target_symbol(text, target):
-            files.append(p)
-    files.sort(key=lambda x: x.as_posix())
+    """
+    Hedef sembol(ler)i içeren dosyaları toplayıp bağlam dosyasına yazar.
+    mode="file" → dosyanın tamamı (yorumsuz), mode="slice" → sadece tanım,
+    çağrı yerleri, saran fonksiyon gövdeleri ve gereken import'lar (orijinal
+    satır numaralarıyla).
+
+    Birden çok sembol tek geçişte taranır: merge=True → tek, tekilleştirilmiş
+    dosya (out_path); merge=False → her sembol için `symbol_out_path`.
+    Parçalar geldikçe yazılır. Dönen: yazılan tekil dosya sayısı.
+    """
+    if merge:
+        return write_chunks(
+            out_path,
+            iter_context_chunks(project_root, target, exts, index_path, workers, mode),
+        )
+
+    targets = [target] if isinstance(target, str) else sorted(set(target))
+    candidates = _candidate_files(project_root, targets, exts, index_path)
+    writers = {sym: ContextWriter(symbol_out_path(out_path, sym)) for sym in targets}
+    count = 0
+    try:
+        for p, res in iter_scan_files(candidates, targets, workers, mode, merge=False):
+            rel = normalize_rel_path(p, project_root)
+            for sym, body in res.items():
+                writers[sym].add(f"{HEADER_PREFIX}{rel}\n{body}")
+            count += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return count
+
+
+# ---------- Log stack çözümleyici ----------
+class StackFrame(NamedTuple):
+    func: str  # anonim frame'lerde ""
+    url: str
+    line: int  # 1 tabanlı (tarayıcı stack formatı)
+    col: int
+
+
+# 2025-10-25T10:17:15.994Z - ERROR: <mesaj> - @http://...:37:43
+_LOG_ENTRY_RE = re.compile(
+    r"^(?P<ts>\d{4}-\d{2}-\d{2}T\S+)\s+-\s+(?P<level>[A-Z]+):\s?(?P<msg>.*)$"
+)
+_FRAME_RES = (
+    # Safari / Firefox: func@url:line:col
+    re.compile(r"^\s*(?P<func>[^\s@()]*)@(?P<url>\S+?):(?P<line>\d+):(?P<col>\d+)\s*$"),
+    # Chrome: at func (url:line:col) / at url:line:col
+    re.compile(
+        r"^\s*at\s+(?:(?P<func>[^\s()]+)\s+\()?(?P<url>\S+?):(?P<line>\d+):(?P<col>\d+)\)?\s*$"
+    ),
+)
+_MSG_TAIL_FRAME_RE = re.compile(r"^(?P<msg>.*?)\s+-\s+(?P<frame>\S*@\S+:\d+:\d+)\s*$")
+
+
+def parse_stack_frame(line: str) -> Optional[StackFrame]:
+    for rx in _FRAME_RES:
+        m = rx.match(line)
+        if m:
+            return StackFrame(
+                m.group("func") or "", m.group("url"), int(m.group("line")), int(m.group("col"))
+            )
+    return None
 
-    if not files:
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        out_path.write_text("", encoding="utf-8")
-        return 0
 
-    chunks = []
-    for p in files:
+def parse_log_entries(log_text: str) -> List[dict]:
+    """
+    log.txt'yi kayıtlara böler:
+        {"timestamp", "level", "message", "frames": [StackFrame, ...], "raw": str}
+    Kayıt başlığı olmayan ve frame de olmayan satırlar mesaja eklenir.
+    """
+    entries: List[dict] = []
+    for line in log_text.splitlines():
+        m = _LOG_ENTRY_RE.match(line)
+        if m:
+            msg = m.group("msg")
+            frames: List[StackFrame] = []
+            tail = _MSG_TAIL_FRAME_RE.match(msg)
+            if tail:
+                frame = parse_stack_frame(tail.group("frame"))
+                if frame:
+                    msg = tail.group("msg")
+                    frames.append(frame)
+            entries.append(
+                {
+                    "timestamp": m.group("ts"),
+                    "level": m.group("level"),
+                    "message": msg.strip(),
+                    "frames": frames,
+                    "raw": line.rstrip(),
+                }
+            )
+            continue
+        if not entries or not line.strip():
+            continue
+        entries[-1]["raw"] += "\n" + line.rstrip()
+        frame = parse_stack_frame(line)
+        if frame:
+            entries[-1]["frames"].append(frame)
+        else:
+            entries[-1]["message"] += "\n" + line.rstrip()
+    return entries
+
+
+def url_to_project_file(url: str, project_root: Path, exts=DEFAULT_EXTS) -> Optional[Path]:
+    """
+    Frame URL'ini doğrudan proje dosyasına eşler (/src/x.js, webpack:///./src/x.js).
+    Bundle / hot-update URL'leri diskte olmadığı için None döner.
+    """
+    path = urlsplit(url).path if "://" in url else url
+    path = path.lstrip("/")
+    while path.startswith("./"):
+        path = path[2:]
+    if not path or not path.endswith(tuple(exts)):
+        return None
+    candidate = project_root / path
+    return candidate if candidate.is_file() else None
+
+
+def _files_defining(
+    project_root: Path,
+    names: Set[str],
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+) -> Dict[str, List[Path]]:
+    """İsim → o ismi geçiren dosyalar (indeks varsa doğrudan lookup, yoksa tek tarama)."""
+    found: Dict[str, List[Path]] = {name: [] for name in names}
+    if not names:
+        return found
+    if index_path is not None:
+        with open_symbol_index(index_path, project_root, exts) as index:
+            for name in names:
+                found[name] = index.lookup(name)
+        return found
+    matcher = compile_symbols_matcher(names)
+    for p in sorted(iter_files(project_root, exts), key=lambda x: x.as_posix()):
+        for name in find_matching_symbols(read_text_safely(p), matcher):
+            found[name].append(p)
+    return found
+
+
+def resolve_log_frames(
+    entries: List[dict],
+    project_root: Path,
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+    sourcemaps=None,
+) -> Dict[Path, dict]:
+    """
+    Kayıtlardaki frame'leri proje dosyalarına çözer.
+    Dönen: {path: {"positions": {(line0, col0), ...}, "symbols": {func, ...}}}
+      - positions: URL'i doğrudan ya da source map (sourcemaps: SourceMapResolver)
+                   ile dosyaya eşlenen frame'ler (0 tabanlı)
+      - symbols:   çözülemeyen bundle frame'leri; fonksiyon adının tanımlandığı dosya
+    Projede karşılığı olmayan frame'ler (react-dom iç fonksiyonları vb.) atlanır.
+    """
+    from ctx_slice import find_definition_lines
+
+    hits: Dict[Path, dict] = {}
+
+    def _hit(p: Path) -> dict:
+        return hits.setdefault(p, {"positions": set(), "symbols": set()})
+
+    by_name: Set[str] = set()
+    seen: Set[StackFrame] = set()
+    for entry in entries:
+        for fr in entry["frames"]:
+            if fr in seen:
+                continue
+            seen.add(fr)
+            direct = url_to_project_file(fr.url, project_root, exts)
+            mapped = None
+            if direct is None and sourcemaps is not None:
+                mapped = sourcemaps.resolve(fr.url, fr.line, fr.col)
+            if direct is not None:
+                _hit(direct)["positions"].add((fr.line - 1, max(fr.col - 1, 0)))
+            elif mapped is not None:
+                _hit(mapped[0])["positions"].add((mapped[1] - 1, max(mapped[2] - 1, 0)))
+            elif fr.func and is_indexable_symbol(fr.func):
+                by_name.add(fr.func)
+
+    for name, paths in _files_defining(project_root, by_name, exts, index_path).items():
+        for p in paths:
+            if find_definition_lines(read_text_safely(p), name):
+                _hit(p)["symbols"].add(name)
+    return hits
+
+
+def iter_context_chunks_from_log(
+    project_root: Path,
+    log_path: Path,
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+    sourcemaps=None,
+) -> Iterator[str]:
+    """
+    Sabit bir hedef sembol yerine log'daki stack frame'lerinden bağlam üretir:
+    sadece frame'lerin isabet ettiği dosyalar, ilgili dilimlerle (mode="slice"
+    formatında).
+    """
+    from ctx_slice import merge_spans, render_slices, slice_positions, slice_spans
+
+    entries = parse_log_entries(read_text_safely(log_path))
+    hits = resolve_log_frames(entries, project_root, exts, index_path, sourcemaps)
+
+    for p in sorted(hits, key=lambda x: x.as_posix()):
+        text = read_text_safely(p)
+        spans = slice_positions(text, sorted(hits[p]["positions"]))
+        for name in sorted(hits[p]["symbols"]):
+            spans.extend(slice_spans(text, name))
+        if not spans:
+            continue
         rel = normalize_rel_path(p, project_root)
-        code = read_text_safely(p)
-        cleaned = strip_js_like_comments_and_tighten(code)
-        chunks.append(f"{HEADER_PREFIX}{rel}\n{cleaned}")
-
-    out_text = "\n".join(chunks).strip() + "\n"
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(out_text, encoding="utf-8")
-    return len(files)
+        yield f"{HEADER_PREFIX}{rel}\n{render_slices(text, merge_spans(spans))}"
+
+
+def collect_context_from_log(
+    project_root: Path,
+    log_path: Path,
+    out_path: Path,
+    exts=DEFAULT_EXTS,
+    index_path: Optional[Path] = None,
+    sourcemaps=None,
+) -> int:
+    """iter_context_chunks_from_log çıktısını dosyaya yazar. Dönen: dosya sayısı."""
+    return write_chunks(
+        out_path,
+        iter_context_chunks_from_log(project_root, log_path, exts, index_path, sourcemaps),
+    )
 
 
 # ---------- CLI ----------
@@ -2,9 +2,22 @@
 from __future__ import annotations
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Iterable
+from functools import partial
+import asyncio
+import copy
+import hashlib
 import json
+import time
 import re
-from python_api import connect_ssh, send_prompt
+from python_api import ModelCallError, connect_ssh, send_prompt_with_retry
+from model_fleet import ModelFleet
+from prompt_packer import TokenEstimator, pack_prompt, split_code_sections
+from find_func import HEADER_PREFIX
+from ctx_slice import is_sliced_section
+from apply_code_changes import normalized_hash
+from response_cache import ResponseCache, response_cache_key
+from session_registry import SessionRegistry
 
 
 # =========================================================
@@ -15,6 +28,12 @@ def _read_text(p: Path) -> str:
     """Belirtilen dosyayı UTF-8 ile okur, hata varsa atlar."""
     return p.read_text(encoding="utf-8", errors="ignore")
 
+def _infer_context_mode(prompt: str) -> str:
+    """Kod bölümlerinden biri dilim (render_slices) biçimindeyse "slice", değilse "file"."""
+    sliced = any(is_sliced_section(text) for path, text in split_code_sections(prompt) if path)
+    return "slice" if sliced else "file"
+
+
 def _write_text(p: Path, text: str) -> None:
     """Metni belirtilen dosyaya yazar, gerekirse klasörleri oluşturur."""
     p.parent.mkdir(parents=True, exist_ok=True)
@@ -45,6 +64,9 @@ _HEADER_RE = re.compile(r"^(?P<file>.+?)\s*-\s*\(?(?P<line>\d+)\)?\s*$")
 _ROOT_RE = re.compile(r"^Root of the problem:\s*$", re.IGNORECASE)
 _FIX_RE  = re.compile(r"^How to fix:\s*$", re.IGNORECASE)
 
+# Akışta erken durdurma için (metnin herhangi bir satırı)
+_FIX_LINE_RE = re.compile(r"^How to fix:[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
 # Bölüm başlıkları
 _UPDATED_FILES_RE = re.compile(r"^UPDATED FILES\s*$", re.IGNORECASE)
 _CHANGES_RE       = re.compile(r"^CHANGES\s*$", re.IGNORECASE)
@@ -55,57 +77,204 @@ _CHANGES_RE       = re.compile(r"^CHANGES\s*$", re.IGNORECASE)
 _PATH_LINE_RE = re.compile(r"^[^\s].+\.(?:js|jsx|ts|tsx)$")
 
 
-def _parse_updated_files(lines: list[str], start_idx: int) -> tuple[dict[str, str], int]:
+def _response_complete(text: str) -> bool:
     """
-    UPDATED FILES bölümünden dosya->tam içerik haritasını çıkarır.
-    start_idx: 'UPDATED FILES' satırının *sonraki* satır indeksi.
-    Dönüş: (updated_files, next_index)  ; next_index genelde 'CHANGES' satırına gelir.
+    Akış modunda erken iptal: 'How to fix:' bölümü en az bir dolu satırla
+    yazılıp boş satırla kapandıysa parser'ın ihtiyacı olan her şey gelmiştir
+    (format gereği son bölüm budur).
+    """
+    last = None
+    for last in _FIX_LINE_RE.finditer(text):
+        pass
+    if last is None:
+        return False
+    tail = text[last.end():].split("\n")[1:-1]  # son eleman: henüz bitmemiş satır
+    seen = False
+    for line in tail:
+        if line.strip():
+            seen = True
+        elif seen:
+            return True
+    return False
+
+
+# Satır sonları str.splitlines ile aynı: "\r" ardından "\n" gelebilir, beklenir
+_LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+class ResponseParser:
+    """
+    Model yanıtını tek geçişte, parça parça ayrıştıran durum makinesi:
+
+        pre → (UPDATED FILES) → files → (CHANGES) → changes ⇄ root / fix
+
+    - feed(parça): akıştan gelen metni ekler; sadece tamamlanan satırlar işlenir
+    - close(): kalan yarım satırı işler ve _parse_model_response_to_struct ile
+      aynı yapıyı döner ({"code_change", "root", "fix", "raw"})
+    - UPDATED FILES altındaki bir dosyanın bloğu (sonraki dosya yolu ya da
+      CHANGES satırıyla) kapanır kapanmaz self.files'a yazılır ve on_file(path,
+      code) çağrılır; uygulama tüm yanıtı beklemek zorunda kalmaz
+    - strip=True: sonuç, metnin .strip() edilmiş hali ayrıştırılmış gibidir
+      (baştaki boşluklar atılır; son dolu satır bir satır geriden işlenir)
     """
-    updated_files: dict[str, str] = {}
-    i = start_idx
-    n = len(lines)
-
-    current_path: str | None = None
-    current_buf: list[str] = []
-
-    def _flush():
-        nonlocal current_path, current_buf
-        if current_path is not None:
-            # Tam dosya içeriğini tek string olarak kaydet
-            updated_files[current_path] = "\n".join(current_buf).rstrip("\n")
-        current_path = None
-        current_buf = []
-
-    while i < n:
-        line = lines[i]
-        if _CHANGES_RE.match(line):
-            # Bölüm bitti
-            _flush()
-            return updated_files, i  # i: CHANGES satırının indeksi
-
-        # Yeni bir dosya yolu mu?
-        if _PATH_LINE_RE.match(line):
-            # Öncekini flush et
-            _flush()
-            current_path = line.strip()
-            current_buf = []
-            i += 1
-            continue
 
-        # Dosya içeriği topla (her satırı ekle)
-        if current_path is not None:
-            current_buf.append(line)
-        # Eğer henüz path görmediysek ve serbest satırlar varsa, atla
-        i += 1
+    def __init__(
+        self,
+        on_file: Callable[[str, str], None] | None = None,
+        strip: bool = False,
+    ):
+        self.on_file = on_file
+        self.strip = strip
+        self._started = not strip
+        self._held: list[str] = []  # strip: son dolu satır + ardındaki boş satırlar
+        self.files: dict[str, str] = {}  # UPDATED FILES: dosya → tam içerik
+        self.code_change: dict[str, dict] = {}  # CHANGES hunk'ları
+        self.state = "pre"
+        self._buf = ""
+        self._pieces: list[str] = []
+        self._path: str | None = None
+        self._code: list[str] = []
+        self._file: str | None = None
+        self._hunk: dict | None = None
+        self._root: list[str] = []
+        self._fix: list[str] = []
+
+    # ---------- Girdi ----------
+    def feed(self, chunk: str) -> None:
+        if not self._started:
+            chunk = chunk.lstrip()
+            self._started = bool(chunk)
+        if not chunk:
+            return
+        self._pieces.append(chunk)
+        buf = self._buf + chunk
+        lines = buf.splitlines()
+        # Son satır sonuyla bitmiyorsa (ya da "\r\n"in yarısıysa) beklet
+        if buf[-1] not in _LINE_BREAKS or buf[-1] == "\r":
+            self._buf = lines.pop() + ("\r" if buf[-1] == "\r" else "")
+        else:
+            self._buf = ""
+        self._lines(self._hold(lines) if self.strip else lines)
+
+    def _hold(self, lines: list[str]) -> list[str]:
+        """strip: sondaki boş satırlar ve son satırın sağ boşluğu belli olana kadar bekletilir."""
+        ready: list[str] = []
+        for line in lines:
+            if line.strip():
+                ready += self._held
+                self._held = [line]
+            else:
+                self._held.append(line)
+        return ready
+
+    def close(self) -> dict:
+        if self._buf:
+            last = self._buf[:-1] if self._buf.endswith("\r") else self._buf
+            self._lines(self._hold([last]) if self.strip else [last])
+            self._buf = ""
+        if self._held:
+            self._lines([self._held[0].rstrip()])  # sondaki boş satırlar atılır
+            self._held = []
+        if self.state == "files":
+            self._close_file()
+        return self.result()
+
+    # ---------- Durum makinesi ----------
+    def _lines(self, lines: list[str]) -> None:
+        changes_match = _CHANGES_RE.match
+        path_match = _PATH_LINE_RE.match
+        for line in lines:
+            state = self.state
+            if state == "files":
+                # Sıcak yol: tam dosya içerikleri yanıtın büyük kısmıdır
+                if changes_match(line):
+                    self._close_file()
+                    self.state = "changes"
+                elif path_match(line):
+                    self._close_file()
+                    self._path = line.strip()
+                elif self._path is not None:
+                    self._code.append(line)
+            elif state == "pre":
+                if _UPDATED_FILES_RE.match(line):
+                    self.state = "files"
+            else:
+                self._changes_line(line)
+
+    def _close_file(self) -> None:
+        if self._path is None:
+            return
+        code = "\n".join(self._code).rstrip("\n")
+        self.files[self._path] = code
+        if self.on_file is not None:
+            self.on_file(self._path, code)
+        self._path, self._code = None, []
+
+    def _changes_line(self, line: str) -> None:
+        if _ROOT_RE.match(line):
+            self.state = "root"
+            return
+        if _FIX_RE.match(line):
+            self.state = "fix"
+            return
+        m = _HEADER_RE.match(line)
+        if self.state in ("root", "fix"):
+            if not m:
+                (self._root if self.state == "root" else self._fix).append(line)
+                return
+            self.state = "changes"  # yeni hunk başlığı bölümü kapatır
 
-    # Son flush
-    _flush()
-    return updated_files, i
+        if m:
+            self._file = m.group("file").strip()
+            entry = self.code_change.setdefault(self._file, {"code": "", "changes": {}})
+            line_no = str(int(m.group("line")))
+            self._hunk = entry["changes"].setdefault(line_no, {"remove": [], "add": []})
+            return
+
+        if self._hunk is None:
+            return
+        stripped = line.strip()
+        if stripped.startswith("- "):
+            self._hunk["remove"].append(line[line.index("- ") + 2 :])
+        elif stripped.startswith("+ "):
+            self._hunk["add"].append(line[line.index("+ ") + 2 :])
+        # Bağlam / boş satır: atla
+
+    # ---------- Çıktı ----------
+    @property
+    def text(self) -> str:
+        """Şu ana kadar beslenen ham metin."""
+        return "".join(self._pieces)
+
+    def result(self) -> dict:
+        code_change = {
+            path: {
+                "code": obj["code"],
+                "changes": {
+                    ln: {k: v for k, v in chg.items() if v}  # boş remove/add atılır
+                    for ln, chg in obj["changes"].items()
+                },
+            }
+            for path, obj in self.code_change.items()
+        }
+        for path, full_code in self.files.items():
+            code_change.setdefault(path, {"code": "", "changes": {}})["code"] = full_code
+        return {
+            "code_change": code_change,
+            "root": _squash(self._root),
+            "fix": _squash(self._fix),
+            "raw": self.text.strip(),
+        }
+
+
+def _squash(xs: list[str]) -> str:
+    txt = "\n".join([x.rstrip() for x in xs]).strip()
+    return re.sub(r"\n{3,}", "\n\n", txt)
 
 
 def _parse_model_response_to_struct(response_text: str) -> dict:
     """
-    Model yanıtını şu yapıya dönüştürür:
+    Model yanıtını şu yapıya dönüştürür (bkz. ResponseParser):
 
     {
       "code_change": {
@@ -126,133 +295,9 @@ def _parse_model_response_to_struct(response_text: str) -> dict:
       "raw":  str
     }
     """
-    code_change: dict[str, dict] = {}
-    lines = response_text.splitlines()
-
-    # 1) UPDATED FILES bölümünü yakala (varsa)
-    i = 0
-    n = len(lines)
-    updated_files: dict[str, str] = {}
-    while i < n:
-        if _UPDATED_FILES_RE.match(lines[i]):
-            updated_files, i = _parse_updated_files(lines, i + 1)
-            break
-        i += 1
-
-    # 2) CHANGES bölümünden diff hunks + root/fix topla
-    # i şu an CHANGES veya son satırda olabilir; CHANGES başlığını geç
-    while i < n and not _CHANGES_RE.match(lines[i]):
-        i += 1
-    if i < n and _CHANGES_RE.match(lines[i]):
-        i += 1  # "CHANGES" satırını atla
-
-    current_file: str | None = None
-    current_line: int | None = None
-    in_root = False
-    in_fix = False
-    root_lines: list[str] = []
-    fix_lines: list[str] = []
-
-    while i < n:
-        line = lines[i]
-
-        # Bölüm başlıkları
-        if _ROOT_RE.match(line):
-            in_root, in_fix = True, False
-            i += 1
-            continue
-        if _FIX_RE.match(line):
-            in_root, in_fix = False, True
-            i += 1
-            continue
-
-        # Root / Fix içerik
-        if in_root:
-            if _HEADER_RE.match(line) or _FIX_RE.match(line):
-                in_root = False
-                continue
-            root_lines.append(line)
-            i += 1
-            continue
-
-        if in_fix:
-            if _HEADER_RE.match(line) or _ROOT_RE.match(line):
-                in_fix = False
-                continue
-            fix_lines.append(line)
-            i += 1
-            continue
-
-        # Hunk başlığı
-        m = _HEADER_RE.match(line)
-        if m:
-            current_file = m.group("file").strip()
-            try:
-                current_line = int(m.group("line"))
-            except Exception:
-                current_line = None
-
-            if current_file not in code_change:
-                code_change[current_file] = {"code": "", "changes": {}}
-            if current_line is not None:
-                changes = code_change[current_file]["changes"]
-                if str(current_line) not in changes:
-                    changes[str(current_line)] = {"remove": [], "add": []}
-            i += 1
-            continue
-
-        # Hunk içeriği
-        if current_file is not None and current_line is not None:
-            stripped = line.strip()
-
-            # REMOVE
-            if stripped.startswith("- "):
-                code_str = line[line.index("- ") + 2 :] if "- " in line else line.lstrip("-").lstrip()
-                code_change[current_file]["changes"][str(current_line)]["remove"].append(code_str)
-                i += 1
-                continue
-
-            # ADD
-            if stripped.startswith("+ "):
-                code_str = line[line.index("+ ") + 2 :] if "+ " in line else line.lstrip("+").lstrip()
-                code_change[current_file]["changes"][str(current_line)]["add"].append(code_str)
-                i += 1
-                continue
-
-            # Bağlam / boş satır: atla
-            i += 1
-            continue
-
-        i += 1
-
-    # 3) UPDATED FILES içeriğini code_change'e yerleştir
-    for path, full_code in updated_files.items():
-        if path not in code_change:
-            code_change[path] = {"code": full_code, "changes": {}}
-        else:
-            # changes zaten var; code'u ekle
-            code_change[path]["code"] = full_code
-
-    # 4) Boş listeleri temizle
-    for f, obj in code_change.items():
-        changes_map = obj.get("changes", {})
-        for ln, chg in list(changes_map.items()):
-            if not chg["remove"]:
-                chg.pop("remove", None)
-            if not chg["add"]:
-                chg.pop("add", None)
-
-    # 5) Root/Fix metinlerini sıkıştır
-    def _squash(xs: list[str]) -> str:
-        txt = "\n".join([x.rstrip() for x in xs]).strip()
-        return re.sub(r"\n{3,}", "\n\n", txt)
-
-    return {
-        "code_change": code_change,
-        "root": _squash(root_lines),
-        "fix": _squash(fix_lines),
-        "raw": response_text.strip(),
-    }
+    parser = ResponseParser()
+    parser.feed(response_text)
+    return parser.close()
 
 
 # =========================================================
@@ -270,36 +315,244 @@ def analyze_errors_with_llama(
     num_predict: int = 2048,
     timeout: int = 600,
     system_prompt: str | None = None,
+    token_budget: int | None = None,
+    token_estimator: TokenEstimator | None = None,
+    codes_chunks: Iterable[str] | None = None,
+    project_root: str | None = None,
+    fingerprints: Iterable[str] | None = None,
+    context_mode: str | None = None,
+    transport: str = "http",
+    stream: bool = False,
+    cache: ResponseCache | None = None,
+    prefix_reuse: str = "system",
+    retries: int = 3,
+    deadline: float | None = None,
 ):
     """
     🔍 React projesindeki hataları analiz eder ve Llama modeline gönderir.
     Kaynak kodu, tek dosya (ctx_out/ctx_handleLogging_files.txt) olarak alır.
+    - codes_chunks verilirse kod bağlamı ara dosya yerine doğrudan bu parça
+      akışından alınır (örn. find_func.iter_context_chunks)
+    - token_budget verilirse prompt bütçeye göre paketlenir (bkz. prompt_packer);
+      atılan parçalar prompt.json → "packing" altına yazılır
+    - transport: "http" (SSH tüneli üzerinden doğrudan HTTP) ya da "curl"
+    - stream=True ise yanıt parça parça okunur ve 'How to fix:' bölümü
+      kapanınca üretim iptal edilir; TTFT vb. meta.json → "stream" altına yazılır
+    - cache verilirse aynı (model, seçenekler, system, prompt) için önceki yanıt
+      modele gitmeden döner; isabet meta.json → "cache" altına yazılır
+    - prefix_reuse="context": sabit system prompt bir kez değerlendirilip
+      Ollama context dizisiyle yeniden kullanılır; prefill süresi loglanır
+    - ssh bir model_fleet.ModelFleet ise istek en az meşgul sağlıklı host'a
+      yönlendirilir; kullanılan host meta.json → "endpoint" altına yazılır
+    - Her host'ta çağrı en fazla `retries` kez denenir (jitter'lı üstel bekleme);
+      timeout deneme başına, deadline (fleet'te yük devirleri dahil) toplam
+      süre bütçesidir. Arka uç art arda
+      başarısızsa devre kesici çağrıyı hemen reddeder. Başarısızlıkta
+      python_api.ModelCallError yükselir; hata meta.json → "error" altına yazılır
+    - project_root verilirse prompt'taki (`>>> path`) dosyaların o anki
+      normalize hash'leri prompt.json → "source_hashes" altına yazılır; apply
+      aşaması bunlarla arada değişmiş dosyaları tespit eder
+    - context_mode ("file" | "slice" | "log"; verilmezse kod bölümlerinden
+      çıkarılır) prompt.json'a yazılır; dilim bağlamından gelen yanıtın "code"
+      alanı tam dosya değildir, --overwrite bu oturumları reddeder
+    - Oturum <out_dir>/sessions.jsonl kaydına işlenir (bkz. session_registry):
+      "started" → "analyzed" | "failed"; fingerprints (analiz edilen hata
+      kümeleri) verilirse oturum bunlarla da aranabilir
     - Prompt'u txt + JSON olarak kaydeder
     - Yanıtı txt + JSON (file -> {"code": full, "changes": {...}}) olarak kaydeder
     """
+    session = _prepare_session(
+        log_path, codes_file_path, prompt_format_path, model, out_dir, temperature,
+        num_predict, system_prompt, token_budget, token_estimator, codes_chunks,
+        project_root, fingerprints, context_mode,
+    )
+    options = {"temperature": temperature, "num_predict": num_predict}
+    key = response_cache_key(model, options, system_prompt, session["prompt"])
+    res = _cached_result(cache, key)
+    parser = _stream_parser() if stream else None
+    if res is None:
+        if isinstance(ssh, ModelFleet):
+            sender = partial(ssh.send_prompt, attempts=retries, deadline=deadline)
+        else:
+            sender = partial(send_prompt_with_retry, ssh, attempts=retries, deadline=deadline)
+        try:
+            res = sender(
+                prompt=session["prompt"],
+                model=model,
+                options=options,
+                timeout=timeout,
+                system=system_prompt,
+                transport=transport,
+                stream=stream,
+                on_token=parser.feed if parser else None,
+                stop_when=_response_complete if stream else None,
+                prefix_reuse=prefix_reuse,
+            )
+        except ModelCallError as e:
+            _write_failed_session(session, e, model, transport)
+            raise
+    return _finish_session(session, res, model, transport, cache, key, parser)
+
+
+async def analyze_errors_with_llama_async(
+    client,
+    log_path: str,
+    codes_file_path: str = r"ctx_out/ctx_handleLogging_files.txt",
+    prompt_format_path: str = "APP_Api/prompt_format.txt",
+    model: str = "llama3.1:8b",
+    out_dir: str = "error_analysis_reports",
+    temperature: float = 0.1,
+    num_predict: int = 2048,
+    timeout: int = 600,
+    system_prompt: str | None = None,
+    token_budget: int | None = None,
+    token_estimator: TokenEstimator | None = None,
+    codes_chunks: Iterable[str] | None = None,
+    project_root: str | None = None,
+    fingerprints: Iterable[str] | None = None,
+    context_mode: str | None = None,
+    stream: bool = False,
+    cache: ResponseCache | None = None,
+    prefix_reuse: str = "system",
+    retries: int = 3,
+    deadline: float | None = None,
+):
+    """
+    analyze_errors_with_llama'nın asyncio sürümü (client: async_api.AsyncOllamaClient).
+    Prompt hazırlama ve rapor yazma (yerel disk işi) thread'de çalışır; böylece
+    birden çok analiz aynı event loop'ta eşzamanlı yürütülebilir. prefix_reuse,
+    retries ve deadline senkron sürümdeki gibidir (client.breaker kullanılır);
+    taşıma her zaman HTTP'dir:
+
+        async with AsyncOllamaClient.over_ssh(ssh) as client:
+            await asyncio.gather(*(analyze_errors_with_llama_async(client, ...) ...))
+    """
+    session = await asyncio.to_thread(
+        _prepare_session,
+        log_path, codes_file_path, prompt_format_path, model, out_dir, temperature,
+        num_predict, system_prompt, token_budget, token_estimator, codes_chunks,
+        project_root, fingerprints, context_mode,
+    )
+    options = {"temperature": temperature, "num_predict": num_predict}
+    key = response_cache_key(model, options, system_prompt, session["prompt"])
+    res = _cached_result(cache, key)
+    parser = _stream_parser() if stream else None
+    if res is None:
+        try:
+            res = await client.send_prompt_with_retry(
+                session["prompt"],
+                timeout=timeout,
+                attempts=retries,
+                deadline=deadline,
+                model=model,
+                options=options,
+                system=system_prompt,
+                stream=stream,
+                on_token=parser.feed if parser else None,
+                stop_when=_response_complete if stream else None,
+                prefix_reuse=prefix_reuse,
+            )
+        except ModelCallError as e:
+            await asyncio.to_thread(_write_failed_session, session, e, model, "async")
+            raise
+    return await asyncio.to_thread(
+        _finish_session, session, res, model, "async", cache, key, parser
+    )
+
+
+def _stream_parser() -> ResponseParser:
+    """Akış sırasında yanıtı ayrıştırır; her dosya bloğu kapanınca haber verir."""
+    return ResponseParser(
+        on_file=lambda path, code: print(
+            f"[*] {path} hazır ({code.count(chr(10)) + 1} satır)"
+        ),
+        strip=True,
+    )
+
+
+def _cached_result(cache: ResponseCache | None, key: str) -> dict | None:
+    """Önbellekte taze kayıt varsa send_prompt sonucu biçiminde döner."""
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        return None
+    print(f"[*] Cache hit ({key[:12]}) → model çağrısı atlandı")
+    return {
+        "ok": True,
+        "text": entry["response_text"],
+        "raw": "",
+        "stderr": "",
+        "response_struct": copy.deepcopy(entry["response_struct"]),
+        "cache": {
+            "hit": True,
+            "key": key,
+            "age_s": round(time.time() - entry["created"], 1),
+        },
+    }
+
+
+def _new_session_dir(out_dir: str | Path) -> tuple[str, Path]:
+    """
+    analysis_<zaman> klasörünü oluşturur. Zaman mikrosaniye hassasiyetindedir;
+    aynı ada yine de denk gelinirse _1, _2 ... eklenir.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    base = Path(out_dir) / f"analysis_{timestamp}"
+    base.parent.mkdir(parents=True, exist_ok=True)
+    session_dir, n = base, 0
+    while True:
+        try:
+            session_dir.mkdir()
+            return timestamp, session_dir
+        except FileExistsError:
+            n += 1
+            session_dir = base.with_name(f"{base.name}_{n}")
+
+
+def _prepare_session(
+    log_path, codes_file_path, prompt_format_path, model, out_dir, temperature,
+    num_predict, system_prompt, token_budget, token_estimator, codes_chunks,
+    project_root=None, fingerprints=None, context_mode=None,
+) -> dict:
+    """Prompt'u kurar, oturum klasörünü açar ve prompt dosyalarını yazar."""
     log_file = Path(log_path)
     codes_file = Path(codes_file_path)
     prompt_template = Path(prompt_format_path)
 
     if not log_file.exists():
         raise FileNotFoundError(f"Log file not found: {log_file}")
-    if not codes_file.exists():
+    if codes_chunks is None and not codes_file.exists():
         raise FileNotFoundError(f"Codes file not found: {codes_file}")
     if not prompt_template.exists():
         raise FileNotFoundError(f"Prompt format file not found: {prompt_template}")
 
     log_text = _read_text(log_file).strip()
-    codes_block = _read_text(codes_file).strip()
+    codes_source = "stream" if codes_chunks is not None else str(codes_file)
 
     prompt_format = _read_text(prompt_template)
-    prompt = prompt_format.format(
-        log_text=log_text,
-        codes_block=codes_block,
-    )
+    packing = None
+    if token_budget:
+        # Akış verilmişse parçalar bütçeye göre tek tek alınır/atılır
+        prompt, packing = pack_prompt(
+            prompt_format,
+            log_text,
+            codes_chunks if codes_chunks is not None else _read_text(codes_file),
+            token_budget,
+            estimator=token_estimator,
+            system_prompt=system_prompt,
+        )
+    else:
+        codes_block = (
+            "\n".join(codes_chunks) if codes_chunks is not None else _read_text(codes_file)
+        ).strip()
+        prompt = prompt_format.format(
+            log_text=log_text,
+            codes_block=codes_block,
+        )
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    session_dir = Path(out_dir) / f"analysis_{timestamp}"
-    session_dir.mkdir(parents=True, exist_ok=True)
+    if context_mode is None:
+        context_mode = _infer_context_mode(prompt)
+
+    timestamp, session_dir = _new_session_dir(out_dir)
 
     prompt_txt_path = session_dir / "full_prompt.txt"
     _write_text(prompt_txt_path, prompt)
@@ -312,46 +565,154 @@ def analyze_errors_with_llama(
         "system_prompt_present": bool(system_prompt),
         "prompt_text": prompt,
         "log_source": str(log_file),
-        "codes_file": str(codes_file),
+        "codes_file": codes_source,
+        "packing": packing,
+        "context_mode": context_mode,
+        "source_hashes": _source_hashes(prompt, project_root) if project_root else None,
     }
     prompt_json_path = session_dir / "prompt.json"
     _write_text(prompt_json_path, json.dumps(prompt_json, ensure_ascii=False, indent=2))
 
-    print(f"[*] Sending prompt ({len(prompt)} chars) using codes file: {codes_file} ...")
-
-    res = send_prompt(
-        ssh,
-        prompt=prompt,
+    registry = SessionRegistry(session_dir.parent)
+    registry.record(
+        session_dir.name,
+        "started",
+        path=session_dir,
+        fingerprints=fingerprints,
         model=model,
-        options={"temperature": temperature, "num_predict": num_predict},
-        timeout=timeout,
-        system=system_prompt,
+        context_mode=context_mode,
+        prompt_hash=hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
     )
 
+    print(f"[*] Sending prompt ({len(prompt)} chars) using codes: {codes_source} ...")
+    return {
+        "session_dir": session_dir,
+        "prompt": prompt,
+        "log_file": log_file,
+        "codes_source": codes_source,
+        "prompt_txt_path": prompt_txt_path,
+        "prompt_json_path": prompt_json_path,
+        "registry": registry,
+    }
+
+
+def _source_hashes(prompt: str, project_root: str | Path) -> dict[str, str]:
+    """Prompt'a giren her `>>> path` dosyasının şu anki normalize hash'i."""
+    root = Path(project_root)
+    hashes: dict[str, str] = {}
+    for line in prompt.splitlines():
+        if not line.startswith(HEADER_PREFIX):
+            continue
+        rel = line[len(HEADER_PREFIX):].strip()
+        if rel in hashes:
+            continue
+        try:
+            hashes[rel] = normalized_hash((root / rel).read_bytes())
+        except OSError:
+            continue
+    return hashes
+
+
+def _finish_session(
+    session: dict,
+    res: dict,
+    model: str,
+    transport: str,
+    cache: ResponseCache | None = None,
+    cache_key: str | None = None,
+    parser: ResponseParser | None = None,
+) -> dict:
+    """
+    Model yanıtını ayrıştırır; response.* ve meta.json dosyalarını yazar.
+    parser: akış sırasında beslenmiş ResponseParser; metin aynıysa (iptal/yeniden
+    deneme ile kırpılmadıysa) yanıt ikinci kez ayrıştırılmaz.
+    """
+    session_dir = session["session_dir"]
+    metrics = res.get("metrics")
+    if metrics:
+        print(
+            f"[*] Prefill: {metrics.get('prompt_eval_count')} tokens in "
+            f"{metrics.get('prompt_eval_ms')} ms • generate: {metrics.get('eval_count')} "
+            f"tokens in {metrics.get('eval_ms')} ms"
+        )
+    if res.get("stream"):
+        st = res["stream"]
+        print(
+            f"[*] Streamed {st['chunks']} chunks • TTFT {st['ttft']}s • "
+            f"total {st['total']}s" + (" • cancelled early" if st["cancelled"] else "")
+        )
+
     response_text = (res.get("text") or "").strip() or "_(no response)_"
     response_txt_path = session_dir / "response.txt"
     _write_text(response_txt_path, response_text)
 
-    response_struct = _parse_model_response_to_struct(response_text)
+    cache_info = res.get("cache")
+    if cache_info is not None:
+        response_struct = res["response_struct"]
+    else:
+        if parser is not None and parser.text.strip() == response_text:
+            response_struct = parser.close()
+        else:
+            response_struct = _parse_model_response_to_struct(response_text)
+        if cache is not None and res.get("ok"):
+            cache.put(cache_key, model, response_text, copy.deepcopy(response_struct))
+        if cache is not None:
+            cache_info = {"hit": False, "key": cache_key}
     response_json_path = session_dir / "response.json"
     _write_text(response_json_path, json.dumps(response_struct, ensure_ascii=False, indent=2))
 
     meta = {
-        "log_file": str(log_file),
-        "codes_file": str(codes_file),
+        "log_file": str(session["log_file"]),
+        "codes_file": session["codes_source"],
         "model": model,
-        "prompt_file_txt": str(prompt_txt_path),
-        "prompt_file_json": str(prompt_json_path),
+        "transport": transport,
+        "prompt_file_txt": str(session["prompt_txt_path"]),
+        "prompt_file_json": str(session["prompt_json_path"]),
         "response_file_txt": str(response_txt_path),
         "response_file_json": str(response_json_path),
         "stderr": res.get("stderr", ""),
+        "stream": res.get("stream"),
+        "cache": cache_info,
+        "metrics": metrics,
+        "prefix": res.get("prefix"),
+        "endpoint": res.get("endpoint"),
+        "retry": res.get("retry"),
     }
     _write_text(session_dir / "meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+    session["registry"].record(
+        session_dir.name,
+        "analyzed",
+        path=session_dir,
+        ok=bool(res.get("ok")),
+        response_hash=hashlib.sha256(response_text.encode("utf-8")).hexdigest(),
+        files=len(response_struct.get("code_change") or {}),
+        endpoint=res.get("endpoint"),
+    )
 
     print(f"[✓] Analysis complete. Reports saved to: {session_dir}")
     return response_struct
 
 
+def _write_failed_session(session: dict, error: ModelCallError, model: str, transport: str) -> None:
+    """Model çağrısı başarısız olduğunda sadece meta.json (hata ayrıntısıyla) yazılır."""
+    meta = {
+        "log_file": str(session["log_file"]),
+        "codes_file": session["codes_source"],
+        "model": model,
+        "transport": transport,
+        "prompt_file_txt": str(session["prompt_txt_path"]),
+        "prompt_file_json": str(session["prompt_json_path"]),
+        "error": error.to_dict(),
+    }
+    _write_text(
+        session["session_dir"] / "meta.json", json.dumps(meta, ensure_ascii=False, indent=2)
+    )
+    session["registry"].record(
+        session["session_dir"].name, "failed", path=session["session_dir"], error=error.kind
+    )
+    print(f"[✗] Model çağrısı başarısız ({error}); rapor: {session['session_dir']}")
+
+
 # =========================================================
 # 🧪 CLI (doğrudan çalıştırmak için)
 # =========================================================
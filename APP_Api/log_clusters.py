@@ -0,0 +1,196 @@
+# filename: log_clusters.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from find_func import StackFrame, parse_log_entries
+
+# ---------- Ayarlar ----------
+FINGERPRINT_FRAMES = 5  # kimlik için en üstteki N frame (derin React çağrıları değişkendir)
+STORE_VERSION = 1
+
+_HASH_SEGMENT_RE = re.compile(r"\.[0-9a-f]{8,}(?=\.)", re.IGNORECASE)  # main.3e6e750b.js
+_HEX_RE = re.compile(r"\b(?:0x)?[0-9a-f]{8,}\b", re.IGNORECASE)
+_NUM_RE = re.compile(r"\b\d+\b")
+_URL_RE = re.compile(r"\b[a-z][\w+.-]*://[^\s'\")]+", re.IGNORECASE)
+
+
+# ---------- Normalizasyon ----------
+def normalize_url(url: str) -> str:
+    """Şema/host/port ve sorgu atılır, dosya adındaki build hash'leri silinir."""
+    path = urlsplit(url).path if "://" in url else url.split("?", 1)[0]
+    return _HASH_SEGMENT_RE.sub("", path)
+
+
+def normalize_frame(frame: StackFrame, with_position: bool = False) -> str:
+    """`func@/static/js/main.hot-update.js` (with_position: `...:line:col`)."""
+    out = f"{frame.func or '<anonymous>'}@{normalize_url(frame.url)}"
+    return f"{out}:{frame.line}:{frame.col}" if with_position else out
+
+
+def normalize_message(message: str) -> str:
+    msg = _URL_RE.sub(lambda m: normalize_url(m.group()), message)
+    msg = _HEX_RE.sub("<hash>", msg)
+    return _NUM_RE.sub("<n>", msg).strip()
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# ---------- Kayıt / küme ----------
+def fingerprint_entry(entry: dict) -> dict:
+    """
+    parse_log_entries kaydını yapılandırılmış kayda çevirir:
+        {"timestamp", "level", "message", "frames": [normalize edilmiş], "raw",
+         "fingerprint", "variant"}
+    fingerprint: seviye + normalize mesaj + ilk FINGERPRINT_FRAMES frame (konumsuz)
+    variant:     aynı frame'ler konumlarıyla (kod değişip hata kayınca farklılaşır)
+    """
+    top = entry["frames"][:FINGERPRINT_FRAMES]
+    message = normalize_message(entry["message"])
+    level = entry.get("level") or ""
+    return {
+        "timestamp": entry.get("timestamp"),
+        "level": level,
+        "message": message,
+        "frames": [normalize_frame(f) for f in entry["frames"]],
+        "raw": entry["raw"],
+        "fingerprint": _digest(level, message, *(normalize_frame(f) for f in top)),
+        "variant": _digest(
+            level, message, *(normalize_frame(f, with_position=True) for f in top)
+        ),
+    }
+
+
+def cluster_entries(entries: Iterable[dict]) -> Dict[str, dict]:
+    """
+    Kayıtları fingerprint'e göre kümeler (ilk görülme sırasıyla):
+        {fp: {"fingerprint", "variant", "level", "message", "frames", "count",
+              "first_seen", "last_seen", "sample"}}
+    variant/frames/sample kümenin en son kaydından alınır.
+    """
+    clusters: Dict[str, dict] = {}
+    for entry in entries:
+        rec = fingerprint_entry(entry)
+        c = clusters.get(rec["fingerprint"])
+        if c is None:
+            clusters[rec["fingerprint"]] = {
+                "fingerprint": rec["fingerprint"],
+                "variant": rec["variant"],
+                "level": rec["level"],
+                "message": rec["message"],
+                "frames": rec["frames"],
+                "count": 1,
+                "first_seen": rec["timestamp"],
+                "last_seen": rec["timestamp"],
+                "sample": rec["raw"],
+            }
+            continue
+        c["count"] += 1
+        c["last_seen"] = rec["timestamp"] or c["last_seen"]
+        c["variant"] = rec["variant"]
+        c["frames"] = rec["frames"]
+        c["sample"] = rec["raw"]
+    return clusters
+
+
+def cluster_log(log_text: str) -> Dict[str, dict]:
+    return cluster_entries(parse_log_entries(log_text))
+
+
+# ---------- Kalıcı durum ----------
+class ClusterStore:
+    """
+    Analiz edilmiş kümelerin kaydı (JSON):
+        {"version", "clusters": {fp: {"variant", "count", "first_seen", "last_seen",
+                                      "analyzed_at", "message"}}}
+    Hiç analiz edilmemiş (yeni) ya da variant'ı değişmiş kümeler modele gider.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.clusters: Dict[str, dict] = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == STORE_VERSION:
+                self.clusters = data.get("clusters") or {}
+        except Exception:
+            pass
+
+    def select(self, clusters: Dict[str, dict]) -> Tuple[List[dict], List[dict]]:
+        """Dönen: (gönderilecek [yeni+değişmiş], atlanan) — her kümeye "status" eklenir."""
+        pending: List[dict] = []
+        skipped: List[dict] = []
+        for fp, c in clusters.items():
+            known = self.clusters.get(fp)
+            if known is None:
+                c["status"] = "new"
+            elif known.get("variant") != c["variant"]:
+                c["status"] = "changed"
+            else:
+                c["status"] = "known"
+                skipped.append(c)
+                continue
+            pending.append(c)
+        return pending, skipped
+
+    def mark_analyzed(self, clusters: Iterable[dict], session: Optional[str] = None) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        for c in clusters:
+            rec = self._merge(c)
+            rec["analyzed_at"] = now
+            rec["session"] = session
+
+    def touch(self, clusters: Iterable[dict]) -> None:
+        """Atlanan (bilinen) kümelerin sayaç ve last_seen bilgisini günceller."""
+        for c in clusters:
+            self._merge(c)
+
+    def _merge(self, c: dict) -> dict:
+        """
+        Kümeyi mevcut kayıtla birleştirir: sayaçlar toplanır, en erken first_seen
+        ve en geç last_seen korunur. Her çağrının sadece yeni kayıtları gördüğü
+        varsayılır (--log-checkpoint ile okunan log bölümü).
+        """
+        rec = self.clusters.setdefault(c["fingerprint"], {})
+        rec.update(
+            variant=c["variant"],
+            message=c["message"],
+            count=rec.get("count", 0) + c["count"],
+            first_seen=_earliest(rec.get("first_seen"), c["first_seen"]),
+            last_seen=_latest(rec.get("last_seen"), c["last_seen"]),
+        )
+        return rec
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"version": STORE_VERSION, "clusters": self.clusters},
+                       ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+
+def _earliest(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    return min(a, b) if a and b else (a or b)
+
+
+def _latest(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    return max(a, b) if a and b else (a or b)
+
+
+def write_cluster_log(clusters: Iterable[dict], out_path: Path) -> int:
+    """Her kümeden en son ham kaydı (tek örnek) log biçiminde yazar. Dönen: küme sayısı."""
+    samples = [c["sample"] for c in clusters]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text("\n".join(samples) + ("\n" if samples else ""), encoding="utf-8")
+    return len(samples)
@@ -0,0 +1,106 @@
+# filename: log_tailer.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+# ---------- Ayarlar ----------
+CHECKPOINT_VERSION = 1
+HEAD_BYTES = 256  # dosya başı parmak izi: aynı inode'da yeniden yazılmayı yakalar
+
+
+def _head_digest(f, length: int) -> str:
+    f.seek(0)
+    return hashlib.sha1(f.read(length)).hexdigest()
+
+
+class LogTailer:
+    """
+    log.txt'yi kaldığı yerden okur; konum checkpoint dosyasında saklanır:
+        {"version", "path", "dev", "inode", "size", "offset", "head", "head_len"}
+
+    - inode/dev değiştiyse (rotasyon) ya da dosya offset'ten küçükse (truncate)
+      ya da ilk HEAD_BYTES byte değiştiyse (yerinde yeniden yazma) baştan okunur
+    - Sadece offset'ten sonra eklenen byte'lar okunur (seek); yarım kalan son
+      satır bir sonraki tura bırakılır
+    - Yeni konum ancak commit() ile kalıcı olur: analiz başarısızsa aynı
+      bölüm bir sonraki turda tekrar okunur
+    """
+
+    def __init__(self, log_path: Path, checkpoint_path: Path):
+        self.log_path = Path(log_path)
+        self.checkpoint_path = Path(checkpoint_path)
+        self.state = self._load()
+        self._pending: Optional[dict] = None
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        if (
+            data.get("version") != CHECKPOINT_VERSION
+            or data.get("path") != str(self.log_path.resolve())
+        ):
+            return {}
+        return data
+
+    def read_new(self) -> Tuple[str, dict]:
+        """
+        Son commit'ten beri eklenen tam satırları döner.
+        Dönen: (metin, bilgi) ; bilgi = {"start", "end", "size", "reset"}
+        reset: None | "new" | "rotated" | "truncated" | "rewritten"
+        """
+        st = self.log_path.stat()
+        prev = self.state
+        reset = None
+        offset = prev.get("offset", 0)
+        with open(self.log_path, "rb") as f:
+            head_len = min(st.st_size, HEAD_BYTES)
+            head = _head_digest(f, head_len)
+            prev_len = prev.get("head_len", 0)
+            if not prev:
+                reset = "new"
+            elif (prev.get("dev"), prev.get("inode")) != (st.st_dev, st.st_ino):
+                reset = "rotated"
+            elif st.st_size < offset:
+                reset = "truncated"
+            elif prev_len and prev.get("head") != (
+                head if prev_len == head_len else _head_digest(f, prev_len)
+            ):
+                reset = "rewritten"
+            if reset:
+                offset = 0
+
+            data = b""
+            if st.st_size > offset:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+                cut = data.rfind(b"\n") + 1  # yarım satırı bekle
+                data = data[:cut]
+
+        end = offset + len(data)
+        self._pending = {
+            "version": CHECKPOINT_VERSION,
+            "path": str(self.log_path.resolve()),
+            "dev": st.st_dev,
+            "inode": st.st_ino,
+            "size": st.st_size,
+            "offset": end,
+            "head": head,
+            "head_len": head_len,
+        }
+        info = {"start": offset, "end": end, "size": st.st_size, "reset": reset}
+        return data.decode("utf-8", errors="ignore"), info
+
+    def commit(self) -> None:
+        """read_new ile okunan bölümü işlenmiş say; checkpoint'i atomik yazar."""
+        if self._pending is None:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(json.dumps(self._pending, indent=2), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+        self.state, self._pending = self._pending, None
@@ -1,11 +1,14 @@
 # filename: APP_Api/main.py
 from __future__ import annotations
 import argparse
+import asyncio
 import json
 import sys
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 # --- Proje kökü ve APP_Api yolunu tespit et ---
 APP_API_DIR = Path(__file__).resolve().parent
@@ -19,33 +22,62 @@ if str(APP_API_DIR) not in sys.path:
     sys.path.insert(0, str(APP_API_DIR))
 
 # --- Modüller ---
-from find_func import collect_context, DEFAULT_EXTS  # repo kökünde (ctx_out üreten)
-from llama_error_analysis import analyze_errors_with_llama  # APP_Api içinde
-
-# Eski diff-tabanlı uygulama istersen kalsın (gerekmezse kaldırabilirsin)
-# from apply_code_changes import apply_code_changes
+from find_func import (  # repo kökünde (ctx_out üreten)
+    collect_context,
+    collect_context_from_log,
+    iter_context_chunks,
+    iter_context_chunks_from_log,
+    symbol_out_path,
+    DEFAULT_EXTS,
+)
+from llama_error_analysis import (  # APP_Api içinde
+    analyze_errors_with_llama,
+    analyze_errors_with_llama_async,
+)
+
+# Diff modu: CHANGES hunk'larını yerinde uygular; --overwrite: tam dosya yazar
+from apply_code_changes import apply_code_changes
 from apply_code_changes import apply_code_overwrite  # 👈 yeni: tam overwrite
-from python_api import connect_ssh
+from backup_store import BackupStore
+from session_registry import SessionRegistry
+from python_api import ModelCallError, close_ssh_managers, get_ssh_manager
+from model_fleet import ModelFleet, load_fleet_config, parse_hosts
+from async_api import AsyncOllamaClient
+from response_cache import ResponseCache
+from log_clusters import ClusterStore, cluster_log, write_cluster_log
+from log_tailer import LogTailer
+from find_func import parse_log_entries
+from sourcemap import get_source_map_resolver
+
 
+def find_latest_analysis_dir(root_dir: str | Path, successful: bool = False) -> Path | None:
+    """En son analysis_* klasörünü bul.
 
-def find_latest_analysis_dir(root_dir: str | Path) -> Path | None:
-    """En son oluşturulan analysis_* klasörünü bul.
+    Önce oturum kaydına (session_registry) bakılır; klasör listelenmez.
+    Kayıtta uygun oturum yoksa (kayıttan önceki raporlar) klasörler taranır.
 
     Args:
         root_dir: Analiz klasörlerinin bulunduğu ana dizin
+        successful: True ise sadece yanıtı yazılmış (analyzed/applied) oturumlar
 
     Returns:
-        En son oluşturulan analysis_* klasörünün yolu, ya da None
+        En son analysis_* klasörünün yolu, ya da None
     """
     root_dir = Path(root_dir)
     if not root_dir.exists():
         return None
 
-    # analysis_YYYYMMDD_HHMMSS formatındaki klasörleri bul
+    rec = SessionRegistry(root_dir).latest(successful=successful)
+    if rec is not None:
+        return Path(rec.get("path") or root_dir / rec["session"])
+
+    # analysis_YYYYMMDD_HHMMSS[_ffffff] formatındaki klasörleri bul
     pattern = re.compile(r"analysis_\d{8}_\d{6}")
     analysis_dirs = [
         d for d in root_dir.iterdir() if d.is_dir() and pattern.match(d.name)
     ]
+    if successful:
+        analysis_dirs = [d for d in analysis_dirs if (d / "response.json").exists()]
 
     if not analysis_dirs:
         return None
@@ -57,9 +89,16 @@ def find_latest_analysis_dir(root_dir: str | Path) -> Path | None:
 
 def run_pipeline(
     project_root: Path,
-    target_symbol: str,
+    target_symbols: Optional[List[str]],
     log_path: Path,
     codes_out_path: Path,
+    index_path: Optional[Path],
+    workers: Optional[int],
+    collect_mode: str,
+    split_targets: bool,
+    stream_ctx: bool,
+    sourcemap_cache: Optional[Path],
+    fetch_sourcemaps: bool,
     prompt_format_path: Path,
     system_prompt_path: Optional[Path],
     ssh_host: str,
@@ -67,48 +106,162 @@ def run_pipeline(
     ssh_user: str,
     ssh_key_path: Path,
     ssh_passfile_path: Optional[Path],
+    fleet: Optional[ModelFleet],
     model: str,
     out_dir: Path,
     temperature: float,
     num_predict: int,
     timeout: int,
+    transport: str,
+    stream: bool,
+    concurrency: int,
+    response_cache: Optional[ResponseCache],
+    clusters_path: Optional[Path],
+    log_checkpoint_path: Optional[Path],
+    prefix_reuse: str,
+    retries: int,
+    deadline: Optional[float],
+    token_budget: Optional[int],
     do_collect: bool,
     do_analyze: bool,
     do_apply: bool,
     dry_run: bool,
     window: int,
+    atomic: bool,
     use_overwrite: bool,  # 👈 eklendi
+    backups: BackupStore,
+    backup_keep: Optional[int],
+    on_conflict: str,
 ) -> None:
     print("=== Llama Error Analysis • Orchestrator ===")
 
+    # 0a) Log'un sadece son turdan beri eklenen kısmı okunur
+    tailer = None
+    log_text: Optional[str] = None
+    if log_checkpoint_path and do_analyze:
+        tailer = LogTailer(log_path, log_checkpoint_path)
+        log_text, info = tailer.read_new()
+        new_entries = len(parse_log_entries(log_text))
+        print(
+            f"[0/3] Tail → {log_path.name} [{info['start']}:{info['end']}] "
+            f"{new_entries} yeni kayıt" + (f" ({info['reset']})" if info["reset"] else "")
+        )
+        if not new_entries:
+            tailer.commit()
+            print("    Yeni log kaydı yok, toplama ve analiz atlandı.")
+            do_collect = do_analyze = False
+        else:
+            log_path = codes_out_path.parent / "log_new.txt"
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            log_path.write_text(log_text, encoding="utf-8")
+
+    # 0b) Hata kümeleri: sadece yeni/değişmiş kümeler modele gider
+    cluster_store = pending_clusters = None
+    if clusters_path and do_analyze:
+        cluster_store = ClusterStore(clusters_path)
+        if log_text is None:
+            log_text = log_path.read_text(encoding="utf-8", errors="ignore")
+        clusters = cluster_log(log_text)
+        pending_clusters, skipped = cluster_store.select(clusters)
+        cluster_store.touch(skipped)
+        print(
+            f"[0/3] Dedupe → {len(clusters)} küme: "
+            f"{sum(c['status'] == 'new' for c in pending_clusters)} yeni, "
+            f"{sum(c['status'] == 'changed' for c in pending_clusters)} değişmiş, "
+            f"{len(skipped)} zaten analiz edildi"
+        )
+        if not pending_clusters:
+            cluster_store.save()
+            if tailer is not None:
+                tailer.commit()
+            print("    Yeni hata yok, toplama ve analiz atlandı.")
+            do_collect = do_analyze = False
+        else:
+            # Collect ve analiz, her kümeden tek örnek içeren log ile çalışır
+            log_path = codes_out_path.parent / "log_clusters.txt"
+            write_cluster_log(pending_clusters, log_path)
+            (codes_out_path.parent / "log_clusters.json").write_text(
+                json.dumps(pending_clusters, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+
+    # Sembol başına ayrı bağlam dosyası istenirse her biri ayrı analiz edilir
+    codes_sources = (
+        [(symbol_out_path(codes_out_path, sym), [sym]) for sym in target_symbols]
+        if target_symbols and split_targets
+        else [(codes_out_path, target_symbols)]
+    )
+    codes_files = [path for path, _ in codes_sources]
+    sourcemaps = get_source_map_resolver(
+        project_root, cache_dir=sourcemap_cache, fetch_remote=fetch_sourcemaps
+    )
+
+    def _context_chunks(symbols: Optional[List[str]]):
+        if not symbols:
+            return iter_context_chunks_from_log(
+                project_root, log_path, DEFAULT_EXTS, index_path, sourcemaps
+            )
+        return iter_context_chunks(
+            project_root, symbols, DEFAULT_EXTS, index_path, workers, collect_mode
+        )
+
+    # --stream-ctx: bağlam ara dosyaya yazılmadan doğrudan prompt'a akar
+    stream_to_prompt = stream_ctx and do_analyze and do_collect
+    if stream_to_prompt:
+        print("[1/3] Collect → streamed into the analysis prompt (no ctx file)")
+
     # 1) Topla
-    if do_collect:
-        print(f"[1/3] Collect → {project_root}  target={target_symbol}")
-        count = collect_context(
-            project_root, target_symbol, codes_out_path, exts=DEFAULT_EXTS
+    if stream_to_prompt:
+        pass
+    elif do_collect and not target_symbols:
+        # Hedef verilmediyse log'daki stack frame'lerinden çöz
+        print(f"[1/3] Collect → {project_root}  stack frames ← {log_path.name}")
+        count = collect_context_from_log(
+            project_root,
+            log_path,
+            codes_out_path,
+            exts=DEFAULT_EXTS,
+            index_path=index_path,
+            sourcemaps=sourcemaps,
         )
         print(f"    ✓ {count} dosya → {codes_out_path}")
+    elif do_collect:
+        print(
+            f"[1/3] Collect → {project_root}  "
+            f"target={','.join(target_symbols)}  mode={collect_mode}"
+        )
+        count = collect_context(
+            project_root,
+            target_symbols,
+            codes_out_path,
+            exts=DEFAULT_EXTS,
+            index_path=index_path,
+            workers=workers,
+            mode=collect_mode,
+            merge=not split_targets,
+        )
+        print(f"    ✓ {count} dosya → {', '.join(str(p) for p in codes_files)}")
 
     # 2) Analiz
     if do_analyze:
         print(f"[2/3] Analyze → prompt oluşturuluyor")
-        ssh = connect_ssh(
+        # Süreç içinde paylaşılan kalıcı bağlantı (--loop'ta her turda yeniden kullanılır)
+        # Birden çok model host'u tanımlıysa istekler fleet üzerinden dağıtılır
+        ssh = fleet or get_ssh_manager(
             ssh_host,
             ssh_port,
             ssh_user,
             str(ssh_key_path),
             str(ssh_passfile_path) if ssh_passfile_path else None,
         )
-        try:
-            system_prompt = (
-                system_prompt_path.read_text(encoding="utf-8")
-                if (system_prompt_path and system_prompt_path.exists())
-                else None
-            )
-            analyze_errors_with_llama(
-                ssh=ssh,
+        system_prompt = (
+            system_prompt_path.read_text(encoding="utf-8")
+            if (system_prompt_path and system_prompt_path.exists())
+            else None
+        )
+        analysis_kwargs = [
+            dict(
                 log_path=str(log_path),
-                codes_file_path=str(codes_out_path),
+                codes_file_path=str(codes_file),
                 prompt_format_path=str(prompt_format_path),
                 model=model,
                 out_dir=str(out_dir),
@@ -116,17 +269,95 @@ def run_pipeline(
                 num_predict=num_predict,
                 timeout=timeout,
                 system_prompt=system_prompt,
+                token_budget=token_budget,
+                stream=stream,
+                cache=response_cache,
+                codes_chunks=_context_chunks(symbols) if stream_to_prompt else None,
+                project_root=str(project_root),
+                fingerprints=(
+                    [c["fingerprint"] for c in pending_clusters] if pending_clusters else None
+                ),
+                # Bu turda toplanmadıysa mod prompt'taki bölümlerden çıkarılır
+                context_mode=(
+                    (collect_mode if symbols else "log")
+                    if (do_collect or stream_to_prompt)
+                    else None
+                ),
+            )
+            for codes_file, symbols in codes_sources
+        ]
+        try:
+            if concurrency > 1 and len(analysis_kwargs) > 1 and fleet is not None:
+                # Birden çok bağlam dosyası: host'lara dağıtılmış eşzamanlı istekler
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    futures = [
+                        pool.submit(
+                            analyze_errors_with_llama,
+                            ssh=fleet,
+                            transport=transport,
+                            prefix_reuse=prefix_reuse,
+                            retries=retries,
+                            deadline=deadline,
+                            **kw,
+                        )
+                        for kw in analysis_kwargs
+                    ]
+                    for f in futures:
+                        f.result()
+            elif concurrency > 1 and len(analysis_kwargs) > 1 and transport == "http":
+                # Birden çok bağlam dosyası: aynı Ollama'ya eşzamanlı istekler
+                # (async istemci sadece HTTP taşır; curl sıralı yoldan gider)
+                asyncio.run(
+                    _analyze_concurrently(
+                        ssh,
+                        analysis_kwargs,
+                        concurrency,
+                        prefix_reuse=prefix_reuse,
+                        retries=retries,
+                        deadline=deadline,
+                    )
+                )
+            else:
+                for kwargs in analysis_kwargs:
+                    analyze_errors_with_llama(
+                        ssh=ssh,
+                        transport=transport,
+                        prefix_reuse=prefix_reuse,
+                        retries=retries,
+                        deadline=deadline,
+                        **kwargs,
+                    )
+        except ModelCallError as e:
+            # Log/küme durumu ilerletilmez: aynı hatalar bir sonraki turda tekrar denenir
+            print(f"\n[!] Model kullanılamıyor ({e.kind}), analiz atlandı: {e.message}")
+            if e.retry_after:
+                print(f"    Tekrar denemeden önce ~{e.retry_after}s beklenmeli.")
+            return
+        if fleet is not None:
+            stats = fleet.stats()
+            for name, st in stats.items():
+                print(
+                    f"    {name}: {st['requests']} istek, {st['failures']} hata, "
+                    f"ewma {st['ewma_ms']} ms" + ("" if st["healthy"] else " (sağlıksız)")
+                )
+            out_dir.mkdir(parents=True, exist_ok=True)
+            (out_dir / "fleet_stats.json").write_text(
+                json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8"
             )
-        finally:
-            ssh.close()
+        if cluster_store is not None:
+            session = SessionRegistry(out_dir).by_fingerprint(pending_clusters[0]["fingerprint"])
+            cluster_store.mark_analyzed(pending_clusters, session)
+            cluster_store.save()
+        if tailer is not None:
+            tailer.commit()  # analiz başarısız olursa aynı bölüm tekrar okunur
 
     # 3) Uygula
     if do_apply:
         print(f"[3/3] Apply → son analiz klasörü aranıyor: {out_dir}")
-        latest = find_latest_analysis_dir(out_dir)
+        latest = find_latest_analysis_dir(out_dir, successful=True)
         if not latest:
             raise FileNotFoundError(
-                f"❌ {out_dir} klasöründe analysis_* formatında klasör bulunamadı.\n"
+                f"❌ {out_dir} klasöründe tamamlanmış analysis_* klasörü bulunamadı.\n"
                 "   Önce bir analiz çalıştırmanız gerekiyor."
             )
         response_json = latest / "response.json"
@@ -135,16 +366,26 @@ def run_pipeline(
                 f"❌ Response dosyası bulunamadı: {response_json}\n"
                 "   Bu klasörde bir analiz tamamlanmamış olabilir."
             )
+        # --loop: yeni analiz yoksa aynı oturum tekrar gelir; eklemeli hunk'lar
+        # idempotent değil, uygulanmış oturum ikinci kez uygulanmaz.
+        if not dry_run and SessionRegistry(out_dir).status(latest.name) == "applied":
+            print(f"↷ {latest.name} zaten uygulanmış; yeni analiz yok, apply atlandı")
+            do_apply = False
+
+    if do_apply:
         print(f"✓ Son analiz kullanılıyor: {latest.name}")
         print(f"  Response dosyası: {response_json.name}")
 
         if use_overwrite:
             # ✅ Tam dosya overwrite modu (JSON'daki code_change.{path}.code)
-            updated = apply_code_overwrite(
+            result = apply_code_overwrite(
                 response_path=response_json,  # response.json konumu
                 repo_root=project_root,  # kod değişikliği için proje kökü
+                backups=backups,
+                on_conflict=on_conflict,
             )
-            summary = {"mode": "overwrite", "updated_files": updated}
+            updated = result["updated_files"]
+            summary = {"mode": "overwrite", **result}
 
             # Son analiz klasöründe old_code ve new_code kayıtları var
             if updated:
@@ -152,16 +393,25 @@ def run_pipeline(
                 print(f"  Eski kodlar → {latest}/code/old_code/")
                 print(f"  Yeni kodlar → {latest}/code/new_code/")
         else:
-            # 🧩 İstersen diff tabanlı modla uygulamak için aşağıyı aktifleştir
-            # report = apply_code_changes(
-            #     response_json_path=response_json,
-            #     repo_root=project_root,
-            #     dry_run=dry_run,
-            #     window=window,
-            # )
-            # summary = {"mode": "diff", **report}
-            raise SystemExit(
-                "Diff modu devre dışı. Tam dosya güncelleme için --overwrite kullanın."
+            # 🧩 Diff modu: sadece hunk'ların dokunduğu satırlar değişir
+            report = apply_code_changes(
+                response_json_path=response_json,
+                repo_root=project_root,
+                dry_run=dry_run,
+                window=window,
+                atomic=atomic,
+                backups=backups,
+                on_conflict=on_conflict,
+            )
+            summary = {"mode": "diff", **report}
+
+        if not dry_run:
+            SessionRegistry(out_dir).record(
+                latest.name,
+                "applied",
+                path=latest,
+                mode=summary["mode"],
+                conflicts=len(summary.get("conflicts") or ()) or None,
             )
 
         summary_path = latest / (
@@ -173,17 +423,40 @@ def run_pipeline(
             json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
         )
         print(f"    ✓ summary → {summary_path}")
+        if not dry_run:
+            print(f"    ✓ yedek → {backups.root} (geri almak için: --restore {latest.name})")
+            if backup_keep:
+                backups.prune(keep=backup_keep)
 
     print("\n[✓] Done.")
 
 
+async def _analyze_concurrently(
+    ssh, analysis_kwargs: List[dict], concurrency: int, **common
+) -> None:
+    async with AsyncOllamaClient.over_ssh(ssh, max_concurrency=concurrency) as client:
+        await asyncio.gather(
+            *(analyze_errors_with_llama_async(client, **kw, **common) for kw in analysis_kwargs)
+        )
+
+
 def parse_args(argv=None):
     ap = argparse.ArgumentParser(
         description="Collect → Analyze → Apply runner (paths adapted to your tree)"
     )
     # Yol varsayılanları ağaç yapına göre
     ap.add_argument("--project", default=str(REPO_ROOT / "TESTS_Main" / "myapp"))
-    ap.add_argument("--target", default="handleLogging")
+    ap.add_argument(
+        "--target",
+        default=None,
+        help="Symbol(s) to collect, comma separated; omit to resolve files from "
+        "the log's stack frames",
+    )
+    ap.add_argument(
+        "--split-targets",
+        action="store_true",
+        help="With several --target symbols, write and analyze one context file each",
+    )
     ap.add_argument(
         "--log-path",
         default=str(REPO_ROOT / "TESTS_Main" / "myapp" / "src" / "log.txt"),
@@ -193,6 +466,38 @@ def parse_args(argv=None):
         "--codes-out",
         default=str(REPO_ROOT / "ctx_out" / "ctx_handleLogging_files.txt"),
     )
+    ap.add_argument(
+        "--index-path",
+        default=str(REPO_ROOT / "ctx_out" / "symbol_index.db"),
+        help="Persistent identifier -> files index (only changed files are re-read)",
+    )
+    ap.add_argument("--no-index", action="store_true")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Collect scan processes (1 = serial, 0 = one per CPU)",
+    )
+    ap.add_argument(
+        "--slice",
+        action="store_true",
+        help="Collect only the target's definition, call sites, enclosing bodies and imports",
+    )
+    ap.add_argument(
+        "--sourcemap-cache",
+        default=str(REPO_ROOT / "ctx_out" / "sourcemaps"),
+        help="Decoded source maps, cached by .map content hash",
+    )
+    ap.add_argument(
+        "--fetch-sourcemaps",
+        action="store_true",
+        help="Download <bundle-url>.map from the dev server when not on disk",
+    )
+    ap.add_argument(
+        "--stream-ctx",
+        action="store_true",
+        help="Feed collected chunks straight into the prompt builder (no ctx file)",
+    )
     ap.add_argument("--prompt-format", default=str(APP_API_DIR / "prompt_format.txt"))
     ap.add_argument("--system-prompt", default=str(APP_API_DIR / "system_prompt.txt"))
 
@@ -201,24 +506,159 @@ def parse_args(argv=None):
     ap.add_argument("--user", default="root")
     ap.add_argument("--key", default=str(APP_API_DIR / "llama_ssh.txt"))
     ap.add_argument("--passfile", default=str(APP_API_DIR / "passphrase.txt"))
+    ap.add_argument(
+        "--hosts",
+        nargs="+",
+        default=None,
+        metavar="USER@HOST:PORT[,max=N][,api=URL]",
+        help="Model endpoints to load-balance across (overrides [FLEET] in --model-config)",
+    )
+    ap.add_argument(
+        "--model-config",
+        default=str(APP_API_DIR / "model_config.txt"),
+        help="Read the [FLEET] endpoint list from this file when --hosts is not given",
+    )
 
     ap.add_argument("--model", default="llama3.1:8b")
     ap.add_argument("--out-dir", default=str(REPO_ROOT / "error_analysis_reports"))
     ap.add_argument("--temperature", type=float, default=0.1)
     ap.add_argument("--num-predict", type=int, default=2048)
     ap.add_argument("--timeout", type=int, default=600)
+    ap.add_argument(
+        "--transport",
+        choices=("http", "curl"),
+        default="http",
+        help="http: talk to Ollama over an SSH direct-tcpip tunnel; curl: run curl remotely",
+    )
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream tokens from Ollama and stop once the 'How to fix:' section is done",
+    )
+    ap.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Attempts per model call (jittered exponential backoff between them)",
+    )
+    ap.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Total time budget for one model call including retries "
+        "(--timeout applies per attempt)",
+    )
+    ap.add_argument(
+        "--prefix-reuse",
+        choices=("system", "context"),
+        default="system",
+        help="context: evaluate the system prompt once and reuse Ollama's context tokens",
+    )
+    ap.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="With --split-targets, run up to N analyses against Ollama at once "
+        "(asyncio over HTTP; with --transport curl they run one by one)",
+    )
+    ap.add_argument(
+        "--cache-dir",
+        default=str(REPO_ROOT / "ctx_out" / "responses"),
+        help="On-disk model response cache (keyed by model, options, system prompt, prompt)",
+    )
+    ap.add_argument("--cache-ttl", type=float, default=3600, help="Seconds; 0 = no expiry")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument(
+        "--clusters-path",
+        default=str(REPO_ROOT / "ctx_out" / "error_clusters.json"),
+        help="Analyzed error fingerprints; only new or changed clusters are sent",
+    )
+    ap.add_argument(
+        "--log-checkpoint",
+        default=str(REPO_ROOT / "ctx_out" / "log_checkpoint.json"),
+        help="Byte offset/inode of the last processed log position",
+    )
+    ap.add_argument(
+        "--full-log",
+        action="store_true",
+        help="Read the whole log every run instead of only newly appended entries",
+    )
+    ap.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Send the whole log every time (skip error fingerprinting)",
+    )
+    ap.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="Pack log + code into this many prompt tokens (newest error first)",
+    )
 
     ap.add_argument("--no-collect", action="store_true")
     ap.add_argument("--no-analyze", action="store_true")
     ap.add_argument("--apply", action="store_true")
     ap.add_argument("--dry-run", action="store_true")
-    ap.add_argument("--window", type=int, default=0)
+    ap.add_argument(
+        "--window",
+        type=int,
+        default=0,
+        help="Diff mode: how many lines a hunk may drift from its stated line "
+        "(0 = default)",
+    )
+    ap.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Diff mode: rewrite each file from its first changed line onwards "
+        "instead of committing all files together via temp file + rename "
+        "(less I/O, but a crash can leave files half-applied)",
+    )
 
     # 👇 yeni: overwrite seçeneği
     ap.add_argument(
         "--overwrite",
         action="store_true",
-        help="Apply full-file overwrite using code_change.{path}.code",
+        help="Apply full-file overwrite using code_change.{path}.code "
+        "(needs full-file context: --target without --slice)",
+    )
+    ap.add_argument(
+        "--on-conflict",
+        choices=("refuse", "flag", "force"),
+        default="refuse",
+        help="When a file changed after the prompt was built: skip it, apply and "
+        "report it, or don't check",
+    )
+    ap.add_argument(
+        "--backup-dir",
+        default=None,
+        help="Content-addressed backup store for applied files (default: <out-dir>/.backups)",
+    )
+    ap.add_argument(
+        "--backup-keep",
+        type=int,
+        default=50,
+        help="Keep backups of the newest N apply sessions (0 = keep all)",
+    )
+    ap.add_argument(
+        "--restore",
+        metavar="SESSION",
+        default=None,
+        help="Restore files changed by an apply session (analysis_* name or 'latest') and exit",
+    )
+    ap.add_argument(
+        "--restore-file",
+        metavar="REL_PATH",
+        default=None,
+        help="With --restore, only restore this project-relative file",
+    )
+    ap.add_argument(
+        "--loop",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="Re-run the pipeline every SECONDS in this process, reusing the SSH "
+        "connection (0 = run once)",
     )
 
     return ap.parse_args(argv)
@@ -226,6 +666,31 @@ def parse_args(argv=None):
 
 def main(argv=None):
     args = parse_args(argv)
+    backup_dir = Path(args.backup_dir or Path(args.out_dir) / ".backups").resolve()
+    backups = BackupStore(backup_dir)
+    if args.restore:
+        session = args.restore
+        if session == "latest":
+            sessions = backups.sessions()
+            if not sessions:
+                raise SystemExit(f"❌ {backups.root} içinde yedek yok.")
+            session = sessions[-1]["session"]
+        restored = (
+            backups.restore(session, files=[args.restore_file])
+            if args.restore_file
+            else backups.restore(session)
+        )
+        print(f"✓ {session}: {len(restored)} dosya geri yüklendi")
+        for path in restored:
+            print(f"  {path}")
+        return
+
+    if args.overwrite and args.apply and not args.no_analyze and (args.slice or not args.target):
+        # Dilim bağlamıyla yanıtın "code" alanı tam dosya değildir
+        raise SystemExit(
+            "❌ --overwrite tam dosya bağlamı ister: --target verin ve --slice kullanmayın "
+            "(ya da --overwrite olmadan diff modunda uygulayın)."
+        )
 
     project_root = Path(args.project).resolve()
     if not project_root.exists():
@@ -254,11 +719,31 @@ def main(argv=None):
 
     out_dir = Path(args.out_dir).resolve()
 
-    run_pipeline(
+    passfile = str(ssh_passfile_path) if ssh_passfile_path else None
+    endpoints = (
+        parse_hosts(args.hosts, str(ssh_key_path), passfile)
+        if args.hosts
+        else load_fleet_config(Path(args.model_config), str(ssh_key_path), passfile)
+    )
+    fleet = ModelFleet(endpoints) if endpoints else None
+    if fleet is not None:
+        print(f"[*] Model fleet: {', '.join(ep.name for ep in endpoints)}")
+        if args.loop:
+            fleet.start_health_checks()  # turlar arasında da çöken/düzelen host izlenir
+
+    pipeline_kwargs = dict(
         project_root=project_root,
-        target_symbol=args.target.strip(),
+        target_symbols=[t.strip() for t in (args.target or "").split(",") if t.strip()]
+        or None,
         log_path=log_path,
         codes_out_path=codes_out_path,
+        index_path=None if args.no_index else Path(args.index_path).resolve(),
+        workers=args.workers,
+        collect_mode="slice" if args.slice else "file",
+        split_targets=args.split_targets,
+        stream_ctx=args.stream_ctx,
+        sourcemap_cache=Path(args.sourcemap_cache).resolve(),
+        fetch_sourcemaps=args.fetch_sourcemaps,
         prompt_format_path=prompt_format_path,
         system_prompt_path=system_prompt_path,
         ssh_host=args.host,
@@ -266,19 +751,58 @@ def main(argv=None):
         ssh_user=args.user,
         ssh_key_path=ssh_key_path,
         ssh_passfile_path=ssh_passfile_path,
+        fleet=fleet,
         model=args.model,
         out_dir=out_dir,
         temperature=args.temperature,
         num_predict=args.num_predict,
         timeout=args.timeout,
+        transport=args.transport,
+        stream=args.stream,
+        concurrency=args.concurrency,
+        prefix_reuse=args.prefix_reuse,
+        retries=args.retries,
+        deadline=args.deadline,
+        # --loop turlarında bellek katmanı da korunur
+        clusters_path=None if args.no_dedupe else Path(args.clusters_path).resolve(),
+        log_checkpoint_path=None
+        if args.full_log
+        else Path(args.log_checkpoint).resolve(),
+        response_cache=None
+        if args.no_cache
+        else ResponseCache(Path(args.cache_dir).resolve(), ttl=args.cache_ttl),
+        token_budget=args.token_budget,
         do_collect=not args.no_collect,
         do_analyze=not args.no_analyze,
         do_apply=args.apply,
         dry_run=args.dry_run,
         window=args.window,
+        atomic=not args.in_place,
         use_overwrite=args.overwrite,  # 👈 eklendi
+        backups=backups,
+        backup_keep=args.backup_keep or None,
+        on_conflict=args.on_conflict,
     )
 
+    try:
+        if not args.loop:
+            run_pipeline(**pipeline_kwargs)
+            return
+        # Sürekli mod: SSH bağlantısı ve çözülmüş anahtar turlar arasında korunur
+        while True:
+            started = time.monotonic()
+            try:
+                run_pipeline(**pipeline_kwargs)
+            except Exception as e:
+                print(f"[!] Tur başarısız: {e}")
+            time.sleep(max(0.0, args.loop - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        if fleet is not None:
+            fleet.stop_health_checks()
+        close_ssh_managers()
+
 
 if __name__ == "__main__":
     main()
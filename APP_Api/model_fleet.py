@@ -0,0 +1,372 @@
+# filename: model_fleet.py
+from __future__ import annotations
+import configparser
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from python_api import (
+    RETRY_ATTEMPTS,
+    ModelCallError,
+    get_ollama_transport,
+    get_ssh_manager,
+    send_prompt_with_retry,
+)
+
+# ---------- Ayarlar ----------
+DEFAULT_API_URL = "http://127.0.0.1:11434/api/generate"
+DEFAULT_MAX_INFLIGHT = 1  # tek GPU'da eşzamanlı istek genelde sıraya girer
+PROBE_TIMEOUT = 5  # sn
+RETRY_UNHEALTHY_AFTER = 30  # sn; sağlıksız host bu süre sonra yeniden denenir
+HEALTH_CHECK_INTERVAL = 15  # sn; arka plan sağlık kontrolü aralığı
+EWMA_ALPHA = 0.3
+
+# user@host:port[,max=N][,api=URL][,key=PATH][,pass=PATH]
+_ENDPOINT_RE = re.compile(r"^(?:(?P<user>[^@\s]+)@)?(?P<host>[^:,\s]+)(?::(?P<port>\d+))?$")
+
+
+class Endpoint:
+    """Tek bir model sunucusu (SSH hedefi + Ollama URL'i) ve çalışma istatistikleri."""
+
+    def __init__(
+        self,
+        name: str,
+        host: str,
+        port: int,
+        user: str,
+        key_path: str,
+        passfile_path: Optional[str] = None,
+        api_url: str = DEFAULT_API_URL,
+        max_inflight: int = DEFAULT_MAX_INFLIGHT,
+    ):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.user = user
+        self.key_path = key_path
+        self.passfile_path = passfile_path
+        self.api_url = api_url
+        self.max_inflight = max(1, max_inflight)
+        self.inflight = 0
+        self.healthy = True
+        self.down_since: Optional[float] = None
+        # İstatistik
+        self.requests = 0
+        self.failures = 0
+        self.last_ms: Optional[float] = None
+        self.ewma_ms: Optional[float] = None
+        self.total_ms = 0.0
+
+    @property
+    def ssh(self):
+        """Süreç içinde paylaşılan kalıcı bağlantı (python_api.SSHConnectionManager)."""
+        return get_ssh_manager(
+            self.host, self.port, self.user, self.key_path, self.passfile_path
+        )
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.failures += 1
+            return
+        self.last_ms = elapsed_ms
+        self.total_ms += elapsed_ms
+        self.ewma_ms = (
+            elapsed_ms
+            if self.ewma_ms is None
+            else EWMA_ALPHA * elapsed_ms + (1 - EWMA_ALPHA) * self.ewma_ms
+        )
+
+    def stats(self) -> dict:
+        ok = self.requests - self.failures
+        return {
+            "host": f"{self.user}@{self.host}:{self.port}",
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_ms": round(self.last_ms, 1) if self.last_ms is not None else None,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "avg_ms": round(self.total_ms / ok, 1) if ok else None,
+        }
+
+
+def parse_endpoint(
+    spec: str,
+    name: str,
+    key_path: str,
+    passfile_path: Optional[str] = None,
+    default_port: int = 22,
+    default_user: str = "root",
+) -> Endpoint:
+    """`user@host:port,max=2,api=http://...` → Endpoint."""
+    head, *opts = [p.strip() for p in spec.split(",")]
+    m = _ENDPOINT_RE.match(head)
+    if not m:
+        raise ValueError(f"Geçersiz endpoint: {spec!r}")
+    extra = dict(o.split("=", 1) for o in opts if "=" in o)
+    return Endpoint(
+        name=name,
+        host=m.group("host"),
+        port=int(m.group("port") or default_port),
+        user=m.group("user") or default_user,
+        key_path=extra.get("key", key_path),
+        passfile_path=extra.get("pass", passfile_path),
+        api_url=extra.get("api", DEFAULT_API_URL),
+        max_inflight=int(extra.get("max", DEFAULT_MAX_INFLIGHT)),
+    )
+
+
+def load_fleet_config(
+    config_path: Path,
+    key_path: Optional[str] = None,
+    passfile_path: Optional[str] = None,
+) -> List[Endpoint]:
+    """
+    model_config.txt → [FLEET] bölümündeki endpoint'ler (yoksa boş liste).
+        [FLEET]
+        gpu1=root@10.0.0.5:31103,max=2
+        gpu2=root@10.0.0.6:22,api=http://127.0.0.1:11434/api/generate
+    Satırda key/pass yoksa parametreler, onlar da yoksa [SSH] KEY_PATH /
+    PASSFILE_PATH kullanılır.
+    """
+    cp = configparser.ConfigParser(interpolation=None, inline_comment_prefixes=("#",))
+    cp.optionxform = str  # anahtar adlarını küçültme
+    try:
+        cp.read(config_path, encoding="utf-8")
+    except configparser.Error:
+        return []
+    if not cp.has_section("FLEET"):
+        return []
+    ssh = cp["SSH"] if cp.has_section("SSH") else {}
+    key = key_path or ssh.get("KEY_PATH")
+    passfile = passfile_path or ssh.get("PASSFILE_PATH")
+    return [
+        parse_endpoint(spec, name, key, passfile)
+        for name, spec in cp["FLEET"].items()
+        if spec.strip()
+    ]
+
+
+def parse_hosts(
+    specs: List[str], key_path: str, passfile_path: Optional[str] = None
+) -> List[Endpoint]:
+    """CLI --hosts listesi → Endpoint'ler (ad: host:port)."""
+    endpoints = [parse_endpoint(spec, "", key_path, passfile_path) for spec in specs]
+    for ep in endpoints:
+        ep.name = f"{ep.host}:{ep.port}"
+    return endpoints
+
+
+class ModelFleet:
+    """
+    Birden çok Ollama sunucusuna yük dağıtımı.
+
+    - Yönlendirme: sağlıklı ve kapasitesi (max_inflight) dolmamış host'lar
+      arasından en az bekleyen isteği olan; eşitlikte gecikme ortalaması
+      (EWMA) düşük olan seçilir. Hepsi doluysa biri boşalana kadar beklenir.
+    - Her host çağrısı python_api.send_prompt_with_retry ile yapılır: host
+      başına `attempts` deneme (jitter'lı bekleme) ve host'un devre kesicisi.
+      `deadline` tüm host'lar ve yük devirleri için toplam bütçedir.
+    - Hata/yük devri: denemeleri tükenen (bağlantı, zaman aşımı, 5xx) ya da
+      devresi açık host sağlıksız işaretlenir ve istek sıradaki host'a gönderilir.
+      Sağlıksız host RETRY_UNHEALTHY_AFTER saniye sonra sağlık kontrolüyle
+      (GET /api/version) yeniden devreye girer. Süre bütçesi dolması, boş yanıt
+      ve 4xx host hatası sayılmaz; hemen yükseltilir.
+    - start_health_checks(): arka planda tüm host'lar periyodik yoklanır; çöken
+      host istek gönderilmeden devre dışı kalır, düzelen host istek beklemeden
+      devreye girer (--loop). Boş kapasite beklenirken de `deadline` geçerlidir.
+    - Host başına istek/hata sayısı ve gecikme istatistikleri tutulur (stats()).
+
+    send_prompt, python_api.send_prompt_with_retry ile aynı sonucu döner
+    (+ "endpoint"); başarısızlıkta python_api.ModelCallError yükseltir.
+    """
+
+    def __init__(self, endpoints: List[Endpoint]):
+        if not endpoints:
+            raise ValueError("Fleet en az bir endpoint gerektirir.")
+        self.endpoints = endpoints
+        self._cond = threading.Condition()
+        self._stop_checks = threading.Event()
+        self._checker: Optional[threading.Thread] = None
+
+    # ---------- Sağlık ----------
+    def probe(self, ep: Endpoint) -> bool:
+        """Host'a GET /api/version gönderir; sonucu ep.healthy'ye yazar."""
+        try:
+            status, _ = get_ollama_transport(ep.ssh, ep.api_url).get(
+                "/api/version", timeout=PROBE_TIMEOUT
+            )
+            ok = status == 200
+        except Exception:
+            ok = False
+        with self._cond:
+            self._set_health(ep, ok)
+        return ok
+
+    def probe_all(self) -> Dict[str, bool]:
+        return {ep.name: self.probe(ep) for ep in self.endpoints}
+
+    def start_health_checks(self, interval: float = HEALTH_CHECK_INTERVAL) -> None:
+        """Her `interval` saniyede probe_all() çalıştıran daemon thread'i başlatır."""
+        if self._checker is not None and self._checker.is_alive():
+            return
+        self._stop_checks.clear()
+
+        def run() -> None:
+            while not self._stop_checks.wait(interval):
+                self.probe_all()
+
+        self._checker = threading.Thread(target=run, name="fleet-health", daemon=True)
+        self._checker.start()
+
+    def stop_health_checks(self) -> None:
+        self._stop_checks.set()
+        if self._checker is not None:
+            self._checker.join(timeout=PROBE_TIMEOUT * len(self.endpoints) + 1)
+            self._checker = None
+
+    def _set_health(self, ep: Endpoint, ok: bool) -> None:
+        ep.healthy = ok
+        ep.down_since = None if ok else (ep.down_since or time.monotonic())
+        self._cond.notify_all()
+
+    def _due_for_probe(self, ep: Endpoint) -> bool:
+        return (
+            not ep.healthy
+            and ep.down_since is not None
+            and time.monotonic() - ep.down_since >= RETRY_UNHEALTHY_AFTER
+        )
+
+    # ---------- Yönlendirme ----------
+    def _acquire(self, exclude: set, deadline_at: Optional[float] = None) -> Optional[Endpoint]:
+        """
+        En az bekleyen isteği olan uygun host'u ayırır; hiç aday yoksa None.
+        Hepsi doluysa deadline_at'e (time.monotonic()) kadar beklenir, sonra
+        ModelCallError("deadline") yükselir.
+        """
+        for ep in self.endpoints:
+            if ep.name not in exclude and self._due_for_probe(ep):
+                self.probe(ep)
+        with self._cond:
+            while True:
+                candidates = [
+                    ep for ep in self.endpoints if ep.name not in exclude and ep.healthy
+                ]
+                if not candidates:
+                    return None
+                free = [ep for ep in candidates if ep.inflight < ep.max_inflight]
+                if free:
+                    ep = min(
+                        free,
+                        key=lambda e: (
+                            e.inflight / e.max_inflight,
+                            e.ewma_ms if e.ewma_ms is not None else 0.0,
+                        ),
+                    )
+                    ep.inflight += 1
+                    return ep
+                if deadline_at is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise ModelCallError("deadline", "Boş host beklenirken bütçe doldu")
+                self._cond.wait(remaining)
+
+    def _release(self, ep: Endpoint, elapsed_ms: float, ok: bool, failed: bool) -> None:
+        with self._cond:
+            ep.inflight -= 1
+            ep.record(elapsed_ms, ok)
+            if failed:
+                self._set_health(ep, False)
+            self._cond.notify_all()
+
+    def send_prompt(
+        self,
+        prompt: str,
+        attempts: int = RETRY_ATTEMPTS,
+        deadline: Optional[float] = None,
+        **kwargs,
+    ) -> dict:
+        """
+        İsteği uygun host'ta send_prompt_with_retry ile çalıştırır; host
+        başarısız olursa kalan süre bütçesiyle sıradaki host'a geçer.
+        kwargs: model, options, timeout, system, transport, stream, ...
+        """
+        tried: set = set()
+        last: Optional[ModelCallError] = None
+        total_attempts = 0
+        started = time.monotonic()
+        deadline_at = None if deadline is None else started + deadline
+        while True:
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                raise ModelCallError(
+                    "deadline",
+                    f"{deadline}s bütçe doldu ({last.message if last else 'yanıt yok'})",
+                    attempts=total_attempts,
+                    elapsed=time.monotonic() - started,
+                    last_result=last.last_result if last else None,
+                )
+            try:
+                ep = self._acquire(tried, deadline_at)
+            except ModelCallError as e:
+                e.attempts = total_attempts
+                e.elapsed = time.monotonic() - started
+                e.last_result = last.last_result if last else None
+                raise
+            if ep is None:
+                break
+            tried.add(ep.name)
+            sent = time.monotonic()
+            error: Optional[ModelCallError] = None
+            try:
+                res = send_prompt_with_retry(
+                    ep.ssh, prompt, api_url=ep.api_url, attempts=attempts,
+                    deadline=remaining, **kwargs,
+                )
+                total_attempts += res["retry"]["attempts"]
+            except ModelCallError as e:
+                error, res = e, e.last_result or {}
+                total_attempts += e.attempts
+            elapsed_ms = (time.monotonic() - sent) * 1000
+            failure = res.get("failure") or {}
+            # Host'un suçu olmayan hatalar: yük devri de işe yaramaz
+            host_ok = error is None or error.kind in ("deadline", "empty") or (
+                error.kind == "http" and not failure.get("retryable", True)
+            )
+            self._release(ep, elapsed_ms, error is None, not host_ok)
+            if error is None:
+                res["endpoint"] = ep.name
+                res["retry"] = {
+                    "attempts": total_attempts,
+                    "elapsed": round(time.monotonic() - started, 3),
+                }
+                return res
+            error.attempts = total_attempts
+            error.elapsed = time.monotonic() - started
+            if host_ok:
+                raise error
+            print(f"[!] {ep.name} başarısız ({error.message}); sıradaki host deneniyor")
+            last = error
+        raise ModelCallError(
+            "unavailable",
+            last.message if last else "Sağlıklı host yok",
+            attempts=total_attempts,
+            elapsed=time.monotonic() - started,
+            retry_after=RETRY_UNHEALTHY_AFTER,
+            last_result=last.last_result if last else None,
+        )
+
+    def stats(self) -> Dict[str, dict]:
+        with self._cond:
+            return {ep.name: ep.stats() for ep in self.endpoints}
+
+    def close(self) -> None:
+        self.stop_health_checks()
+        for ep in self.endpoints:
+            ep.ssh.close()
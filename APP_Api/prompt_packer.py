@@ -0,0 +1,187 @@
+# filename: prompt_packer.py
+from __future__ import annotations
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from find_func import HEADER_PREFIX, contains_target_symbol, parse_log_entries
+
+TokenEstimator = Callable[[str], int]
+
+_SECTION_PATH_RE = re.compile(r"\((?P<path>[^()]+)\)\s*$")
+
+
+# =========================================================
+# 🔢 Token tahmini
+# =========================================================
+
+def estimate_tokens_heuristic(text: str) -> int:
+    """Hızlı tahmin: kod/İngilizce için ~4 karakter ≈ 1 token (yukarı yuvarlanır)."""
+    return (len(text) + 3) // 4
+
+
+# =========================================================
+# ✂️ Parçalama
+# =========================================================
+
+def split_code_sections(codes_block: str) -> List[Tuple[str, str]]:
+    """
+    ctx dosyasını `>>> ` başlıklarına göre böler.
+    Dönen: [(path, section_text), ...]  (section_text başlık satırını içerir)
+    """
+    sections: List[Tuple[str, str]] = []
+    current: List[str] = []
+    for line in codes_block.splitlines():
+        if line.startswith(HEADER_PREFIX) and current:
+            sections.append(_finish_section(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append(_finish_section(current))
+    return sections
+
+
+def _finish_section(lines: List[str]) -> Tuple[str, str]:
+    header = lines[0]
+    path = ""
+    if header.startswith(HEADER_PREFIX):
+        path = header[len(HEADER_PREFIX):].strip()
+        m = _SECTION_PATH_RE.search(path)  # find_fault formatı: "... (src/x.js)"
+        if m:
+            path = m.group("path").strip()
+    return path, "\n".join(lines).strip("\n")
+
+
+def _entry_key(entry: dict) -> tuple:
+    return (entry["message"], tuple(entry["frames"]))
+
+
+def _section_hit_by(entry: dict, path: str, text: str) -> bool:
+    for fr in entry["frames"]:
+        url_path = urlsplit(fr.url).path if "://" in fr.url else fr.url
+        if path and url_path.endswith(path):
+            return True
+        if fr.func and contains_target_symbol(text, fr.func):
+            return True
+    return False
+
+
+# =========================================================
+# 📦 Paketleme
+# =========================================================
+
+def pack_prompt(
+    prompt_format: str,
+    log_text: str,
+    codes_block: Union[str, Iterable[str]],
+    token_budget: int,
+    estimator: Optional[TokenEstimator] = None,
+    system_prompt: Optional[str] = None,
+) -> Tuple[str, Dict]:
+    """
+    prompt_format'ı token bütçesini aşmayacak şekilde doldurur.
+
+    Öncelik sırası:
+      1) en yeni tekil hata kaydı
+      2) o hatanın frame'lerinin isabet ettiği kod bölümleri
+      3) kalan kod bölümleri (orijinal sırayla)
+      4) daha eski tekil hata kayıtları (yeniden eskiye)
+    Tekrarlayan kayıtlar ve bütçeye sığmayan parçalar atılır; hepsi rapora yazılır.
+    codes_block bir ctx metni ya da `>>> path` başlıklı parça akışı olabilir
+    (akışta sadece bütçeye giren parçalar bellekte tutulur).
+
+    Dönen: (prompt, report)
+    """
+    est = estimator or estimate_tokens_heuristic
+    overhead = est(prompt_format.format(log_text="", codes_block="")) + (
+        est(system_prompt) if system_prompt else 0
+    )
+    remaining = token_budget - overhead
+
+    included: List[Dict] = []
+    dropped: List[Dict] = []
+
+    # --- Log kayıtları: tekilleştir (en yeni kopya, en yeni konumunda kalır) ---
+    entries = parse_log_entries(log_text)
+    if not entries and log_text.strip():
+        entries = [{"message": log_text.strip(), "frames": [], "raw": log_text.strip(),
+                    "timestamp": None}]
+    # Tekrarlayan kayıt eski yerinden silinip sona eklenir: sıra son görülmeye
+    # göredir, böylece unique[-1] gerçekten en son gelen hatadır
+    by_key: Dict[tuple, dict] = {}
+    for entry in entries:
+        key = _entry_key(entry)
+        old = by_key.pop(key, None)
+        if old is not None:
+            dropped.append({"kind": "duplicate_log_entry", "id": old.get("timestamp"),
+                            "tokens": est(old["raw"])})
+        by_key[key] = entry
+    unique: List[dict] = list(by_key.values())
+
+    chosen_entries: List[int] = []
+
+    def _take(kind: str, ident, text: str, required: bool = False) -> bool:
+        nonlocal remaining
+        tokens = est(text) + 1  # ayırıcı satır
+        if tokens <= remaining or required:
+            remaining -= tokens
+            included.append({"kind": kind, "id": ident, "tokens": tokens})
+            return True
+        dropped.append({"kind": kind, "id": ident, "tokens": tokens})
+        return False
+
+    newest = unique[-1] if unique else None
+    if newest is not None:
+        # Bütçe ne olursa olsun en yeni hata gönderilir
+        _take("log_entry", newest.get("timestamp"), newest["raw"], required=True)
+        chosen_entries.append(len(unique) - 1)
+
+    # --- Kod bölümleri: akış halinde, bellekte sadece seçilenler tutulur ---
+    # Frame isabeti olan bölüm sığmazsa, daha önce alınmış isabetsiz bölümler
+    # (sondan başa) çıkarılarak yer açılır.
+    sections = (
+        split_code_sections(codes_block)
+        if isinstance(codes_block, str)
+        else (_finish_section(chunk.splitlines()) for chunk in codes_block)
+    )
+    taken: List[Tuple[int, str, str, bool, int]] = []  # (sıra, path, text, hit, tokens)
+    for order, (path, text) in enumerate(sections):
+        is_hit = newest is not None and _section_hit_by(newest, path, text)
+        kind = "code_frame_hit" if is_hit else "code"
+        tokens = est(text) + 1
+        if tokens > remaining and is_hit:
+            evictable = sum(t[4] for t in taken if not t[3])
+            if remaining + evictable >= tokens:
+                for item in [t for t in reversed(taken) if not t[3]]:
+                    if tokens <= remaining:
+                        break
+                    taken.remove(item)
+                    remaining += item[4]
+                    dropped.append({"kind": "code", "id": item[1], "tokens": item[4]})
+        if tokens <= remaining:
+            remaining -= tokens
+            taken.append((order, path, text, is_hit, tokens))
+        else:
+            dropped.append({"kind": kind, "id": path, "tokens": tokens})
+    for _, path, _, is_hit, tokens in sorted(taken, key=lambda t: (not t[3], t[0])):
+        included.append(
+            {"kind": "code_frame_hit" if is_hit else "code", "id": path, "tokens": tokens}
+        )
+
+    for i in range(len(unique) - 2, -1, -1):
+        if _take("log_entry", unique[i].get("timestamp"), unique[i]["raw"]):
+            chosen_entries.append(i)
+
+    packed_log = "\n".join(unique[i]["raw"] for i in sorted(chosen_entries))
+    packed_codes = "\n\n".join(t[2] for t in sorted(taken))
+    prompt = prompt_format.format(log_text=packed_log, codes_block=packed_codes)
+
+    report = {
+        "token_budget": token_budget,
+        "estimator": getattr(est, "__name__", type(est).__name__),
+        "overhead_tokens": overhead,
+        "used_tokens": token_budget - remaining,
+        "included": included,
+        "dropped": dropped,
+    }
+    return prompt, report
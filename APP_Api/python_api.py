@@ -1,9 +1,27 @@
 # filename: ssh_exec.py
 import paramiko
+import hashlib
+import http.client
 import json
+import random
+import select
+import socket
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable, Iterator
+from urllib.parse import urlsplit
 import pandas as pd
 
+# ---------- Ayarlar ----------
+KEEPALIVE_INTERVAL = 30  # sn; boşta kalan bağlantı NAT/firewall'da düşmesin
+MAX_CHANNELS = 4  # aynı anda açık exec/forward kanalı üst sınırı
+
+# (key_path, mtime_ns, passfile_path) → çözülmüş anahtar (süreç içi)
+_KEY_CACHE: dict[tuple, paramiko.RSAKey] = {}
+
 
 def _read_passphrase(passfile: str | None) -> str | None:
     """passphrase.key dosyasını temiz biçimde oku (BOM/boşluk kırp)."""
@@ -18,6 +36,31 @@ def _read_passphrase(passfile: str | None) -> str | None:
     return raw.strip().decode("utf-8", errors="ignore")
 
 
+def load_private_key(key_path: str, passfile_path: str | None = None) -> paramiko.RSAKey:
+    """
+    RSA anahtarını çözer; sonuç süreç içinde önbelleğe alınır.
+    Anahtar dosyası değişirse (mtime) yeniden okunur.
+    """
+    try:
+        mtime = Path(key_path).stat().st_mtime_ns
+    except OSError as e:
+        raise RuntimeError(f"Private key yüklenemedi: {e}")
+    cache_key = (str(Path(key_path).resolve()), mtime, passfile_path)
+    pkey = _KEY_CACHE.get(cache_key)
+    if pkey is None:
+        passphrase = _read_passphrase(passfile_path)
+        try:
+            pkey = paramiko.RSAKey.from_private_key_file(key_path, password=passphrase)
+        except Exception as e:
+            raise RuntimeError(f"Private key yüklenemedi: {e}")
+        _KEY_CACHE[cache_key] = pkey
+    return pkey
+
+
+class SSHConnectError(ConnectionError, RuntimeError):
+    """SSH bağlantısı kurulamadı (eski çağıranlar için RuntimeError olarak da yakalanır)."""
+
+
 def connect_ssh(
     host: str,
     port: int,
@@ -25,16 +68,13 @@ def connect_ssh(
     key_path: str,
     passfile_path: str | None = None,
     timeout: int = 30,
+    keepalive: int = KEEPALIVE_INTERVAL,
 ) -> paramiko.SSHClient:
     """
     Private key ve (varsa) passphrase dosyadan okunarak SSH bağlantısı kurar.
     Başarılıysa açık bir paramiko.SSHClient döner (kapatmayı sen yaparsın).
     """
-    passphrase = _read_passphrase(passfile_path)
-    try:
-        pkey = paramiko.RSAKey.from_private_key_file(key_path, password=passphrase)
-    except Exception as e:
-        raise RuntimeError(f"Private key yüklenemedi: {e}")
+    pkey = load_private_key(key_path, passfile_path)
 
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -50,18 +90,159 @@ def connect_ssh(
             look_for_keys=False,
         )
     except Exception as e:
-        raise RuntimeError(f"SSH bağlantı hatası: {e}")
+        raise SSHConnectError(f"SSH bağlantı hatası: {e}")
 
+    if keepalive:
+        client.get_transport().set_keepalive(keepalive)
     return client
 
 
+# ---------- Kalıcı bağlantı ----------
+class SSHConnectionManager:
+    """
+    Uzun ömürlü SSH bağlantısı.
+
+    - Anahtar bir kez çözülür (load_private_key), bağlantı keepalive ile açık tutulur
+    - Transport düşmüşse bir sonraki kullanımda otomatik yeniden bağlanır
+    - Kanallar (exec / port forward) tek transport üzerinde açılır; aynı anda
+      en fazla max_channels kanal kullanılır (SSH exec kanalları tek kullanımlık
+      olduğundan havuzlanan şey transport + kanal slotlarıdır)
+
+    run_remote / send_prompt'a SSHClient yerine doğrudan verilebilir.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        key_path: str,
+        passfile_path: str | None = None,
+        timeout: int = 30,
+        keepalive: int = KEEPALIVE_INTERVAL,
+        max_channels: int = MAX_CHANNELS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.key_path = key_path
+        self.passfile_path = passfile_path
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self._client: paramiko.SSHClient | None = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_channels)
+        self.connects = 0  # kaç kez (yeniden) bağlanıldı
+
+    def is_active(self) -> bool:
+        transport = self._client.get_transport() if self._client else None
+        return bool(transport and transport.is_active())
+
+    def client(self) -> paramiko.SSHClient:
+        """Aktif SSHClient'ı döner; bağlantı yoksa/kopmuşsa yeniden kurar."""
+        with self._lock:
+            if not self.is_active():
+                self._close_client()
+                self._client = connect_ssh(
+                    self.host,
+                    self.port,
+                    self.username,
+                    self.key_path,
+                    self.passfile_path,
+                    timeout=self.timeout,
+                    keepalive=self.keepalive,
+                )
+                self.connects += 1
+            return self._client
+
+    def transport(self) -> paramiko.Transport:
+        return self.client().get_transport()
+
+    @contextmanager
+    def channel_slot(self):
+        """Kanal havuzundan bir slot ayırır (eşzamanlı kanal sayısını sınırlar)."""
+        with self._slots:
+            yield self
+
+    def run(self, command: str, timeout: int = 120, pty: bool = False):
+        """
+        run_remote'un kalıcı bağlantı sürümü. Kanal açılırken bağlantı kopmuşsa
+        bir kez yeniden bağlanıp tekrar dener.
+        """
+        with self.channel_slot():
+            try:
+                return _exec(self.client(), command, timeout, pty)
+            except (paramiko.SSHException, EOFError, ConnectionError):
+                self.reset()
+                return _exec(self.client(), command, timeout, pty)
+
+    def reset(self) -> None:
+        """Bağlantıyı kapatır; bir sonraki kullanımda yeniden kurulur."""
+        with self._lock:
+            self._close_client()
+
+    def _close_client(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
+
+    def close(self) -> None:
+        self.reset()
+
+    def __enter__(self) -> "SSHConnectionManager":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_MANAGERS: dict[tuple, SSHConnectionManager] = {}
+
+
+def get_ssh_manager(
+    host: str,
+    port: int,
+    username: str,
+    key_path: str,
+    passfile_path: str | None = None,
+    timeout: int = 30,
+) -> SSHConnectionManager:
+    """Aynı süreçte aynı hedef için tek bir SSHConnectionManager paylaşılır."""
+    key = (host, port, username, key_path)
+    mgr = _MANAGERS.get(key)
+    if mgr is None:
+        mgr = _MANAGERS[key] = SSHConnectionManager(
+            host, port, username, key_path, passfile_path, timeout=timeout
+        )
+    return mgr
+
+
+def close_ssh_managers() -> None:
+    for mgr in _MANAGERS.values():
+        mgr.close()
+    _MANAGERS.clear()
+
+
 def run_remote(
-    client: paramiko.SSHClient, command: str, timeout: int = 120, pty: bool = False
+    client: "paramiko.SSHClient | SSHConnectionManager",
+    command: str,
+    timeout: int = 120,
+    pty: bool = False,
 ):
     """
     Açık SSH bağlantısı üzerinde verilen komutu çalıştırır.
+    client bir SSHConnectionManager ise kalıcı bağlantı ve kanal havuzu kullanılır.
     Dönen: (exit_status:int, stdout:str, stderr:str)
     """
+    if isinstance(client, SSHConnectionManager):
+        return client.run(command, timeout=timeout, pty=pty)
+    return _exec(client, command, timeout, pty)
+
+
+def _exec(client: paramiko.SSHClient, command: str, timeout: int, pty: bool):
     stdin, stdout, stderr = client.exec_command(command, get_pty=pty, timeout=timeout)
     out = stdout.read().decode(errors="ignore")
     err = stderr.read().decode(errors="ignore")
@@ -69,37 +250,577 @@ def run_remote(
     return exit_status, out, err
 
 
-def send_prompt(
-    client: paramiko.SSHClient,
-    prompt: str,
-    model: str = "llama3.1:8b",
-    api_url: str = "http://127.0.0.1:11434/api/generate",
-    options: dict | None = None,
-    timeout: int = 600,
-    system: str | None = None,  # ✅ YENİ
-) -> dict:
+# ---------- HTTP taşıma (SSH tüneli) ----------
+class _ChannelHTTPConnection(http.client.HTTPConnection):
+    """
+    Soketi bir SSH direct-tcpip kanalı olan HTTPConnection.
+    Uzak sunucudaki host:port'a (örn. 127.0.0.1:11434) yerel port açmadan bağlanır.
+    """
+
+    def __init__(self, ssh_transport: paramiko.Transport, host: str, port: int, timeout):
+        super().__init__(host, port, timeout=timeout)
+        self._ssh_transport = ssh_transport
+
+    def connect(self) -> None:
+        self.sock = self._ssh_transport.open_channel(
+            "direct-tcpip", (self.host, self.port), ("127.0.0.1", 0),
+            timeout=self.timeout,
+        )
+        self.sock.settimeout(self.timeout)
+
+
+class OllamaHTTPTransport:
     """
-    Ollama /api/generate (stream=false). 'system' alanını da destekler.
-    Dönen: {"ok": bool, "text": str, "raw": str, "stderr": str}
+    Ollama HTTP API'sine SSH tüneli üzerinden HTTP/1.1 keep-alive istemcisi.
+
+    Payload JSON olarak doğrudan kanala yazılır (uzakta curl/kabuk yok, kaçış yok).
+    Yanıtı tamamen okunmuş bağlantılar boşta havuzda tutulur ve sonraki
+    isteklerde yeniden kullanılır. Kopmuş bağlantıyla yapılan istek bir kez
+    yeni bağlantıyla tekrarlanır.
     """
+
+    def __init__(self, client: "paramiko.SSHClient | SSHConnectionManager", api_url: str):
+        parts = urlsplit(api_url)
+        self.client = client
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self._idle: list[_ChannelHTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _ssh_transport(self) -> paramiko.Transport:
+        if isinstance(self.client, SSHConnectionManager):
+            return self.client.transport()
+        return self.client.get_transport()
+
+    def _acquire(self, timeout) -> _ChannelHTTPConnection:
+        ssh_transport = self._ssh_transport()
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if conn._ssh_transport is ssh_transport and ssh_transport.is_active():
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn
+                conn.close()  # SSH yeniden kurulmuş; eski kanal geçersiz
+        return _ChannelHTTPConnection(ssh_transport, self.host, self.port, timeout)
+
+    def _release(self, conn: _ChannelHTTPConnection, reusable: bool) -> None:
+        if not reusable:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def _slot(self):
+        if isinstance(self.client, SSHConnectionManager):
+            with self.client.channel_slot():
+                yield
+        else:
+            yield
+
+    def _request(self, body: bytes | None, timeout, path: str | None, method: str = "POST"):
+        headers = {"Connection": "keep-alive"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in (0, 1):
+            conn = self._acquire(timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request(method, path or self.path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.HTTPException, paramiko.SSHException, OSError, EOFError):
+                conn.close()
+                if attempt or not reused:
+                    raise
+                # boşta beklerken kapanmış keep-alive bağlantısı → yenisiyle dene
+
+    def post_json(self, payload: dict, timeout: float | None = None, path: str | None = None):
+        """
+        payload'ı POST eder. Dönen: (status:int, body:bytes)
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return self._roundtrip(body, timeout, path, "POST")
+
+    def get(self, path: str, timeout: float | None = None):
+        """Dönen: (status:int, body:bytes) — örn. sağlık kontrolü için /api/version"""
+        return self._roundtrip(None, timeout, path, "GET")
+
+    def _roundtrip(self, body: bytes | None, timeout, path: str | None, method: str):
+        with self._slot():
+            conn, resp = self._request(body, timeout, path, method)
+            try:
+                data = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            self._release(conn, not resp.will_close)
+            return resp.status, data
+
+    def post_stream(
+        self, payload: dict, timeout: float | None = None, path: str | None = None
+    ) -> Iterator[dict]:
+        """
+        payload'ı POST eder ve NDJSON yanıtını satır satır (dict olarak) verir.
+        Üreteç erken kapatılırsa (close / break) bağlantı kapatılır; Ollama
+        istemci koptuğunda üretimi durdurur.
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        with self._slot():
+            conn, resp = self._request(body, timeout, path)
+            finished = False
+            try:
+                if resp.status != 200:
+                    data = resp.read()
+                    finished = True
+                    raise HTTPStatusError(resp.status, data.decode("utf-8", errors="ignore"))
+                while True:
+                    line = resp.readline()
+                    if not line:
+                        break
+                    if line.strip():
+                        yield json.loads(line)
+                finished = True
+            finally:
+                if finished:
+                    self._release(conn, not resp.will_close)
+                else:
+                    conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+
+# SSH istemcisi/yöneticisi → {api_url: OllamaHTTPTransport}
+_HTTP_TRANSPORTS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_ollama_transport(
+    client: "paramiko.SSHClient | SSHConnectionManager", api_url: str
+) -> OllamaHTTPTransport:
+    """Aynı SSH bağlantısı + URL için tek bir keep-alive transport paylaşılır."""
+    per_client = _HTTP_TRANSPORTS.setdefault(client, {})
+    transport = per_client.get(api_url)
+    if transport is None:
+        transport = per_client[api_url] = OllamaHTTPTransport(client, api_url)
+    return transport
+
+
+# ---------- Yerel port yönlendirme ----------
+class LocalPortForward:
+    """
+    127.0.0.1:<local_port> → SSH direct-tcpip → remote_host:remote_port.
+
+    Paramiko'yu bilmeyen istemciler (örn. asyncio.open_connection) uzak
+    Ollama'ya bu yerel port üzerinden bağlanır. Her gelen bağlantı ayrı bir
+    kanal açar; veri bir arka plan thread'inde iki yönlü aktarılır.
+    """
+
+    def __init__(
+        self,
+        client: "paramiko.SSHClient | SSHConnectionManager",
+        remote_host: str,
+        remote_port: int,
+        bind_host: str = "127.0.0.1",
+        bind_port: int = 0,
+    ):
+        self.client = client
+        self.remote = (remote_host, remote_port)
+        self._server = socket.create_server((bind_host, bind_port))
+        self.local_host, self.local_port = self._server.getsockname()[:2]
+        self._closed = False
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _ssh_transport(self) -> paramiko.Transport:
+        if isinstance(self.client, SSHConnectionManager):
+            return self.client.transport()
+        return self.client.get_transport()
+
+    def _accept_loop(self) -> None:
+        while not self._closed:
+            try:
+                sock, addr = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._pipe, args=(sock, addr), daemon=True).start()
+
+    def _pipe(self, sock: socket.socket, addr) -> None:
+        try:
+            chan = self._ssh_transport().open_channel("direct-tcpip", self.remote, addr)
+        except Exception:
+            sock.close()
+            return
+        try:
+            while True:
+                readable, _, _ = select.select([sock, chan], [], [])
+                if sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        break
+                    chan.sendall(data)
+                if chan in readable:
+                    data = chan.recv(65536)
+                    if not data:
+                        break
+                    sock.sendall(data)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            chan.close()
+            sock.close()
+
+    def close(self) -> None:
+        self._closed = True
+        self._server.close()
+
+
+# SSH istemcisi/yöneticisi → {(host, port): LocalPortForward}
+_PORT_FORWARDS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_port_forward(
+    client: "paramiko.SSHClient | SSHConnectionManager", remote_host: str, remote_port: int
+) -> LocalPortForward:
+    """Aynı SSH bağlantısı + hedef için tek bir yerel yönlendirme paylaşılır."""
+    per_client = _PORT_FORWARDS.setdefault(client, {})
+    fwd = per_client.get((remote_host, remote_port))
+    if fwd is None:
+        fwd = per_client[(remote_host, remote_port)] = LocalPortForward(
+            client, remote_host, remote_port
+        )
+    return fwd
+
+
+def _build_payload(
+    prompt: str,
+    model: str,
+    options: dict | None,
+    system: str | None,
+    stream: bool,
+    context: list[int] | None = None,
+) -> dict:
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": False,
+        "stream": stream,
         "keep_alive": "30m",
     }
-    if system:
+    if context:
+        # Sabit önek (system prompt) zaten bu token dizisinin içinde
+        payload["context"] = context
+    elif system:
         payload["system"] = system  # ✅ system desteği
 
     default_opts = {"num_predict": 2048, "temperature": 0.1}
     if options:
         default_opts.update(options)
     payload["options"] = default_opts
+    return payload
+
+
+# ---------- Önek (system prompt) yeniden kullanımı ----------
+PRIME_PROMPT = "Reply with OK and wait for LOGS and CODES."
+
+# (api_url, model, sha1(system), num_ctx) → system prompt'un token dizisi (context)
+_PREFIX_CONTEXTS: dict[tuple, list[int]] = {}
+
+
+def _prefix_key(api_url: str, model: str, system: str, options: dict | None) -> tuple:
+    digest = hashlib.sha1(system.encode("utf-8")).hexdigest()
+    return (api_url, model, digest, (options or {}).get("num_ctx"))
 
+
+def prefix_context(
+    client: "paramiko.SSHClient | SSHConnectionManager",
+    model: str,
+    system: str,
+    api_url: str = "http://127.0.0.1:11434/api/generate",
+    options: dict | None = None,
+    timeout: int = 600,
+    transport: str = "http",
+) -> list[int] | None:
+    """
+    Sabit system prompt'u bir kez değerlendirip Ollama'nın döndürdüğü `context`
+    token dizisini önbelleğe alır. Sonraki istekler bu diziyle gönderilir; önek
+    her seferinde aynı token'lardan oluştuğu için model yüklü kaldıkça (keep_alive)
+    KV önbelleği yeniden kullanılır ve prefill sadece değişen kısım için yapılır.
+    Ollama context döndürmezse None (çağıran normal system alanına döner).
+    """
+    key = _prefix_key(api_url, model, system, options)
+    ctx = _PREFIX_CONTEXTS.get(key)
+    if ctx is None:
+        prime_opts = dict(options or {}, num_predict=1, temperature=0)
+        payload = _build_payload(PRIME_PROMPT, model, prime_opts, system, stream=False)
+        out, _, _ = _post_payload(client, api_url, payload, timeout, transport)
+        _, obj = _parse_generate_body(out)
+        ctx = obj.get("context") or None
+        if ctx:
+            _PREFIX_CONTEXTS[key] = ctx
+            m = generate_metrics(obj) or {}
+            print(
+                f"[*] Prefix primed: {len(ctx)} tokens "
+                f"(prefill {m.get('prompt_eval_ms')} ms, bir kez)"
+            )
+    return ctx
+
+
+def forget_prefix_context(api_url: str, model: str, system: str, options: dict | None = None):
+    _PREFIX_CONTEXTS.pop(_prefix_key(api_url, model, system, options), None)
+
+
+_NS_FIELDS = {
+    "prompt_eval_duration": "prompt_eval_ms",
+    "eval_duration": "eval_ms",
+    "load_duration": "load_ms",
+    "total_duration": "total_ms",
+}
+
+
+def generate_metrics(obj: dict) -> dict | None:
+    """Ollama'nın son yanıt nesnesinden prefill/üretim süreleri (ms) ve token sayıları."""
+    if not isinstance(obj, dict) or "total_duration" not in obj:
+        return None
+    metrics = {
+        "prompt_eval_count": obj.get("prompt_eval_count"),
+        "eval_count": obj.get("eval_count"),
+    }
+    for field, name in _NS_FIELDS.items():
+        if field in obj:
+            metrics[name] = round(obj[field] / 1e6, 1)
+    return metrics
+
+
+def stream_prompt(
+    client: "paramiko.SSHClient | SSHConnectionManager",
+    prompt: str,
+    model: str = "llama3.1:8b",
+    api_url: str = "http://127.0.0.1:11434/api/generate",
+    options: dict | None = None,
+    timeout: int = 600,
+    system: str | None = None,
+    context: list[int] | None = None,
+) -> Iterator[dict]:
+    """
+    Ollama /api/generate (stream=true). NDJSON parçalarını geldikçe verir:
+        {"response": "<token(lar)>", "done": false}, ..., {"done": true, ...istatistik}
+    Üreteç kapatılırsa istek iptal edilir.
+    """
+    payload = _build_payload(prompt, model, options, system, stream=True, context=context)
+    yield from get_ollama_transport(client, api_url).post_stream(payload, timeout=timeout)
+
+
+def send_prompt(
+    client: "paramiko.SSHClient | SSHConnectionManager",
+    prompt: str,
+    model: str = "llama3.1:8b",
+    api_url: str = "http://127.0.0.1:11434/api/generate",
+    options: dict | None = None,
+    timeout: int = 600,
+    system: str | None = None,  # ✅ YENİ
+    transport: str = "http",
+    stream: bool = False,
+    on_token: Callable[[str], None] | None = None,
+    stop_when: Callable[[str], bool] | None = None,
+    prefix_reuse: str = "system",
+    deadline_at: float | None = None,
+) -> dict:
+    """
+    Ollama /api/generate. 'system' alanını da destekler.
+    transport="http": SSH tüneli üzerinden doğrudan HTTP (keep-alive, kaçışsız)
+    transport="curl": uzakta curl çalıştıran eski yol (stream desteklemez)
+
+    stream=True ise yanıt parça parça okunur:
+      - on_token(parça) her yeni metin parçasında çağrılır
+      - stop_when(şu_ana_kadarki_metin) her tamamlanan satırda çağrılır;
+        True dönerse üretim iptal edilir
+      - sonuçta "stream" altında ttft/total (sn), chunks, cancelled raporlanır
+      - deadline_at (time.monotonic() zamanı) geçilirse akış kesilir ve sonuç
+        "deadline" hatasıyla döner; stream=False'ta süre soket timeout'uyla sınırlıdır
+
+    prefix_reuse="context": system prompt bir kez değerlendirilir ve dönen
+    context dizisi sonraki isteklerde kullanılır (bkz. prefix_context).
+    "metrics" altında prefill (prompt_eval_*) ve üretim süreleri döner.
+    Başarısızlıkta "failure" = {"kind", "retryable", "status", "exception"}
+    (bkz. classify_exception); boş ama hatasız yanıtta None.
+    Dönen: {"ok", "text", "raw", "stderr", "failure", "metrics"[, "stream", "prefix"]}
+    """
+    if stream and transport == "curl":
+        raise ValueError("stream=True sadece transport='http' ile desteklenir.")
+
+    context = None
+    if prefix_reuse == "context" and system:
+        context = prefix_context(client, model, system, api_url, options, timeout, transport)
+
+    if stream:
+        res = _send_prompt_streaming(
+            client, prompt, model, api_url, options, timeout, system, context,
+            on_token, stop_when, deadline_at,
+        )
+    else:
+        payload = _build_payload(prompt, model, options, system, stream=False, context=context)
+        out, err, failure = _post_payload(client, api_url, payload, timeout, transport)
+        text, obj = _parse_generate_body(out)
+        if obj.get("error"):
+            # 200 + {"error": ...}: boş yanıt değil, isteğin kendisi reddedildi
+            err = err or str(obj["error"])
+            failure = failure or failure_info("error")
+        res = {
+            "ok": bool(text),
+            "text": text.strip(),
+            "raw": out,
+            "stderr": err,
+            "failure": None if text else failure,
+            "metrics": generate_metrics(obj),
+        }
+    res["prefix"] = {"mode": "context" if context else "system",
+                     "context_tokens": len(context) if context else 0}
+    return res
+
+
+def _post_payload(client, api_url: str, payload: dict, timeout: int, transport: str):
+    """stream=false isteği gönderir. Dönen: (gövde:str, hata:str, failure:dict|None)"""
+    if transport == "curl":
+        return _post_with_curl(client, api_url, payload, timeout)
+    err, failure = "", None
+    try:
+        status, body = get_ollama_transport(client, api_url).post_json(
+            payload, timeout=timeout
+        )
+        out = body.decode("utf-8", errors="ignore")
+        if status != 200:
+            err, failure = f"HTTP {status}", failure_info("http", status=status)
+    except Exception as e:
+        out, err, failure = "", f"{type(e).__name__}: {e}", classify_exception(e)
+    return out, err, failure
+
+
+def _parse_generate_body(out: str) -> tuple[str, dict]:
+    """stream=false gövdesi → ('response' metni, JSON nesnesi). JSON değilse ham metin."""
+    try:
+        obj = json.loads(out) if out.strip() else {}
+    except Exception:
+        return out.strip(), {}
+    if not isinstance(obj, dict):
+        return "", {}
+    return obj.get("response", ""), obj
+
+
+def _send_prompt_streaming(
+    client, prompt, model, api_url, options, timeout, system, context, on_token, stop_when,
+    deadline_at=None,
+) -> dict:
+    acc = StreamAccumulator(on_token, stop_when, deadline_at)
+    chunks = stream_prompt(client, prompt, model, api_url, options, timeout, system, context)
+    try:
+        for chunk in chunks:
+            if acc.feed(chunk):
+                break
+    except Exception as e:
+        acc.fail(e)
+    finally:
+        chunks.close()  # erken çıkışta bağlantıyı kapatır → uzakta üretim durur
+    return acc.result()
+
+
+class StreamAccumulator:
+    """
+    NDJSON parçalarını biriktirir; TTFT/iptal durumunu tutar.
+    feed() True dönerse akış bitmiştir (done, hata, stop_when ya da deadline_at).
+    Akış ne "done" ile ne de stop_when ile kapandıysa (bağlantı koptu, hata
+    satırı, süre doldu) gelen metin yarımdır: sonuç ok=False döner.
+    """
+
+    def __init__(
+        self,
+        on_token: Callable[[str], None] | None = None,
+        stop_when: Callable[[str], bool] | None = None,
+        deadline_at: float | None = None,
+    ):
+        self.on_token = on_token
+        self.stop_when = stop_when
+        self.deadline_at = deadline_at
+        self.started = time.monotonic()
+        self.ttft: float | None = None
+        self.pieces: list[str] = []
+        self.raw_lines: list[str] = []
+        self.cancelled = False
+        self.done = False
+        self.err = ""
+        self.failure: dict | None = None
+        self.metrics: dict | None = None
+
+    def fail(self, e: BaseException) -> None:
+        self.err = f"{type(e).__name__}: {e}"
+        self.failure = classify_exception(e)
+
+    def feed(self, chunk: dict) -> bool:
+        self.raw_lines.append(json.dumps(chunk, ensure_ascii=False))
+        if chunk.get("error"):
+            self.err = str(chunk["error"])
+            self.failure = failure_info("unavailable")
+            return True
+        piece = chunk.get("response") or ""
+        if piece:
+            if self.ttft is None:
+                self.ttft = time.monotonic() - self.started
+            self.pieces.append(piece)
+            if self.on_token is not None:
+                self.on_token(piece)
+        if chunk.get("done"):
+            self.done = True
+            self.metrics = generate_metrics(chunk)
+            return True
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            # Token gelmeye devam etse de toplam süre bütçesi aşılmaz
+            self.err = "Süre bütçesi akış sırasında doldu"
+            self.failure = failure_info("deadline")
+            return True
+        # Bölümler satır sonunda kapanır; kontrol sadece yeni satırda yapılır
+        if "\n" in piece and self.stop_when is not None:
+            if self.stop_when("".join(self.pieces)):
+                self.cancelled = True
+                return True
+        return False
+
+    def result(self) -> dict:
+        text = "".join(self.pieces)
+        if self.cancelled:
+            text = text[: text.rfind("\n") + 1]  # yarım kalan son satırı at
+        failure = self.failure
+        truncated = not (self.done or self.cancelled)
+        if truncated and failure is None and text.strip():
+            self.err = "Akış 'done' gelmeden kapandı"
+            failure = failure_info("unavailable")
+        if truncated and failure is not None and failure["kind"] != "deadline":
+            # Yarım yanıt önbelleğe/diske yazılmamalı; tam yanıt için yeniden denenir
+            failure = dict(failure, retryable=True)
+        ok = bool(text.strip()) and not (truncated and failure is not None)
+        return {
+            "ok": ok,
+            "text": text.strip(),
+            "raw": "\n".join(self.raw_lines),
+            "stderr": self.err,
+            "failure": None if ok else failure,
+            "metrics": self.metrics,
+            "stream": {
+                "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+                "total": round(time.monotonic() - self.started, 3),
+                "chunks": len(self.raw_lines),
+                "cancelled": self.cancelled,
+            },
+        }
+
+
+def _post_with_curl(client, api_url: str, payload: dict, timeout: int):
     # Kabuk güvenli here-doc (hiçbir $ / ${} genişlemesi olmaz)
     payload_json = json.dumps(payload, ensure_ascii=False)
     cmd = (
-        "curl -s -X POST "
+        "curl -s -w '\\n%{http_code}' -X POST "
         f"{api_url} "
         "-H 'Content-Type: application/json' "
         "--data-binary @- <<'JSON'\n"
@@ -107,13 +828,336 @@ def send_prompt(
         "JSON"
     )
 
-    _, out, err = run_remote(client, cmd, timeout=timeout, pty=False)
+    status, out, err = run_remote(client, cmd, timeout=timeout, pty=False)
+    # -w ile gövdenin son satırına HTTP durumu yazılır (bağlantı yoksa 000)
+    body, _, code = out.rpartition("\n")
+    http_status = 0
+    if code.strip().isdigit():
+        out, http_status = body, int(code)
+    if status != 0 or not http_status:
+        # sıfır olmayan çıkış kodu = bağlantı kurulamadı, zaman aşımı vb.
+        failure = failure_info("unavailable")
+    elif http_status != 200:
+        failure = failure_info("http", status=http_status)
+        err = err or _error_message(out) or f"HTTP {http_status}"
+    else:
+        failure = None
+    return out, err, failure
+
 
-    text = ""
+def _error_message(out: str) -> str:
+    """Ollama hata gövdesi ({"error": "..."}) → mesaj; değilse boş."""
     try:
-        obj = json.loads(out) if out.strip() else {}
-        text = obj.get("response", "") if isinstance(obj, dict) else ""
+        obj = json.loads(out)
     except Exception:
-        text = out.strip()
+        return ""
+    return str(obj.get("error") or "") if isinstance(obj, dict) else ""
+
+
+# ---------- Dayanıklılık: yeniden deneme, süre bütçesi, devre kesici ----------
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0  # sn; 1, 2, 4 ... (üstten RETRY_MAX_DELAY ile sınırlı)
+RETRY_MAX_DELAY = 30.0
+BREAKER_THRESHOLD = 3  # art arda bu kadar başarısız çağrıdan sonra devre açılır
+BREAKER_RESET_AFTER = 60.0  # sn; açık devre bu süre sonra tek deneme çağrısına izin verir
+
+
+class HTTPStatusError(RuntimeError):
+    """Ollama 200 dışı HTTP durumu döndü (akış başlamadan)."""
 
-    return {"ok": bool(text), "text": text.strip(), "raw": out, "stderr": err}
+    def __init__(self, status: int, body: str = ""):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+
+
+class ModelCallError(RuntimeError):
+    """
+    Model çağrısı denemeler/süre bütçesi tükenince ya da devre açıkken yükselir.
+    kind: "circuit_open" | "deadline" | "timeout" | "unavailable" | "http" | "empty" | "error"
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        message: str,
+        attempts: int = 0,
+        elapsed: float = 0.0,
+        retry_after: float | None = None,
+        last_result: dict | None = None,
+    ):
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+        self.message = message
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.retry_after = retry_after
+        self.last_result = last_result
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "attempts": self.attempts,
+            "elapsed": round(self.elapsed, 3),
+            "retry_after": self.retry_after,
+        }
+
+
+class CircuitBreaker:
+    """
+    closed → (threshold ardışık hata) → open → (reset_after sn) → half_open
+    half_open'da tek bir deneme çağrısı geçer: başarılıysa closed, değilse open.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+# (SSH hedefi, api_url) → CircuitBreaker (süreç içi; --loop turlarında korunur)
+_BREAKERS: dict[tuple, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(
+    client: "paramiko.SSHClient | SSHConnectionManager", api_url: str
+) -> CircuitBreaker:
+    target = (client.host, client.port) if isinstance(client, SSHConnectionManager) else id(client)
+    return _BREAKERS.setdefault((target, api_url), CircuitBreaker())
+
+
+def failure_info(kind: str, status: int | None = None, exc: BaseException | None = None) -> dict:
+    """Başarısız çağrının yapısal tanımı (sonuç sözlüğünde "failure")."""
+    retryable = kind in ("timeout", "unavailable", "empty") or (
+        # 4xx (429 hariç) isteğin kendisinden kaynaklanır; tekrar denemek işe yaramaz
+        kind == "http" and status is not None and (status >= 500 or status == 429)
+    )
+    return {
+        "kind": kind,
+        "retryable": retryable,
+        "status": status,
+        "exception": type(exc).__name__ if exc is not None else None,
+    }
+
+
+def classify_exception(e: BaseException) -> dict:
+    """İstisna türüne göre failure_info: HTTP durumu, zaman aşımı, bağlantı hatası."""
+    if isinstance(e, HTTPStatusError):
+        return failure_info("http", status=e.status, exc=e)
+    if isinstance(e, (TimeoutError, socket.timeout)):
+        return failure_info("timeout", exc=e)
+    if isinstance(
+        e,
+        (OSError, EOFError, http.client.HTTPException, paramiko.SSHException, ValueError),
+    ):
+        # Bağlantı kurulamadı/koptu ya da bozuk (yarım) yanıt
+        return failure_info("unavailable", exc=e)
+    return failure_info("error", exc=e)
+
+
+def failed_result(e: BaseException) -> dict:
+    """send_prompt hiç sonuç üretemeden istisna fırlattığında yerine geçen sonuç."""
+    return {
+        "ok": False,
+        "text": "",
+        "raw": "",
+        "stderr": f"{type(e).__name__}: {e}",
+        "failure": classify_exception(e),
+    }
+
+
+def _classify_failure(res: dict) -> tuple[str, bool]:
+    """Başarısız send_prompt sonucu → (tür, yeniden denenebilir mi)."""
+    failure = res.get("failure")
+    if failure is None:
+        return "empty", True  # hatasız ama boş yanıt
+    return failure["kind"], failure["retryable"]
+
+
+def _backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Tam jitter'lı üstel bekleme: U(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Yeniden deneme kararları (deneme sayısı, toplam süre bütçesi, devre kesici,
+    bekleme süresi); senkron ve async sürücüler aynı mantığı paylaşır:
+
+        budget = RetryBudget(breaker, api_url, timeout, attempts, deadline)
+        while True:
+            t = budget.next_attempt()      # deneme timeout'u ya da ModelCallError
+            res = send(..., timeout=t, deadline_at=budget.deadline_at)
+            delay = budget.outcome(res)    # None → başarı; aksi halde bekle, tekrar
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        target: str,
+        timeout: int = 600,
+        attempts: int = RETRY_ATTEMPTS,
+        deadline: float | None = None,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.breaker = breaker
+        self.target = target
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.started = time.monotonic()
+        self.deadline_at = None if deadline is None else self.started + deadline
+        self.tried = 0
+        self.res: dict | None = None
+        self.detail = ""
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float | None:
+        return None if self.deadline_at is None else self.deadline_at - time.monotonic()
+
+    def error(self, kind: str, detail: str, retry_after: float | None = None) -> ModelCallError:
+        return ModelCallError(
+            kind,
+            detail,
+            attempts=self.tried,
+            elapsed=self.elapsed(),
+            retry_after=retry_after,
+            last_result=self.res,
+        )
+
+    def next_attempt(self) -> int:
+        """Sıradaki denemenin timeout'u; bütçe dolduysa/devre açıksa ModelCallError."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise self.error(
+                "deadline", f"{self.deadline}s bütçe doldu ({self.detail or 'yanıt yok'})"
+            )
+        if not self.breaker.allow():
+            raise self.error(
+                "circuit_open",
+                f"{self.target} art arda {self.breaker.failures} kez başarısız; devre açık",
+                retry_after=round(self.breaker.retry_after(), 1),
+            )
+        if remaining is None:
+            return self.timeout
+        return max(1, min(self.timeout, int(remaining)))
+
+    def outcome(self, res: dict) -> float | None:
+        """
+        Deneme sonucunu işler. Başarıda None (res'e "retry" eklenir); yeniden
+        denenecekse beklenecek süre; denenmeyecekse ModelCallError.
+        """
+        self.tried += 1
+        self.res = res
+        if res.get("ok"):
+            self.breaker.record_success()
+            res["retry"] = {"attempts": self.tried, "elapsed": round(self.elapsed(), 3)}
+            return None
+
+        kind, retryable = _classify_failure(res)
+        self.detail = res.get("stderr") or "boş yanıt"
+        # Boş yanıt sunucunun ayakta olduğunu gösterir; bütçeyi biz kestiysek
+        # sunucu suçlu sayılmaz. İkisi de devreyi açmaz.
+        if kind == "empty":
+            self.breaker.record_success()
+        elif kind != "deadline":
+            self.breaker.record_failure()
+        if kind == "deadline":
+            raise self.error("deadline", f"{self.deadline}s bütçe doldu ({self.detail})")
+        if not retryable or self.tried >= self.attempts:
+            raise self.error(kind, self.detail)
+        delay = _backoff_delay(self.tried - 1, self.base_delay, self.max_delay)
+        remaining = self.remaining()
+        if remaining is not None:
+            delay = min(delay, max(0.0, remaining))
+        print(f"[!] Model çağrısı başarısız ({self.detail}); {delay:.1f}s sonra tekrar denenecek")
+        return delay
+
+
+def send_prompt_with_retry(
+    client: "paramiko.SSHClient | SSHConnectionManager",
+    prompt: str,
+    api_url: str = "http://127.0.0.1:11434/api/generate",
+    timeout: int = 600,
+    attempts: int = RETRY_ATTEMPTS,
+    deadline: float | None = None,
+    base_delay: float = RETRY_BASE_DELAY,
+    max_delay: float = RETRY_MAX_DELAY,
+    breaker: CircuitBreaker | None = None,
+    **kwargs,
+) -> dict:
+    """
+    send_prompt'u yeniden deneme + süre bütçesi + devre kesici ile çalıştırır.
+
+    - timeout: deneme başına süre (HTTP'de her okuma için soket zaman aşımı)
+    - deadline: tüm denemeler + beklemeler için toplam bütçe (sn); her denemenin
+      timeout'u kalan bütçeyle kırpılır, stream=True'da akış bütçe dolunca kesilir
+    - Denemeler arası tam jitter'lı üstel bekleme (base_delay, max_delay)
+    - breaker (varsayılan: hedef + URL başına paylaşılan): devre açıkken çağrı
+      ağa hiç çıkmadan ModelCallError("circuit_open") ile reddedilir
+    - Yeniden denenip denenmeyeceği sonucun "failure" alanından (istisna türü /
+      HTTP durumu) belirlenir
+    Başarıda send_prompt sonucunu ("retry": {"attempts", "elapsed"} eklenmiş)
+    döner; aksi halde ModelCallError yükseltir. kwargs → send_prompt.
+    """
+    budget = RetryBudget(
+        breaker or get_circuit_breaker(client, api_url),
+        api_url, timeout, attempts, deadline, base_delay, max_delay,
+    )
+    while True:
+        attempt_timeout = budget.next_attempt()
+        try:
+            res = send_prompt(
+                client, prompt, api_url=api_url, timeout=attempt_timeout,
+                deadline_at=budget.deadline_at, **kwargs,
+            )
+        except (OSError, paramiko.SSHException) as e:  # SSH bağlantısı kurulamadı vb.
+            res = failed_result(e)
+        delay = budget.outcome(res)
+        if delay is None:
+            return res
+        time.sleep(delay)
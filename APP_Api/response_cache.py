@@ -0,0 +1,152 @@
+# filename: response_cache.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# ---------- Ayarlar ----------
+CACHE_VERSION = 1
+DEFAULT_TTL = 3600  # sn
+MAX_MEMORY_ENTRIES = 128
+MAX_DISK_ENTRIES = 1024
+_PRUNE_EVERY = 32  # her N yazmada bir disk budanır
+
+
+def response_cache_key(
+    model: str, options: dict, system: Optional[str], prompt: str
+) -> str:
+    """Model + seçenekler + system prompt + nihai prompt → sha256 (içerik adresi)."""
+    blob = json.dumps(
+        {"v": CACHE_VERSION, "model": model, "options": options,
+         "system": system or "", "prompt": prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+    ).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class ResponseCache:
+    """
+    Model yanıtları için LRU + TTL önbellek, disk destekli.
+
+    - Bellek: OrderedDict (en son kullanılan sonda), en fazla max_entries kayıt
+    - Disk: cache_dir/<key[:2]>/<key>.json ; erişimde mtime güncellenir, budamada
+      süresi geçenler ve max_disk_entries üstündeki en eski kayıtlar silinir
+    - ttl saniyeden eski kayıtlar (oluşturulma zamanına göre) geçersizdir
+    Kayıt: {"created", "model", "response_text", "response_struct"}
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = MAX_MEMORY_ENTRIES,
+        max_disk_entries: int = MAX_DISK_ENTRIES,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._mem: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _fresh(self, entry: dict) -> bool:
+        return not self.ttl or time.time() - entry.get("created", 0) <= self.ttl
+
+    # ---------- Sorgu ----------
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if self._fresh(entry):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._mem[key]
+
+        entry = self._load(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self._remember(key, entry)
+            self.hits += 1
+        return entry
+
+    def _load(self, key: str) -> Optional[dict]:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(entry):
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # disk LRU: son erişim
+        except OSError:
+            pass
+        return entry
+
+    # ---------- Yazma ----------
+    def put(self, key: str, model: str, response_text: str, response_struct: dict) -> dict:
+        entry = {
+            "created": time.time(),
+            "model": model,
+            "response_text": response_text,
+            "response_struct": response_struct,
+        }
+        with self._lock:
+            self._remember(key, entry)
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if self.cache_dir is not None:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+            if prune:
+                self.prune()
+        return entry
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def prune(self) -> int:
+        """Diskte süresi geçmiş ve LRU sınırını aşan kayıtları siler. Dönen: silinen."""
+        if self.cache_dir is None or not self.cache_dir.exists():
+            return 0
+        now = time.time()
+        files = []
+        for p in self.cache_dir.glob("*/*.json"):
+            try:
+                files.append((p.stat().st_mtime, p))
+            except OSError:
+                continue
+        files.sort(reverse=True)  # en yeni erişilen başta
+        removed = 0
+        for i, (mtime, p) in enumerate(files):
+            # created ≤ mtime: mtime'a göre süresi geçen kayıt kesin geçersizdir
+            expired = bool(self.ttl) and now - mtime > self.ttl
+            if expired or i >= self.max_disk_entries:
+                p.unlink(missing_ok=True)
+                removed += 1
+        return removed
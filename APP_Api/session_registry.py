@@ -0,0 +1,164 @@
+# filename: session_registry.py
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# ---------- Ayarlar ----------
+REGISTRY_VERSION = 1
+LOG_NAME = "sessions.jsonl"  # append-only olay kaydı
+HEAD_NAME = "sessions_head.json"  # özet/indeks: son, son başarılı, fingerprint → oturum
+
+# Analiz tamamlanmış (response.json yazılmış) sayılan durumlar
+SUCCESS_STATUSES = ("analyzed", "applied")
+RECENT_SESSIONS = 32  # durum güncellemelerini birleştirmek için head'de tutulan oturum
+
+# Aynı süreçte aynı kayda yazan thread'ler için (ThreadPool / asyncio.to_thread)
+_LOCKS: Dict[str, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(str(path), threading.Lock())
+
+
+class SessionRegistry:
+    """
+    error_analysis_reports için oturum indeksi; klasör listelemeden O(1) sorgu.
+
+        <out_dir>/sessions.jsonl       her durum değişikliği bir satır:
+            {"session", "status", "ts", "path", ...hash'ler/ek alanlar}
+        <out_dir>/sessions_head.json   {"version", "offset", "latest", "latest_ok",
+                                        "by_fingerprint", "recent": {ad: kayıt}}
+
+    - record() satırı ekler ve head'i atomik günceller
+    - head, jsonl'ın `offset`'ine kadar olan kısmını yansıtır; başka bir süreç
+      araya satır eklediyse sadece offset'ten sonrası yeniden okunur
+    - head'in boyu oturum sayısıyla büyümez: son RECENT_SESSIONS oturum +
+      fingerprint başına tek ad tutulur
+    - status: "started" | "analyzed" | "failed" | "applied"
+    """
+
+    def __init__(self, out_dir: str | Path):
+        self.out_dir = Path(out_dir)
+        self.log_path = self.out_dir / LOG_NAME
+        self.head_path = self.out_dir / HEAD_NAME
+        self._lock = _lock_for(self.log_path)
+
+    # ---------- Head ----------
+    def _empty_head(self) -> dict:
+        return {
+            "version": REGISTRY_VERSION,
+            "offset": 0,
+            "recent": {},
+            "latest": None,
+            "latest_ok": None,
+            "by_fingerprint": {},
+        }
+
+    def _load_head(self) -> dict:
+        try:
+            head = json.loads(self.head_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return self._empty_head()
+        return head if head.get("version") == REGISTRY_VERSION else self._empty_head()
+
+    @staticmethod
+    def _apply(head: dict, rec: dict) -> None:
+        name = rec["session"]
+        recent = head["recent"]
+        merged = {**recent.pop(name, {}), **rec}
+        recent[name] = merged  # en son güncellenen sonda
+        while len(recent) > RECENT_SESSIONS:
+            del recent[next(iter(recent))]
+        if head["latest"] is None or name >= head["latest"]["session"]:
+            head["latest"] = merged
+        if merged["status"] in SUCCESS_STATUSES and (
+            head["latest_ok"] is None or name >= head["latest_ok"]["session"]
+        ):
+            head["latest_ok"] = merged
+        for fp in merged.get("fingerprints") or ():
+            if name >= head["by_fingerprint"].get(fp, ""):
+                head["by_fingerprint"][fp] = name
+
+    def _catch_up(self, head: dict) -> bool:
+        """jsonl'da head'in görmediği satırlar varsa işler. Dönen: head değişti mi."""
+        try:
+            size = self.log_path.stat().st_size
+        except OSError:
+            return False
+        if size <= head["offset"]:
+            if size < head["offset"]:  # kayıt silinmiş/küçülmüş: baştan kur
+                head.clear()
+                head.update(self._empty_head())
+                return self._catch_up(head) or True
+            return False
+        with open(self.log_path, "rb") as f:
+            f.seek(head["offset"])
+            data = f.read(size - head["offset"])
+        data = data[: data.rfind(b"\n") + 1]  # yarım yazılmış satırı bekle
+        for line in data.splitlines():
+            try:
+                self._apply(head, json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        head["offset"] += len(data)
+        return bool(data)
+
+    def _save_head(self, head: dict) -> None:
+        tmp = self.head_path.with_name(f"{self.head_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(head, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.head_path)
+
+    def head(self) -> dict:
+        with self._lock:
+            head = self._load_head()
+            if self._catch_up(head):
+                self._save_head(head)
+            return head
+
+    # ---------- Yazma ----------
+    def record(
+        self,
+        session: str,
+        status: str,
+        path: Optional[str | Path] = None,
+        fingerprints: Optional[Iterable[str]] = None,
+        **fields,
+    ) -> dict:
+        rec = {"session": session, "status": status, "ts": time.time()}
+        if path is not None:
+            rec["path"] = str(path)
+        if fingerprints:
+            rec["fingerprints"] = sorted(set(fingerprints))
+        rec.update({k: v for k, v in fields.items() if v is not None})
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            head = self._load_head()
+            self._catch_up(head)
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)  # tek write + O_APPEND: satırlar karışmaz
+            finally:
+                os.close(fd)
+            self._catch_up(head)
+            self._save_head(head)
+        return rec
+
+    # ---------- Sorgu ----------
+    def latest(self, successful: bool = False) -> Optional[dict]:
+        """En son oturum (successful=True: response.json'u olan en son oturum)."""
+        return self.head()["latest_ok" if successful else "latest"]
+
+    def status(self, session: str) -> Optional[str]:
+        """Oturumun son durumu (son RECENT_SESSIONS oturum içinde aranır)."""
+        return (self.head()["recent"].get(session) or {}).get("status")
+
+    def by_fingerprint(self, fingerprint: str) -> Optional[str]:
+        """Bu hata kümesini en son analiz eden oturumun adı."""
+        return self.head()["by_fingerprint"].get(fingerprint)
@@ -0,0 +1,358 @@
+# filename: sourcemap.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+# ---------- Ayarlar ----------
+CACHE_VERSION = 1
+FETCH_TIMEOUT = 5  # sn; dev server'dan .map indirme
+REMOTE_TTL = 30  # sn; dev server'dan indirilen map bu süre sonra yeniden istenir
+# hot-update hash'leri her derlemede değişir; --loop'ta önbellekler sınırlı tutulur
+MAX_DECODED_MAPS = 32  # süreç içi çözülmüş map (LRU)
+MAX_MAP_URLS = 256  # resolver başına yerel yol / uzak URL kaydı (LRU)
+MAX_DISK_MAPS = 256  # cache_dir'deki .smc dosyası (en eski kullanılan silinir)
+_B64 = {c: i for i, c in enumerate(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+)}
+_MAPPING_URL_RE = re.compile(rb"[#@]\s*sourceMappingURL=(\S+)\s*$")
+_COL_BITS = 32
+
+
+# ---------- VLQ ----------
+def decode_vlq_segment(segment: str) -> List[int]:
+    """Tek bir base64-VLQ segmentini tamsayı listesine çözer."""
+    values: List[int] = []
+    value = shift = 0
+    for ch in segment:
+        digit = _B64[ch]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+            continue
+        values.append(-(value >> 1) if value & 1 else value >> 1)
+        value = shift = 0
+    return values
+
+
+class SourceMap:
+    """
+    Çözülmüş v3 source map. Eşlemeler paralel dizilerde (array) tutulur:
+        keys[i]  = gen_line << 32 | gen_col   (0 tabanlı, sıralı → bisect)
+        src[i], orig_line[i], orig_col[i], name[i]  (-1 = yok)
+    """
+
+    __slots__ = ("sources", "names", "keys", "src", "orig_line", "orig_col", "name")
+
+    def __init__(self, sources: List[str], names: List[str]):
+        self.sources = sources
+        self.names = names
+        self.keys = array("q")
+        self.src = array("i")
+        self.orig_line = array("i")
+        self.orig_col = array("i")
+        self.name = array("i")
+
+    @classmethod
+    def from_json(cls, data: dict) -> "SourceMap":
+        if "sections" in data:
+            raise ValueError("Indexed (sectioned) source maps desteklenmiyor.")
+        root = data.get("sourceRoot") or ""
+        sources = [
+            (root.rstrip("/") + "/" + s) if root and not re.match(r"^\w+:", s) else s
+            for s in data.get("sources") or []
+        ]
+        sm = cls(sources, list(data.get("names") or []))
+
+        src = orig_line = orig_col = name = 0
+        ordered = True
+        last_key = -1
+        for gen_line, line in enumerate((data.get("mappings") or "").split(";")):
+            gen_col = 0
+            for seg in line.split(","):
+                if not seg:
+                    continue
+                v = decode_vlq_segment(seg)
+                gen_col += v[0]
+                if len(v) < 4:
+                    continue  # kaynaksız segment
+                src += v[1]
+                orig_line += v[2]
+                orig_col += v[3]
+                if len(v) >= 5:
+                    name += v[4]
+                key = (gen_line << _COL_BITS) | gen_col
+                ordered = ordered and key >= last_key
+                last_key = key
+                sm.keys.append(key)
+                sm.src.append(src)
+                sm.orig_line.append(orig_line)
+                sm.orig_col.append(orig_col)
+                sm.name.append(name if len(v) >= 5 else -1)
+        if not ordered:
+            sm._sort()
+        return sm
+
+    def _sort(self) -> None:
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        for attr in ("keys", "src", "orig_line", "orig_col", "name"):
+            old = getattr(self, attr)
+            setattr(self, attr, array(old.typecode, (old[i] for i in order)))
+
+    def lookup(self, line: int, col: int) -> Optional[Tuple[str, int, int, Optional[str]]]:
+        """
+        Üretilmiş (1 tabanlı satır, 1 tabanlı sütun) → (kaynak, satır, sütun, isim).
+        Dönen satır/sütun da 1 tabanlıdır; eşleşme yoksa None.
+        """
+        gen_line, gen_col = line - 1, max(col - 1, 0)
+        i = bisect_right(self.keys, (gen_line << _COL_BITS) | gen_col) - 1
+        if i < 0 or self.keys[i] >> _COL_BITS != gen_line:
+            return None
+        name_idx = self.name[i]
+        return (
+            self.sources[self.src[i]],
+            self.orig_line[i] + 1,
+            self.orig_col[i] + 1,
+            self.names[name_idx] if 0 <= name_idx < len(self.names) else None,
+        )
+
+    # ---------- İkili önbellek ----------
+    def dump(self, path: Path) -> None:
+        header = json.dumps(
+            {"version": CACHE_VERSION, "count": len(self.keys),
+             "sources": self.sources, "names": self.names},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            for arr in (self.keys, self.src, self.orig_line, self.orig_col, self.name):
+                arr.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SourceMap":
+        with open(path, "rb") as f:
+            size = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(size).decode("utf-8"))
+            if header.get("version") != CACHE_VERSION:
+                raise ValueError("Eski önbellek sürümü")
+            sm = cls(header["sources"], header["names"])
+            n = header["count"]
+            for attr in ("keys", "src", "orig_line", "orig_col", "name"):
+                getattr(sm, attr).fromfile(f, n)
+        return sm
+
+
+# ---------- Önbellekli yükleme ----------
+# içerik sha1 → çözülmüş map (süreç içi, en son kullanılan sonda)
+_DECODED: "OrderedDict[str, SourceMap]" = OrderedDict()
+
+
+def _remember(cache: OrderedDict, key, value, limit: int) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def load_source_map(data: bytes, cache_dir: Optional[Path] = None) -> SourceMap:
+    """
+    .map içeriğini hash'ine göre önbellekten döner; yoksa çözüp önbelleğe yazar.
+    Önce süreç içi, sonra disk (cache_dir/<sha1>.smc) önbelleğine bakılır.
+    İkisi de sınırlıdır: MAX_DECODED_MAPS / MAX_DISK_MAPS (prune_map_cache).
+    """
+    digest = hashlib.sha1(data).hexdigest()
+    sm = _DECODED.get(digest)
+    if sm is not None:
+        _DECODED.move_to_end(digest)
+        return sm
+
+    cache_file = Path(cache_dir) / f"{digest}.smc" if cache_dir else None
+    if cache_file is not None and cache_file.exists():
+        try:
+            sm = SourceMap.load(cache_file)
+            os.utime(cache_file)  # mtime = son kullanım (prune sırası)
+        except Exception:
+            sm = None
+    if sm is None:
+        sm = SourceMap.from_json(json.loads(data.decode("utf-8", errors="ignore")))
+        if cache_file is not None:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            sm.dump(cache_file)
+            prune_map_cache(cache_file.parent)
+    _remember(_DECODED, digest, sm, MAX_DECODED_MAPS)
+    return sm
+
+
+def prune_map_cache(cache_dir: Path, keep: int = MAX_DISK_MAPS) -> int:
+    """cache_dir'de en son kullanılan `keep` .smc dosyası dışındakileri siler. Dönen: silinen."""
+    files = []
+    for p in Path(cache_dir).glob("*.smc"):
+        try:
+            files.append((p.stat().st_mtime_ns, p))
+        except OSError:
+            continue
+    if len(files) <= keep:
+        return 0
+    files.sort(reverse=True)  # en yeni kullanılan başta
+    for _, p in files[keep:]:
+        p.unlink(missing_ok=True)
+    return len(files) - keep
+
+
+class SourceMapResolver:
+    """
+    Log frame URL'lerini (bundle.js, main.<hash>.hot-update.js, main.<hash>.js)
+    proje kaynak dosyalarına çözer.
+
+    .map dosyası şu sırayla aranır: JS dosyasındaki sourceMappingURL, map_dirs
+    ve proje build klasörleri; fetch_remote=True ise dev server'dan `<url>.map`.
+
+    Süreç boyunca tek örnek kullanılmalıdır (get_source_map_resolver): yerel
+    map'ler (yol, mtime, boyut) ile önbelleklenir, dosya değişmedikçe tekrar
+    okunmaz/hash'lenmez; uzak map'ler REMOTE_TTL saniye tutulur. Her iki
+    kayıt da en fazla MAX_MAP_URLS girdi tutar (LRU).
+    """
+
+    def __init__(
+        self,
+        project_root: Path,
+        cache_dir: Optional[Path] = None,
+        map_dirs: Iterable[Path] = (),
+        fetch_remote: bool = False,
+    ):
+        self.project_root = Path(project_root)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.map_dirs = [Path(d) for d in map_dirs] + [
+            self.project_root / "build" / "static" / "js",
+            self.project_root / "build",
+        ]
+        self.fetch_remote = fetch_remote
+        # .map yolu → ((mtime_ns, size), map); url → (indirilme zamanı, map)
+        self._local: "OrderedDict[str, Tuple[Tuple[int, int], Optional[SourceMap]]]" = (
+            OrderedDict()
+        )
+        self._remote: "OrderedDict[str, Tuple[float, Optional[SourceMap]]]" = OrderedDict()
+
+    def _local_map_path(self, url: str) -> Optional[Path]:
+        name = Path(urlsplit(url).path).name
+        if not name:
+            return None
+        for d in self.map_dirs:
+            js = d / name
+            if js.is_file():
+                try:
+                    with open(js, "rb") as f:
+                        f.seek(max(0, js.stat().st_size - 512))
+                        m = _MAPPING_URL_RE.search(f.read())
+                except OSError:
+                    m = None
+                if m and not m.group(1).startswith(b"data:"):
+                    ref = d / m.group(1).decode("utf-8", errors="ignore")
+                    if ref.is_file():
+                        return ref
+            cand = d / f"{name}.map"
+            if cand.is_file():
+                return cand
+        return None
+
+    def _load_local(self, path: Path) -> Optional[SourceMap]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        hit = self._local.get(str(path))
+        if hit is not None and hit[0] == stamp:
+            self._local.move_to_end(str(path))
+            return hit[1]
+        try:
+            sm = load_source_map(path.read_bytes(), self.cache_dir)
+        except Exception:
+            sm = None
+        _remember(self._local, str(path), (stamp, sm), MAX_MAP_URLS)
+        return sm
+
+    def _remote_map_bytes(self, url: str) -> Optional[bytes]:
+        if not self.fetch_remote or not url.startswith(("http://", "https://")):
+            return None
+        try:
+            with urlopen(url.split("?", 1)[0] + ".map", timeout=FETCH_TIMEOUT) as resp:
+                return resp.read()
+        except Exception:
+            return None
+
+    def map_for_url(self, url: str) -> Optional[SourceMap]:
+        path = self._local_map_path(url)
+        if path is not None:
+            return self._load_local(path)
+        if not self.fetch_remote:
+            return None
+        hit = self._remote.get(url)
+        if hit is not None and time.monotonic() - hit[0] < REMOTE_TTL:
+            self._remote.move_to_end(url)
+            return hit[1]
+        data = self._remote_map_bytes(url)
+        try:
+            sm = load_source_map(data, self.cache_dir) if data else None
+        except Exception:
+            sm = None
+        _remember(self._remote, url, (time.monotonic(), sm), MAX_MAP_URLS)
+        return sm
+
+    def source_to_project_file(self, source: str) -> Optional[Path]:
+        """webpack://app/./src/x.js, ../src/x.js, components/x.js → proje dosyası."""
+        path = re.sub(r"^[\w-]+://[^/]*", "", source).split("?", 1)[0]
+        parts = [p for p in path.split("/") if p not in ("", ".", "..")]
+        if not parts or "node_modules" in parts:
+            return None
+        for i in range(len(parts)):
+            if i and len(parts) - i < 2:
+                break  # tek başına dosya adıyla eşleştirme yapma
+            for base in (self.project_root, self.project_root / "src"):
+                cand = base.joinpath(*parts[i:])
+                if cand.is_file():
+                    return cand
+        return None
+
+    def resolve(self, url: str, line: int, col: int) -> Optional[Tuple[Path, int, int]]:
+        """Üretilmiş konum → (proje dosyası, 1 tabanlı satır, 1 tabanlı sütun)."""
+        sm = self.map_for_url(url)
+        if sm is None:
+            return None
+        hit = sm.lookup(line, col)
+        if hit is None:
+            return None
+        path = self.source_to_project_file(hit[0])
+        return (path, hit[1], hit[2]) if path is not None else None
+
+
+_RESOLVERS: Dict[tuple, SourceMapResolver] = {}
+
+
+def get_source_map_resolver(
+    project_root: Path,
+    cache_dir: Optional[Path] = None,
+    map_dirs: Iterable[Path] = (),
+    fetch_remote: bool = False,
+) -> SourceMapResolver:
+    """Aynı süreçte aynı proje/ayarlar için tek bir SourceMapResolver paylaşılır."""
+    map_dirs = tuple(Path(d) for d in map_dirs)
+    key = (Path(project_root).resolve(), cache_dir and Path(cache_dir), map_dirs, fetch_remote)
+    resolver = _RESOLVERS.get(key)
+    if resolver is None:
+        resolver = _RESOLVERS[key] = SourceMapResolver(
+            project_root, cache_dir, map_dirs, fetch_remote
+        )
+    return resolver
@@ -0,0 +1,288 @@
+# filename: symbol_index.py
+from __future__ import annotations
+import hashlib
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+INDEX_VERSION = 2
+
+# `\bX\b` ile aynı semantik: tam \w+ dizileri, rakamla başlayanlar hariç
+_IDENT_RE = re.compile(r"\b[^\W\d]\w*")
+_WORD_RE = re.compile(r"[^\W\d]\w*")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS dirs (
+    rel TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, subdirs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, rel TEXT UNIQUE NOT NULL, dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, sha1 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE TABLE IF NOT EXISTS symbols (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (
+    symbol INTEGER NOT NULL, file INTEGER NOT NULL, PRIMARY KEY (symbol, file)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file);
+"""
+
+
+def is_indexable_symbol(symbol: str) -> bool:
+    """İndeks sadece \\w+ biçimindeki semboller için `\\bX\\b` ile eşdeğerdir."""
+    return bool(_WORD_RE.fullmatch(symbol))
+
+
+def extract_identifiers(text: str) -> Set[str]:
+    return set(_IDENT_RE.findall(text))
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class SymbolIndex:
+    """
+    Kalıcı tanımlayıcı → dosyalar indeksi (SQLite).
+
+    - lookup(): tek indeksli sorgu; dosya okunmaz, ağaç taranmaz
+    - refresh(): sadece mtime'ı değişen klasörler listelenir (dosya ekleme/
+      silme/yeniden adlandırma klasör mtime'ını değiştirir); yerinde düzenleme
+      klasör mtime'ını değiştirmediği için bilinen her dosya ayrıca stat'lanır
+      ve sadece (mtime, boyut) değişenler okunur
+    - Değişen dosya hash'i aynıysa (touch) tokenizasyon atlanır.
+
+        dirs(rel, mtime_ns, subdirs)     files(id, rel, dir, mtime_ns, size, sha1)
+        symbols(id, name)                postings(symbol, file)
+    """
+
+    def __init__(
+        self,
+        index_path: Path,
+        project_root: Path,
+        exts: Iterable[str],
+        skip_dirs: Iterable[str] = (),
+    ):
+        self.index_path = Path(index_path)
+        self.project_root = Path(project_root)
+        self._root_key = self.project_root.resolve().as_posix()
+        self.exts = tuple(sorted(exts))
+        self.skip_dirs = set(skip_dirs)
+        self._db: Optional[sqlite3.Connection] = None
+
+    # ---------- Disk ----------
+    @classmethod
+    def open(
+        cls,
+        index_path: Path,
+        project_root: Path,
+        exts: Iterable[str],
+        skip_dirs: Iterable[str] = (),
+    ) -> "SymbolIndex":
+        idx = cls(index_path, project_root, exts, skip_dirs)
+        idx._load()
+        return idx
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.index_path)
+        db.executescript(_SCHEMA)
+        return db
+
+    def _load(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            db = self._connect()
+        except sqlite3.DatabaseError:
+            # Eski (JSON) ya da bozuk dosya → sıfırdan kur
+            self.index_path.unlink()
+            db = self._connect()
+        self._db = db
+        wanted = {
+            "version": str(INDEX_VERSION),
+            "root": self._root_key,
+            "exts": ",".join(self.exts),
+            "skip_dirs": ",".join(sorted(self.skip_dirs)),
+        }
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        if any(meta.get(k) != v for k, v in wanted.items()):
+            # Farklı kök/uzantı seti → sıfırdan kur
+            for table in ("meta", "dirs", "files", "symbols", "postings"):
+                db.execute(f"DELETE FROM {table}")
+            db.executemany("INSERT INTO meta VALUES (?, ?)", wanted.items())
+            db.commit()
+
+    def save(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------- Güncelleme ----------
+    def _rel(self, path: Path) -> str:
+        rel = Path(path).relative_to(self.project_root).as_posix()
+        return "" if rel == "." else rel
+
+    def _abs(self, rel: str) -> Path:
+        return self.project_root / rel if rel else self.project_root
+
+    def _drop_file(self, file_id: int) -> None:
+        self._db.execute("DELETE FROM postings WHERE file = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _drop_dir(self, rel: str) -> int:
+        """Klasörü ve altındaki her şeyi indeksten siler. Dönen: silinen dosya sayısı."""
+        db = self._db
+        prefix = f"{rel}/" if rel else ""
+        like = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        ids = [
+            r[0]
+            for r in db.execute(
+                "SELECT id FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (rel, like)
+            )
+        ]
+        for file_id in ids:
+            self._drop_file(file_id)
+        db.execute("DELETE FROM dirs WHERE rel = ? OR rel LIKE ? ESCAPE '\\'", (rel, like))
+        return len(ids)
+
+    def _index_file(self, rel: str, dir_rel: str, st: os.stat_result) -> bool:
+        """Tek dosyayı (gerekirse) yeniden indeksler. Dönen: tokenize edildi mi."""
+        db = self._db
+        row = db.execute(
+            "SELECT id, mtime_ns, size, sha1 FROM files WHERE rel = ?", (rel,)
+        ).fetchone()
+        if row is not None and row[1] == st.st_mtime_ns and row[2] == st.st_size:
+            return False
+        try:
+            data = self._abs(rel).read_bytes()
+        except OSError:
+            return False
+        digest = _content_hash(data)
+        if row is not None and row[3] == digest:
+            # Sadece dokunulmuş (touch) dosya; semboller aynı
+            db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                (st.st_mtime_ns, st.st_size, row[0]),
+            )
+            return False
+
+        if row is not None:
+            file_id = row[0]
+            db.execute("DELETE FROM postings WHERE file = ?", (file_id,))
+            db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ?, sha1 = ? WHERE id = ?",
+                (st.st_mtime_ns, st.st_size, digest, file_id),
+            )
+        else:
+            file_id = db.execute(
+                "INSERT INTO files (rel, dir, mtime_ns, size, sha1) VALUES (?, ?, ?, ?, ?)",
+                (rel, dir_rel, st.st_mtime_ns, st.st_size, digest),
+            ).lastrowid
+        syms = extract_identifiers(data.decode("utf-8", errors="ignore"))
+        db.executemany("INSERT OR IGNORE INTO symbols (name) VALUES (?)", ((s,) for s in syms))
+        db.executemany(
+            "INSERT INTO postings SELECT id, ? FROM symbols WHERE name = ?",
+            ((file_id, s) for s in syms),
+        )
+        return True
+
+    def _scan_dir(self, rel: str, st_mtime_ns: int) -> Tuple[List[str], int, int]:
+        """
+        Değişmiş klasörü listeler: dosyalarını uzlaştırır, alt klasörlerini döner.
+        Dönen: (alt_klasörler, yeniden_indekslenen, silinen)
+        """
+        db = self._db
+        subdirs: List[str] = []
+        present: Dict[str, os.stat_result] = {}
+        try:
+            with os.scandir(self._abs(rel)) as it:
+                for e in it:
+                    child = f"{rel}/{e.name}" if rel else e.name
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in self.skip_dirs:
+                            subdirs.append(child)
+                    elif e.name.endswith(self.exts):
+                        try:
+                            present[child] = e.stat()
+                        except OSError:
+                            continue
+        except OSError:
+            return [], 0, self._drop_dir(rel)
+
+        reindexed = sum(self._index_file(child, rel, st) for child, st in present.items())
+        gone = [
+            (file_id, frel)
+            for file_id, frel in db.execute("SELECT id, rel FROM files WHERE dir = ?", (rel,))
+            if frel not in present
+        ]
+        for file_id, _ in gone:
+            self._drop_file(file_id)
+        subdirs.sort()
+        db.execute(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+            (rel, st_mtime_ns, "\n".join(subdirs)),
+        )
+        return subdirs, reindexed, len(gone)
+
+    def refresh(self) -> Tuple[int, int]:
+        """
+        İndeksi dosya sistemiyle uzlaştırır (bkz. sınıf açıklaması).
+        Dönen: (yeniden_indekslenen, silinen)
+        """
+        db = self._db
+        known = {rel: (mtime, sub) for rel, mtime, sub in db.execute("SELECT * FROM dirs")}
+        reindexed = removed = 0
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            try:
+                st = os.stat(self._abs(rel))
+            except OSError:
+                removed += self._drop_dir(rel)
+                continue
+            prev = known.get(rel)
+            if prev is not None and prev[0] == st.st_mtime_ns:
+                subdirs = prev[1].split("\n") if prev[1] else []
+            else:
+                old_subdirs = set(prev[1].split("\n")) if prev and prev[1] else set()
+                subdirs, n_new, n_gone = self._scan_dir(rel, st.st_mtime_ns)
+                for gone_dir in old_subdirs - set(subdirs):
+                    n_gone += self._drop_dir(gone_dir)
+                reindexed += n_new
+                removed += n_gone
+            stack.extend(subdirs)
+
+        # Yerinde düzenlenen dosyalar: (mtime, boyut) anahtarı değişenler yeniden okunur
+        rows = db.execute("SELECT id, rel, dir, mtime_ns, size FROM files").fetchall()
+        for file_id, rel, dir_rel, mtime_ns, size in rows:
+            try:
+                st = os.stat(self._abs(rel))
+            except OSError:
+                self._drop_file(file_id)
+                removed += 1
+                continue
+            if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                reindexed += self._index_file(rel, dir_rel, st)
+        return reindexed, removed
+
+    # ---------- Sorgu ----------
+    def lookup(self, symbol: str) -> List[Path]:
+        rels = self._db.execute(
+            "SELECT f.rel FROM symbols s JOIN postings p ON p.symbol = s.id "
+            "JOIN files f ON f.id = p.file WHERE s.name = ? ORDER BY f.rel",
+            (symbol,),
+        )
+        return [self.project_root / rel for (rel,) in rels]
@@ -0,0 +1,6 @@
+# filename: conftest.py
+import sys
+from pathlib import Path
+
+# APP_Api modülleri düz adla import edilir (main.py ile aynı)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
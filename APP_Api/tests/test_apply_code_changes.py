@@ -0,0 +1,266 @@
+# filename: test_apply_code_changes.py
+import json
+from pathlib import Path
+
+import pytest
+
+import apply_code_changes as acc
+from apply_code_changes import (
+    ApplyTransaction,
+    _locate,
+    apply_code_changes,
+    apply_code_overwrite,
+    normalized_hash,
+)
+from backup_store import BackupStore
+
+SRC = b"".join(f"line {i}\n".encode() for i in range(10))
+
+
+def _lines(data: bytes = SRC):
+    return data.splitlines(keepends=True)
+
+
+# ---------- _locate ----------
+def test_locate_exact_at_expected_line():
+    assert _locate(_lines(), ["line 3", "line 4"], 3, 0, "utf-8") == (3, 1.0)
+
+
+def test_locate_ignores_whitespace_differences():
+    assert _locate(_lines(), ["  line   3 "], 3, 0, "utf-8") == (3, 1.0)
+
+
+def test_locate_searches_within_window_and_prefers_smallest_offset():
+    lines = _lines(b"x\ndup\ny\nz\ndup\n")
+    assert _locate(lines, ["dup"], 2, 0, "utf-8")[0] is None
+    assert _locate(lines, ["dup"], 2, 1, "utf-8") == (1, 1.0)
+    assert _locate(lines, ["dup"], 3, 1, "utf-8") == (4, 1.0)
+
+
+def test_locate_fuzzy_match_above_threshold():
+    start, score = _locate(_lines(), ["line 5;"], 5, 0, "utf-8")
+    assert start == 5 and 0.85 <= score < 1.0
+
+
+def test_locate_rejects_poor_match():
+    start, score = _locate(_lines(), ["something else"], 5, 3, "utf-8")
+    assert start is None and score < 0.85
+
+
+def test_locate_never_runs_past_the_file():
+    assert _locate(_lines(), ["line 9", "line 10"], 9, 5, "utf-8")[0] is None
+
+
+# ---------- Hunk uygulama ----------
+def _run(tmp_path, changes, data=SRC, **kwargs):
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True, exist_ok=True)
+    target = repo / "src" / "a.js"
+    target.write_bytes(data)
+    session = tmp_path / "reports" / "analysis_1"
+    session.mkdir(parents=True, exist_ok=True)
+    response = session / "response.json"
+    response.write_text(json.dumps({"code_change": {"src/a.js": {"code": "", "changes": changes}}}))
+    kwargs.setdefault("backups", BackupStore(tmp_path / "backups"))
+    report = apply_code_changes(response, repo, **kwargs)
+    return report, target
+
+
+def test_hunks_apply_bottom_up_with_independent_sizes(tmp_path):
+    report, target = _run(tmp_path, {
+        "1": {"remove": ["line 1"], "add": ["one", "uno"]},
+        "5": {"remove": ["line 5", "line 6"], "add": ["five-six"]},
+        "8": {"remove": [], "add": ["inserted"]},
+    })
+    assert report["applied"] == 3 and report["failed"] == 0
+    assert target.read_text().splitlines() == [
+        "line 0", "one", "uno", "line 2", "line 3", "line 4", "five-six",
+        "line 7", "inserted", "line 8", "line 9",
+    ]
+
+
+def test_drift_of_earlier_hunk_carries_to_later_ones(tmp_path):
+    report, target = _run(tmp_path, {
+        "2": {"remove": ["line 4"], "add": ["four"]},
+        "5": {"remove": ["line 7"], "add": ["seven"]},
+    }, window=3)
+    offsets = [h["offset"] for h in report["files"]["src/a.js"]["applied"]]
+    assert offsets == [2, 2]
+    assert "four\n" in target.read_text() and "seven\n" in target.read_text()
+
+
+def test_failed_and_overlapping_hunks_are_reported(tmp_path):
+    report, target = _run(tmp_path, {
+        "2": {"remove": ["line 2", "line 3"], "add": ["x"]},
+        "3": {"remove": ["line 3"], "add": ["y"]},
+        "7": {"remove": ["nowhere to be found"], "add": ["z"]},
+        "abc": {"remove": [], "add": []},
+    })
+    reasons = {f["line"]: f["reason"] for f in report["files"]["src/a.js"]["failed"]}
+    assert reasons[3] == "overlaps a previous hunk"
+    assert reasons[7].startswith("remove lines not found")
+    assert reasons["abc"] == "invalid line number"
+    assert report["applied"] == 1
+    assert target.read_text().splitlines()[2] == "x"
+
+
+def test_crlf_and_missing_final_newline_are_preserved(tmp_path):
+    report, target = _run(tmp_path, {"1": {"remove": ["b"], "add": ["B"]}}, data=b"a\r\nb")
+    assert report["applied"] == 1
+    assert target.read_bytes() == b"a\r\nB\r\n"
+
+
+def test_dry_run_leaves_file_and_backups_untouched(tmp_path):
+    report, target = _run(tmp_path, {"1": {"remove": ["line 1"], "add": ["one"]}}, dry_run=True)
+    assert report["applied"] == 1 and not report["files"]["src/a.js"]["written"]
+    assert target.read_bytes() == SRC
+    assert BackupStore(tmp_path / "backups").load_manifest("analysis_1") is None
+
+
+def test_noop_hunks_do_not_write(tmp_path):
+    report, target = _run(tmp_path, {"1": {"remove": ["line 1"], "add": ["line 1  "]}})
+    assert report["files"]["src/a.js"]["unchanged"]
+    assert not report["files"]["src/a.js"]["written"]
+
+
+@pytest.mark.parametrize("atomic", [True, False])
+def test_written_files_are_backed_up(tmp_path, atomic):
+    report, target = _run(tmp_path, {"0": {"remove": ["line 0"], "add": ["zero"]}}, atomic=atomic)
+    assert report["files"]["src/a.js"]["written"]
+    manifest = BackupStore(tmp_path / "backups").load_manifest("analysis_1")
+    assert list(manifest["files"]) == ["src/a.js"]
+
+
+# ---------- Çakışma (dosya prompt'tan sonra değişti) ----------
+EDITED = SRC.replace(b"line 9", b"line 9 // edited by hand")
+
+
+def _record_prompt_hash(tmp_path, data=SRC):
+    session = tmp_path / "reports" / "analysis_1"
+    session.mkdir(parents=True, exist_ok=True)
+    (session / "prompt.json").write_text(json.dumps(
+        {"source_hashes": {"src/a.js": normalized_hash(data)}}
+    ))
+
+
+@pytest.mark.parametrize("policy, conflict, applied", [
+    ("refuse", True, 0), ("flag", True, 1), ("force", False, 1),
+])
+def test_diff_conflict_policies(tmp_path, policy, conflict, applied):
+    _record_prompt_hash(tmp_path)
+    report, target = _run(
+        tmp_path, {"1": {"remove": ["line 1"], "add": ["one"]}}, data=EDITED, on_conflict=policy
+    )
+    file_report = report["files"]["src/a.js"]
+    assert file_report["conflict"] is conflict
+    assert report["applied"] == applied
+    assert (b"one\n" in target.read_bytes()) is bool(applied)
+    if policy == "refuse":
+        assert file_report["failed"][0]["reason"] == "file changed since the prompt was built"
+        assert target.read_bytes() == EDITED
+
+
+def test_diff_formatting_only_edits_are_not_conflicts(tmp_path):
+    _record_prompt_hash(tmp_path)
+    report, _ = _run(
+        tmp_path, {"1": {"remove": ["line 1"], "add": ["one"]}},
+        data=SRC.replace(b"\n", b"  \r\n") + b"\n\n",
+    )
+    assert not report["files"]["src/a.js"]["conflict"] and report["applied"] == 1
+
+
+def _overwrite(tmp_path, code, data=EDITED, **kwargs):
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True, exist_ok=True)
+    target = repo / "src" / "a.js"
+    target.write_bytes(data)
+    response = tmp_path / "reports" / "analysis_1" / "response.json"
+    response.write_text(json.dumps({"code_change": {"src/a.js": {"code": code}}}))
+    kwargs.setdefault("backups", BackupStore(tmp_path / "backups"))
+    return apply_code_overwrite(response, repo, **kwargs), target
+
+
+@pytest.mark.parametrize("policy, actions, written", [
+    ("refuse", ["refused"], False), ("flag", ["applied"], True), ("force", [], True),
+])
+def test_overwrite_conflict_policies(tmp_path, policy, actions, written):
+    _record_prompt_hash(tmp_path)
+    result, target = _overwrite(tmp_path, "new content", on_conflict=policy)
+    assert [c["action"] for c in result["conflicts"]] == actions
+    assert (target.read_text() == "new content\n") is written
+    assert bool(result["updated_files"]) is written
+
+
+def test_overwrite_skips_identical_content_before_checking_conflicts(tmp_path):
+    _record_prompt_hash(tmp_path)
+    result, target = _overwrite(tmp_path, EDITED.decode())
+    assert result["unchanged"] == [str(target.resolve())]
+    assert result["conflicts"] == [] and result["updated_files"] == []
+
+
+def test_unknown_conflict_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="on_conflict"):
+        _run(tmp_path, {"1": {"remove": [], "add": ["x"]}}, on_conflict="merge")
+
+
+# ---------- ApplyTransaction ----------
+def test_transaction_rolls_back_when_a_rename_fails(tmp_path, monkeypatch):
+    a, b, c = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "new.txt"
+    a.write_bytes(b"a-old")
+    b.write_bytes(b"b-old")
+    real_replace = acc.os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(Path(dst))
+        if Path(dst) == b and calls.count(b) == 1:
+            raise OSError("disk full")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(acc.os, "replace", flaky_replace)
+    with pytest.raises(OSError, match="disk full"):
+        with ApplyTransaction() as tx:
+            tx.stage(c, b"c-new")
+            tx.stage(a, b"a-new")
+            tx.stage(b, b"b-new")
+    assert a.read_bytes() == b"a-old" and b.read_bytes() == b"b-old"
+    assert not c.exists()  # önceden yoktu → geri almada silinir
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "b.txt"]  # tmp kalmadı
+    assert tx._orig_dir is None
+
+
+def test_new_files_get_umask_mode(tmp_path):
+    with ApplyTransaction() as tx:
+        tx.stage(tmp_path / "n.txt", b"x")
+    assert (tmp_path / "n.txt").stat().st_mode & 0o777 == acc._NEW_FILE_MODE
+
+
+# ---------- --loop ----------
+def test_loop_does_not_reapply_an_applied_session(tmp_path):
+    import inspect
+
+    import main
+    from session_registry import SessionRegistry
+
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True)
+    target = repo / "src" / "a.js"
+    target.write_bytes(SRC)
+    out_dir = tmp_path / "reports"
+    session = out_dir / "analysis_1"
+    session.mkdir(parents=True)
+    (session / "response.json").write_text(json.dumps(
+        {"code_change": {"src/a.js": {"code": "", "changes": {"1": {"remove": [], "add": ["new"]}}}}}
+    ))
+    SessionRegistry(out_dir).record("analysis_1", "analyzed", path=session)
+
+    kwargs = dict.fromkeys(inspect.signature(main.run_pipeline).parameters)
+    kwargs.update(
+        project_root=repo, out_dir=out_dir, do_collect=False, do_analyze=False,
+        do_apply=True, dry_run=False, window=0, atomic=True, use_overwrite=False,
+        backups=BackupStore(tmp_path / "backups"), on_conflict="force",
+    )
+    for _ in range(3):  # yeni log yokken üç --loop turu
+        main.run_pipeline(**kwargs)
+    assert target.read_text().splitlines().count("new") == 1
+    assert SessionRegistry(out_dir).status("analysis_1") == "applied"
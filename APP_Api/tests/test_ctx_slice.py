@@ -0,0 +1,94 @@
+# filename: test_ctx_slice.py
+from ctx_slice import (
+    GAP_MARKER,
+    find_definition_lines,
+    is_sliced_section,
+    merge_spans,
+    render_slices,
+    slice_context,
+    slice_positions,
+    slice_spans,
+)
+
+SRC = """import React from 'react';
+import { helper, unused } from './util';
+import other from './other';
+
+// handleSave: kaydet
+function handleSave(data) {
+  const x = helper(data);
+  return x;
+}
+
+function Form() {
+  const onClick = () => {
+    handleSave({ a: 1 });
+  };
+  return null;
+}
+
+const label = "handleSave değil";
+export default Form;
+"""
+
+
+# ---------- Aralıklar ----------
+def test_spans_cover_definition_call_site_and_needed_imports():
+    # helper import'u tanım gövdesinde kullanıldığı için gelir; React/other gelmez
+    assert slice_spans(SRC, "handleSave") == [(1, 1), (5, 8), (10, 13)]
+    assert find_definition_lines(SRC, "handleSave") == [5]
+
+
+def test_mentions_in_comments_and_strings_are_ignored():
+    assert slice_spans("// handleSave\nconst s = 'handleSave';\n", "handleSave") == []
+    assert slice_context("const s = 'handleSave';\n", "handleSave") == ""
+
+
+def test_long_bodies_fall_back_to_a_window_around_the_hit():
+    body = "".join(f"  step{i}();\n" for i in range(30))
+    text = f"function big() {{\n{body}  target();\n}}\n"
+    hit = 31
+    spans = slice_spans(text, "target", context_lines=2, max_body_lines=10)
+    assert spans == [(0, 0), (hit - 2, hit + 2)]
+
+
+def test_positions_slice_the_enclosing_function():
+    assert slice_positions(SRC, [(12, 4)]) == [(10, 13)]
+    assert slice_positions(SRC, [(999, 0)]) == []
+
+
+def test_merge_spans_joins_overlapping_and_adjacent_ranges():
+    assert merge_spans([(5, 6), (0, 1), (2, 3), (6, 9), (11, 12)]) == [(0, 3), (5, 9), (11, 12)]
+
+
+# ---------- Çıktı ----------
+def test_render_keeps_original_line_numbers_and_marks_gaps():
+    out = render_slices(SRC, slice_spans(SRC, "handleSave"))
+    assert out.split("\n") == [
+        GAP_MARKER,
+        " 1| import { helper, unused } from './util';",
+        GAP_MARKER,
+        " 5| function handleSave(data) {",
+        " 6|   const x = helper(data);",
+        " 7|   return x;",
+        " 8| }",
+        GAP_MARKER,
+        "10| function Form() {",
+        "11|   const onClick = () => {",
+        "12|     handleSave({ a: 1 });",
+        "13|   };",
+        GAP_MARKER,
+        "",
+    ]
+
+
+def test_render_has_no_gap_marker_at_file_edges_or_between_adjacent_spans():
+    text = "a\nb\nc"
+    assert render_slices(text, [(0, 0), (1, 2)]) == "0| a\n1| b\n2| c\n"
+    assert render_slices(text, []) == ""
+
+
+def test_rendered_sections_are_recognized_as_sliced():
+    assert is_sliced_section(">>> src/a.js\n" + render_slices(SRC, [(5, 8)]))
+    assert is_sliced_section(">>> src/a.js\n" + render_slices("a\nb\n", [(0, 0)]))
+    assert not is_sliced_section(">>> src/a.js\n" + SRC)
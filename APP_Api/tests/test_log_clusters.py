@@ -0,0 +1,84 @@
+# filename: test_log_clusters.py
+from log_clusters import ClusterStore, cluster_log, write_cluster_log
+
+BUNDLE = "http://localhost:3000/static/js/main.3e6e750b.js"
+
+
+def _log(*items):
+    """items: (saniye, mesaj, satır) → log metni"""
+    return "\n".join(
+        f"2025-01-01T00:00:{s:02d}Z - ERROR: {msg} - @{BUNDLE}:{line}:5\n"
+        f"handleLogging@{BUNDLE}:{line + 10}:1"
+        for s, msg, line in items
+    )
+
+
+def test_clusters_group_by_normalized_message_and_frames():
+    clusters = cluster_log(_log((1, "id 17 missing", 40), (2, "id 99 missing", 40), (3, "other", 40)))
+    assert sorted(c["count"] for c in clusters.values()) == [1, 2]
+    c = next(c for c in clusters.values() if c["count"] == 2)
+    assert c["message"] == "id <n> missing"
+    assert (c["first_seen"], c["last_seen"]) == ("2025-01-01T00:00:01Z", "2025-01-01T00:00:02Z")
+    assert "id 99 missing" in c["sample"]
+
+
+def test_moved_frame_keeps_fingerprint_but_changes_variant():
+    a, = cluster_log(_log((1, "boom", 40))).values()
+    b, = cluster_log(_log((1, "boom", 41))).values()
+    assert a["fingerprint"] == b["fingerprint"]
+    assert a["variant"] != b["variant"]
+
+
+def test_select_splits_new_changed_and_known(tmp_path):
+    store = ClusterStore(tmp_path / "clusters.json")
+    store.mark_analyzed(cluster_log(_log((1, "known", 40), (2, "moved", 40))).values(), "s1")
+    clusters = cluster_log(_log((3, "known", 40), (4, "moved", 42), (5, "fresh", 40)))
+    pending, skipped = store.select(clusters)
+    assert {c["message"]: c["status"] for c in pending} == {"moved": "changed", "fresh": "new"}
+    assert [(c["message"], c["status"]) for c in skipped] == [("known", "known")]
+
+
+def test_mark_analyzed_merges_with_stored_record(tmp_path):
+    path = tmp_path / "clusters.json"
+    store = ClusterStore(path)
+    first, = cluster_log(_log((5, "boom", 40), (6, "boom", 40))).values()
+    store.mark_analyzed([first], "s1")
+    store.save()
+
+    store = ClusterStore(path)
+    again, = cluster_log(_log((2, "boom", 41), (9, "boom", 41), (9, "boom", 41))).values()
+    store.mark_analyzed([again], "s2")
+    rec = store.clusters[first["fingerprint"]]
+    assert rec["count"] == 5
+    assert rec["first_seen"] == "2025-01-01T00:00:02Z"
+    assert rec["last_seen"] == "2025-01-01T00:00:09Z"
+    assert rec["variant"] == again["variant"]
+    assert rec["session"] == "s2"
+
+
+def test_touch_refreshes_skipped_clusters_without_reanalysis(tmp_path):
+    store = ClusterStore(tmp_path / "clusters.json")
+    c, = cluster_log(_log((1, "boom", 40))).values()
+    store.mark_analyzed([c], "s1")
+    analyzed_at = store.clusters[c["fingerprint"]]["analyzed_at"]
+
+    _, skipped = store.select(cluster_log(_log((7, "boom", 40), (8, "boom", 40))))
+    store.touch(skipped)
+    rec = store.clusters[c["fingerprint"]]
+    assert (rec["count"], rec["last_seen"]) == (3, "2025-01-01T00:00:08Z")
+    assert (rec["analyzed_at"], rec["session"]) == (analyzed_at, "s1")
+
+
+def test_store_ignores_unreadable_or_old_files(tmp_path):
+    path = tmp_path / "clusters.json"
+    path.write_text("{not json")
+    assert ClusterStore(path).clusters == {}
+    path.write_text('{"version": 0, "clusters": {"x": {}}}')
+    assert ClusterStore(path).clusters == {}
+
+
+def test_write_cluster_log_writes_one_sample_per_cluster(tmp_path):
+    clusters = cluster_log(_log((1, "a", 40), (2, "a", 40), (3, "b", 40)))
+    out = tmp_path / "log_clusters.txt"
+    assert write_cluster_log(clusters.values(), out) == 2
+    assert cluster_log(out.read_text()).keys() == clusters.keys()
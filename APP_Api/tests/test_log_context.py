@@ -0,0 +1,124 @@
+# filename: test_log_context.py
+import json
+
+import pytest
+
+import main
+from apply_code_changes import apply_code_overwrite
+from ctx_slice import is_sliced_section
+from find_func import iter_context_chunks_from_log, parse_log_entries, resolve_log_frames
+from llama_error_analysis import _infer_context_mode
+from sourcemap import SourceMapResolver
+
+UTIL = """import { x } from './x';
+
+export function helper(a) {
+  const b = a.missing.value;
+  return b;
+}
+
+export function unrelated() {
+  return 1;
+}
+"""
+
+APP = """import React from 'react';
+function handleClick() {
+  helper(null);
+}
+export default function App() {
+  return null;
+}
+"""
+
+LOG = """2025-01-01T00:00:01Z - ERROR: boom - @http://localhost:3000/src/util.js:4:13
+handleClick@http://localhost:3000/static/js/bundle.js:100:1
+react_stack_bottom_frame@http://localhost:3000/static/js/bundle.js:5:1
+"""
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "app"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "util.js").write_text(UTIL)
+    (root / "src" / "App.js").write_text(APP)
+    log = tmp_path / "log.txt"
+    log.write_text(LOG)
+    return root, log
+
+
+def test_frames_resolve_by_url_and_by_function_name(project):
+    root, log = project
+    hits = resolve_log_frames(parse_log_entries(LOG), root)
+    assert hits == {
+        root / "src" / "util.js": {"positions": {(3, 12)}, "symbols": set()},
+        root / "src" / "App.js": {"positions": set(), "symbols": {"handleClick"}},
+    }
+
+
+def test_index_lookup_gives_the_same_resolution(project, tmp_path):
+    root, _ = project
+    entries = parse_log_entries(LOG)
+    assert resolve_log_frames(entries, root, index_path=tmp_path / "i.db") == resolve_log_frames(entries, root)
+
+
+def test_bundle_frames_resolve_through_source_maps(project):
+    root, _ = project
+    js = root / "build" / "static" / "js"
+    js.mkdir(parents=True)
+    (js / "main.abc.js").write_text("x\n")
+    # gen 1:1 → src/App.js 3:3 (helper çağrısı)
+    (js / "main.abc.js.map").write_text(json.dumps({
+        "version": 3, "sources": ["webpack://app/./src/App.js"], "names": [], "mappings": "AAEE",
+    }))
+    entries = parse_log_entries(
+        "2025-01-01T00:00:01Z - ERROR: x - @http://localhost:3000/static/js/main.abc.js:1:1\n"
+    )
+    hits = resolve_log_frames(entries, root, sourcemaps=SourceMapResolver(root))
+    assert hits == {root / "src" / "App.js": {"positions": {(2, 2)}, "symbols": set()}}
+
+
+def test_log_context_is_sliced_around_the_frames(project):
+    root, log = project
+    chunks = list(iter_context_chunks_from_log(root, log))
+    assert [c.split("\n", 1)[0] for c in chunks] == [">>> src/App.js", ">>> src/util.js"]
+    assert all(is_sliced_section(c) for c in chunks)
+    util = chunks[1]
+    assert " 3|   const b = a.missing.value;" in util  # 0 tabanlı numaralar
+    assert "unrelated" not in util
+    assert _infer_context_mode("LOGS\n" + "\n".join(chunks)) == "slice"
+    assert _infer_context_mode("LOGS\n>>> src/util.js\n" + UTIL) == "file"
+
+
+def _session(tmp_path, mode):
+    session = tmp_path / "reports" / f"analysis_{mode}"
+    session.mkdir(parents=True)
+    (session / "prompt.json").write_text(json.dumps({"context_mode": mode}))
+    (session / "response.json").write_text(
+        json.dumps({"code_change": {"src/util.js": {"code": "export const a = 1;\n"}}})
+    )
+    return session / "response.json"
+
+
+@pytest.mark.parametrize("mode", ["slice", "log"])
+def test_overwrite_refuses_sessions_built_from_slices(project, tmp_path, mode):
+    root, _ = project
+    with pytest.raises(ValueError, match="diff mode"):
+        apply_code_overwrite(_session(tmp_path, mode), root)
+    assert (root / "src" / "util.js").read_text() == UTIL
+
+
+def test_overwrite_accepts_full_file_sessions(project, tmp_path):
+    root, _ = project
+    result = apply_code_overwrite(_session(tmp_path, "file"), root)
+    assert result["updated_files"] == [str(root / "src" / "util.js")]
+
+
+@pytest.mark.parametrize("argv", [
+    ["--apply", "--overwrite"],
+    ["--apply", "--overwrite", "--target", "helper", "--slice"],
+])
+def test_cli_rejects_overwrite_with_sliced_collection(argv):
+    with pytest.raises(SystemExit, match="--overwrite"):
+        main.main(argv)
@@ -0,0 +1,95 @@
+# filename: test_log_tailer.py
+import pytest
+
+from log_tailer import LogTailer
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "log.txt", tmp_path / "state" / "checkpoint.json"
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read(paths, commit=True):
+    tailer = LogTailer(*paths)
+    text, info = tailer.read_new()
+    if commit:
+        tailer.commit()
+    return text, info
+
+
+def test_first_read_returns_everything(paths):
+    log, _ = paths
+    log.write_text("a\nb\n")
+    text, info = _read(paths)
+    assert text == "a\nb\n"
+    assert info == {"start": 0, "end": 4, "size": 4, "reset": "new"}
+
+
+def test_only_appended_lines_are_returned(paths):
+    log, _ = paths
+    log.write_text("a\n")
+    _read(paths)
+    _append(log, "b\nc\n")
+    assert _read(paths) == ("b\nc\n", {"start": 2, "end": 6, "size": 6, "reset": None})
+    assert _read(paths)[0] == ""
+
+
+def test_partial_last_line_waits_for_next_read(paths):
+    log, _ = paths
+    log.write_text("a\nhalf")
+    assert _read(paths)[0] == "a\n"
+    _append(log, " line\n")
+    assert _read(paths)[0] == "half line\n"
+
+
+def test_uncommitted_read_is_repeated(paths):
+    log, _ = paths
+    log.write_text("a\n")
+    _read(paths, commit=False)
+    text, info = _read(paths)
+    assert text == "a\n" and info["reset"] == "new"
+
+
+def test_rotation_restarts_from_the_new_file(paths):
+    log, _ = paths
+    log.write_text("old 1\nold 2\n")
+    _read(paths)
+    log.rename(log.with_name("log.txt.1"))  # eski inode yaşamaya devam eder
+    log.write_text("new\n")
+    text, info = _read(paths)
+    assert text == "new\n" and info["reset"] == "rotated"
+
+
+def test_truncation_restarts_from_the_top(paths):
+    log, _ = paths
+    log.write_text("first line\nsecond line\n")
+    _read(paths)
+    with open(log, "r+", encoding="utf-8") as f:
+        f.truncate(0)
+        f.write("x\n")
+    text, info = _read(paths)
+    assert text == "x\n" and info["reset"] == "truncated"
+
+
+def test_in_place_rewrite_is_detected_by_head_digest(paths):
+    log, _ = paths
+    log.write_text("aaaa\n")
+    _read(paths)
+    with open(log, "r+", encoding="utf-8") as f:
+        f.write("bbbb\nmore\n")
+    text, info = _read(paths)
+    assert text == "bbbb\nmore\n" and info["reset"] == "rewritten"
+
+
+def test_checkpoint_for_another_log_is_ignored(paths, tmp_path):
+    log, checkpoint = paths
+    log.write_text("a\n")
+    _read(paths)
+    other = tmp_path / "other.txt"
+    other.write_text("z\n")
+    assert _read((other, checkpoint)) == ("z\n", {"start": 0, "end": 2, "size": 2, "reset": "new"})
@@ -0,0 +1,70 @@
+# filename: test_model_fleet.py
+import threading
+import time
+
+import pytest
+
+import model_fleet
+from model_fleet import Endpoint, ModelFleet
+from python_api import ModelCallError
+
+
+class _FakeTransport:
+    def __init__(self, up):
+        self.up = up
+
+    def get(self, path, timeout):
+        if not self.up[0]:
+            raise ConnectionRefusedError("down")
+        return 200, b'{"version": "0"}'
+
+
+@pytest.fixture
+def fleet(monkeypatch):
+    up = [True]
+    monkeypatch.setattr(Endpoint, "ssh", property(lambda self: object()))
+    monkeypatch.setattr(model_fleet, "get_ollama_transport", lambda ssh, url: _FakeTransport(up))
+    fl = ModelFleet([Endpoint("gpu1", "h", 22, "u", "k")])
+    fl.up = up
+    yield fl
+    fl.stop_health_checks()
+
+
+# ---------- Süre bütçesi ----------
+def test_waiting_for_capacity_respects_deadline(fleet, monkeypatch):
+    release = threading.Event()
+
+    def slow_call(*args, **kwargs):
+        release.wait(5)
+        return {"ok": True, "text": "x", "retry": {"attempts": 1}}
+
+    monkeypatch.setattr(model_fleet, "send_prompt_with_retry", slow_call)
+    busy = threading.Thread(target=fleet.send_prompt, args=("p",))
+    busy.start()
+    while fleet.endpoints[0].inflight == 0:
+        time.sleep(0.01)
+    started = time.monotonic()
+    with pytest.raises(ModelCallError) as exc:
+        fleet.send_prompt("p", deadline=0.2)
+    assert exc.value.kind == "deadline"
+    assert time.monotonic() - started < 2
+    release.set()
+    busy.join()
+    assert fleet.endpoints[0].inflight == 0
+
+
+# ---------- Sağlık kontrolü ----------
+def test_background_checks_mark_hosts_down_and_up(fleet):
+    ep = fleet.endpoints[0]
+    fleet.start_health_checks(interval=0.02)
+    fleet.up[0] = False
+    deadline = time.monotonic() + 2
+    while ep.healthy and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not ep.healthy and ep.down_since is not None
+    fleet.up[0] = True
+    while not ep.healthy and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ep.healthy and ep.down_since is None
+    fleet.stop_health_checks()
+    assert fleet._checker is None
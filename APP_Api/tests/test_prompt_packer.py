@@ -0,0 +1,81 @@
+# filename: test_prompt_packer.py
+from prompt_packer import pack_prompt, split_code_sections
+
+FORMAT = "{log_text}\n---\n{codes_block}"
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def _entry(ts: str, msg: str, path: str = "src/a.js") -> str:
+    return f"2025-01-01T00:00:0{ts}Z - ERROR: {msg} - @http://localhost:3000/{path}:1:1"
+
+
+def _section(path: str, n: int = 10) -> str:
+    return f">>> {path}\n" + " ".join(["w"] * n)
+
+
+def _log_part(prompt: str) -> list:
+    return prompt.split("\n---\n")[0].splitlines()
+
+
+def test_split_code_sections_reads_find_fault_headers():
+    block = ">>> handleLogging (src/a.js)\nx\n>>> src/b.js\ny\nz"
+    assert split_code_sections(block) == [
+        ("src/a.js", ">>> handleLogging (src/a.js)\nx"),
+        ("src/b.js", ">>> src/b.js\ny\nz"),
+    ]
+
+
+def test_duplicates_keep_last_occurrence_order():
+    log = "\n".join([_entry("1", "boom A"), _entry("2", "boom B"), _entry("3", "boom A")])
+    prompt, report = pack_prompt(FORMAT, log, "", 1000, words)
+    assert _log_part(prompt) == [_entry("2", "boom B"), _entry("3", "boom A")]
+    dup = [d for d in report["dropped"] if d["kind"] == "duplicate_log_entry"]
+    assert [d["id"] for d in dup] == ["2025-01-01T00:00:01Z"]
+    # en yeni kayıt ilk sıraya (zorunlu) alınır
+    assert report["included"][0] == {
+        "kind": "log_entry", "id": "2025-01-01T00:00:03Z", "tokens": words(_entry("3", "boom A")) + 1,
+    }
+
+
+def test_newest_entry_is_sent_even_over_budget():
+    log = "\n".join([_entry("1", "old"), _entry("2", "new")])
+    prompt, report = pack_prompt(FORMAT, log, _section("src/b.js"), 0, words)
+    assert _log_part(prompt) == [_entry("2", "new")]
+    assert report["used_tokens"] > report["token_budget"]
+    assert {d["kind"] for d in report["dropped"]} == {"log_entry", "code"}
+
+
+def test_frame_hit_section_evicts_earlier_plain_sections():
+    log = _entry("1", "boom", "src/a.js")
+    codes = _section("src/b.js") + "\n" + _section("src/a.js")
+    budget = 1 + (words(log) + 1) + (words(_section("src/b.js")) + 1) + 5
+    prompt, report = pack_prompt(FORMAT, log, codes, budget, words)
+    assert ">>> src/a.js" in prompt and ">>> src/b.js" not in prompt
+    assert [i["kind"] for i in report["included"]] == ["log_entry", "code_frame_hit"]
+    assert {"kind": "code", "id": "src/b.js", "tokens": 13} in report["dropped"]
+    assert report["used_tokens"] <= budget
+
+
+def test_hit_sections_are_reported_first_but_kept_in_original_order():
+    log = _entry("1", "boom", "src/c.js")
+    codes = [_section("src/a.js", 2), _section("src/c.js", 2)]
+    prompt, report = pack_prompt(FORMAT, log, iter(codes), 1000, words)
+    assert [i["id"] for i in report["included"][1:]] == ["src/c.js", "src/a.js"]
+    assert prompt.split("\n---\n")[1] == "\n\n".join(codes)
+
+
+def test_stream_and_text_inputs_pack_identically():
+    log = "\n".join([_entry("1", "x", "src/b.js"), _entry("2", "y", "src/a.js")])
+    chunks = [_section("src/a.js", 3), _section("src/b.js", 30), _section("src/c.js", 3)]
+    a = pack_prompt(FORMAT, log, "\n".join(chunks), 40, words)
+    b = pack_prompt(FORMAT, log, iter(chunks), 40, words)
+    assert a == b
+
+
+def test_system_prompt_counts_as_overhead():
+    _, report = pack_prompt(FORMAT, "", "", 100, words, system_prompt="one two three")
+    assert report["overhead_tokens"] == 1 + 3
+    assert report["estimator"] == "words"
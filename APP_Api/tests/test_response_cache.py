@@ -0,0 +1,97 @@
+# filename: test_response_cache.py
+import os
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, response_cache_key
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(response_cache.time, "time", c.time)
+    return c
+
+
+def _put(cache, key):
+    return cache.put(key, "m", f"text {key}", {"key": key})
+
+
+# ---------- Anahtar ----------
+def test_key_depends_on_every_input():
+    base = response_cache_key("m", {"t": 0}, "sys", "p")
+    assert base == response_cache_key("m", {"t": 0}, "sys", "p")
+    others = {
+        response_cache_key("m2", {"t": 0}, "sys", "p"),
+        response_cache_key("m", {"t": 1}, "sys", "p"),
+        response_cache_key("m", {"t": 0}, None, "p"),
+        response_cache_key("m", {"t": 0}, "sys", "p2"),
+    }
+    assert base not in others and len(others) == 4
+    assert response_cache_key("m", {}, None, "p") == response_cache_key("m", {}, "", "p")
+
+
+# ---------- LRU ----------
+def test_memory_lru_evicts_least_recently_used(clock):
+    cache = ResponseCache(max_entries=2)
+    _put(cache, "a")
+    _put(cache, "b")
+    assert cache.get("a")["response_text"] == "text a"  # a en son kullanılan olur
+    _put(cache, "c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_entries_survive_a_new_instance(tmp_path, clock):
+    _put(ResponseCache(tmp_path), "k1")
+    entry = ResponseCache(tmp_path).get("k1")
+    assert entry["response_struct"] == {"key": "k1"}
+
+
+def test_prune_keeps_most_recently_accessed_disk_entries(tmp_path, clock):
+    cache = ResponseCache(tmp_path, max_disk_entries=2)
+    for i, key in enumerate(["k1", "k2", "k3"]):
+        _put(cache, key)
+        os.utime(cache._path(key), (clock.now + i, clock.now + i))
+    os.utime(cache._path("k1"), (clock.now + 10, clock.now + 10))  # k1'e son erişildi
+    assert cache.prune() == 1
+    assert not cache._path("k2").exists()
+    assert cache._path("k1").exists() and cache._path("k3").exists()
+
+
+# ---------- TTL ----------
+def test_expired_entries_are_dropped_from_memory_and_disk(tmp_path, clock):
+    cache = ResponseCache(tmp_path, ttl=60)
+    _put(cache, "k")
+    clock.now += 59
+    assert cache.get("k") is not None
+    clock.now += 2
+    assert cache.get("k") is None
+    assert not cache._path("k").exists()
+
+
+def test_zero_ttl_never_expires(tmp_path, clock):
+    cache = ResponseCache(tmp_path, ttl=0)
+    _put(cache, "k")
+    clock.now += 10 ** 9
+    assert cache.get("k") is not None
+
+
+def test_prune_removes_entries_past_ttl_by_mtime(tmp_path, clock):
+    cache = ResponseCache(tmp_path, ttl=60)
+    _put(cache, "old")
+    _put(cache, "new")
+    os.utime(cache._path("old"), (clock.now - 120, clock.now - 120))
+    os.utime(cache._path("new"), (clock.now, clock.now))
+    assert cache.prune() == 1
+    assert not cache._path("old").exists() and cache._path("new").exists()
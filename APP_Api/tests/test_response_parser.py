@@ -0,0 +1,98 @@
+# filename: test_response_parser.py
+import pytest
+
+from llama_error_analysis import ResponseParser, _parse_model_response_to_struct
+
+RESPONSE = """Here is the fix.
+
+UPDATED FILES
+src/a.js
+const a = 1;
+
+export default a;
+src/b.js
+let b;
+CHANGES
+src/a.js - 3
+- const a = 0;
++ const a = 1;
+  context line
+src/b.js-(10)
++ let b;
+Root of the problem:
+a was zero.
+
+
+
+It was never set.
+
+How to fix:
+Set it to one.
+src/a.js - 7
+- x
+"""
+
+EXPECTED = {
+    "code_change": {
+        "src/a.js": {
+            "code": "const a = 1;\n\nexport default a;",
+            "changes": {
+                "3": {"remove": ["const a = 0;"], "add": ["const a = 1;"]},
+                "7": {"remove": ["x"]},
+            },
+        },
+        "src/b.js": {"code": "let b;", "changes": {"10": {"add": ["let b;"]}}},
+    },
+    "root": "a was zero.\n\nIt was never set.",
+    "fix": "Set it to one.",
+    "raw": RESPONSE.strip(),
+}
+
+
+def _feed(text, size, **kwargs):
+    parser = ResponseParser(**kwargs)
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_whole_response():
+    assert _parse_model_response_to_struct(RESPONSE) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunked_feed_matches_whole_parse(size):
+    assert _feed(RESPONSE, size).close() == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 5])
+def test_crlf_split_across_chunks(size):
+    result = _feed(RESPONSE.replace("\n", "\r\n"), size).close()
+    assert result["code_change"] == EXPECTED["code_change"]
+    assert (result["root"], result["fix"]) == (EXPECTED["root"], EXPECTED["fix"])
+
+
+def test_files_are_reported_as_soon_as_their_block_closes():
+    seen = []
+    parser = ResponseParser(on_file=lambda path, code: seen.append(path))
+    head, tail = RESPONSE.split("CHANGES\n", 1)
+    parser.feed(head)
+    assert seen == ["src/a.js"] and parser.state == "files"
+    parser.feed("CHANGES\n")
+    assert seen == ["src/a.js", "src/b.js"] and parser.state == "changes"
+    parser.feed(tail)
+    assert parser.close() == EXPECTED
+    assert seen == ["src/a.js", "src/b.js"]
+
+
+def test_strip_matches_parsing_the_stripped_text():
+    text = "\n   \n" + RESPONSE + "How to fix:\nlast line   \n\n\n"
+    expected = _parse_model_response_to_struct(text.strip())
+    for size in (1, 4, len(text)):
+        assert _feed(text, size, strip=True).close() == expected
+
+
+def test_response_without_sections_keeps_raw_only():
+    assert _parse_model_response_to_struct("  no structure here \n") == {
+        "code_change": {}, "root": "", "fix": "", "raw": "no structure here",
+    }
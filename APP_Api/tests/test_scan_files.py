@@ -0,0 +1,68 @@
+# filename: test_scan_files.py
+import pytest
+
+from find_func import MERGED_KEY, collect_context, iter_scan_files, scan_files, symbol_out_path
+
+
+@pytest.fixture
+def project(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    # Farklı boyutlar: paralel işçiler farklı sırada bitirir
+    for i in range(24):
+        body = "x = 1;\n" * (i * 37 % 200)
+        uses = ["alpha"] if i % 3 else ["alpha", "beta"]
+        if i % 5 == 0:
+            uses = []
+        calls = "".join(f"{u}(); // {u} çağrısı\n" for u in uses)
+        (src / f"f{i:02d}.js").write_text(f"// dosya {i}\n{body}{calls}")
+    return tmp_path
+
+
+def _paths(project):
+    return sorted((project / "src").glob("*.js"))
+
+
+# ---------- Sıra ve eşdeğerlik ----------
+@pytest.mark.parametrize("merge", [True, False])
+def test_parallel_scan_matches_serial_and_keeps_path_order(project, merge):
+    paths = _paths(project)
+    serial = scan_files(paths, ["alpha", "beta"], workers=None, merge=merge)
+    parallel = scan_files(paths, ["alpha", "beta"], workers=3, merge=merge)
+    assert parallel == serial
+    found = [p for p, _ in parallel]
+    assert found == [p for p in paths if p in set(found)]
+    assert len(found) == 24 - 5  # f00, f05, f10, f15, f20 eşleşmez
+
+
+def test_scan_returns_one_entry_per_matched_symbol(project):
+    res = dict(scan_files(_paths(project), ["alpha", "beta"], merge=False))
+    assert set(res[project / "src" / "f03.js"]) == {"alpha", "beta"}
+    assert set(res[project / "src" / "f01.js"]) == {"alpha"}
+    merged = dict(scan_files(_paths(project), ["alpha", "beta"]))
+    assert list(merged[project / "src" / "f03.js"]) == [MERGED_KEY]
+    assert "// dosya" not in merged[project / "src" / "f03.js"][MERGED_KEY]
+
+
+def test_iter_scan_is_lazy(project):
+    it = iter_scan_files(_paths(project), "alpha")
+    first_path, _ = next(it)
+    assert first_path.name == "f01.js"
+
+
+def test_collect_context_output_is_identical_across_worker_counts(project, tmp_path):
+    outputs = []
+    for workers in (None, 0, 4):
+        out = tmp_path / f"out_{workers}" / "ctx.txt"
+        out.parent.mkdir()
+        assert collect_context(project, ["alpha", "beta"], out, workers=workers) == 19
+        outputs.append(out.read_text())
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+def test_collect_context_per_symbol_files(project, tmp_path):
+    out = tmp_path / "per" / "ctx.txt"
+    out.parent.mkdir()
+    collect_context(project, ["alpha", "beta"], out, workers=2, merge=False)
+    beta = symbol_out_path(out, "beta").read_text()
+    assert beta.count(">>> ") == 6  # f03, f06, f09, f12, f18, f21
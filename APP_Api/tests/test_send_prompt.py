@@ -0,0 +1,42 @@
+# filename: test_send_prompt.py
+import pytest
+
+import python_api
+from python_api import _classify_failure, send_prompt
+
+
+def _curl(monkeypatch, exit_status, out, err=""):
+    monkeypatch.setattr(python_api, "run_remote", lambda *a, **k: (exit_status, out, err))
+    return send_prompt(object(), "prompt", transport="curl")
+
+
+# ---------- curl: hata gövdesi ----------
+def test_curl_success_strips_status_line(monkeypatch):
+    res = _curl(monkeypatch, 0, '{"response": "tamam", "done": true}\n200')
+    assert res["ok"] and res["text"] == "tamam" and res["failure"] is None
+
+
+@pytest.mark.parametrize("status, retryable", [(404, False), (400, False), (503, True), (429, True)])
+def test_curl_error_body_is_http_failure(monkeypatch, status, retryable):
+    res = _curl(monkeypatch, 0, f'{{"error": "model \'x\' not found"}}\n{status}')
+    assert not res["ok"]
+    assert res["failure"]["kind"] == "http" and res["failure"]["status"] == status
+    assert _classify_failure(res) == ("http", retryable)
+    assert "not found" in res["stderr"]
+
+
+def test_curl_error_body_with_200_is_not_empty(monkeypatch):
+    res = _curl(monkeypatch, 0, '{"error": "bozuk istek"}\n200')
+    assert _classify_failure(res) == ("error", False)
+    assert res["stderr"] == "bozuk istek"
+
+
+def test_curl_connection_failure_is_unavailable(monkeypatch):
+    res = _curl(monkeypatch, 7, "\n000", "connection refused")
+    assert not res["ok"] and res["text"] == ""
+    assert _classify_failure(res) == ("unavailable", True)
+
+
+def test_curl_empty_body_is_still_empty(monkeypatch):
+    res = _curl(monkeypatch, 0, '{"response": "", "done": true}\n200')
+    assert _classify_failure(res) == ("empty", True)
@@ -0,0 +1,99 @@
+# filename: test_session_registry.py
+import json
+
+from session_registry import RECENT_SESSIONS, SessionRegistry
+
+
+def _append_raw(reg, text):
+    """Başka bir sürecin jsonl'a doğrudan eklemesi (head güncellenmeden)."""
+    with open(reg.log_path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_status_updates_merge_into_one_session(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "started", path=tmp_path / "analysis_1", fingerprints=["f2", "f1"])
+    reg.record("analysis_1", "analyzed", files=2, endpoint=None)
+    latest = reg.latest()
+    assert latest["status"] == "analyzed"
+    assert latest["path"] == str(tmp_path / "analysis_1")
+    assert latest["fingerprints"] == ["f1", "f2"]
+    assert latest["files"] == 2 and "endpoint" not in latest
+    assert reg.latest(successful=True)["session"] == "analysis_1"
+
+
+def test_latest_ok_skips_failed_sessions(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed")
+    reg.record("analysis_2", "failed")
+    assert reg.latest()["session"] == "analysis_2"
+    assert reg.latest(successful=True)["session"] == "analysis_1"
+
+
+def test_by_fingerprint_keeps_newest_session(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_2", "analyzed", fingerprints=["f"])
+    reg.record("analysis_1", "analyzed", fingerprints=["f"])  # geç gelen eski oturum
+    assert reg.by_fingerprint("f") == "analysis_2"
+    assert reg.by_fingerprint("missing") is None
+
+
+def test_head_catches_up_with_lines_appended_elsewhere(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed")
+    _append_raw(reg, json.dumps({"session": "analysis_2", "status": "analyzed", "ts": 0}) + "\n")
+    head = reg.head()
+    assert head["latest"]["session"] == "analysis_2"
+    assert head["offset"] == reg.log_path.stat().st_size
+    saved = json.loads(reg.head_path.read_text(encoding="utf-8"))
+    assert saved["offset"] == head["offset"]
+
+
+def test_half_written_line_waits_for_its_newline(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed")
+    line = json.dumps({"session": "analysis_2", "status": "analyzed", "ts": 0})
+    _append_raw(reg, line[:10])
+    assert reg.latest()["session"] == "analysis_1"
+    _append_raw(reg, line[10:] + "\n")
+    assert reg.latest()["session"] == "analysis_2"
+
+
+def test_corrupt_lines_are_skipped(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed")
+    _append_raw(reg, "not json\n" + json.dumps({"status": "x"}) + "\n")
+    reg.record("analysis_2", "analyzed")
+    assert reg.latest()["session"] == "analysis_2"
+    assert reg.head()["offset"] == reg.log_path.stat().st_size
+
+
+def test_shrunken_log_rebuilds_head(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed", fingerprints=["f"])
+    reg.record("analysis_2", "analyzed")
+    reg.log_path.write_text(
+        json.dumps({"session": "analysis_0", "status": "failed", "ts": 0}) + "\n",
+        encoding="utf-8",
+    )
+    head = reg.head()
+    assert head["latest"]["session"] == "analysis_0"
+    assert head["latest_ok"] is None and head["by_fingerprint"] == {}
+
+
+def test_recent_sessions_are_bounded(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    for i in range(RECENT_SESSIONS + 5):
+        reg.record(f"analysis_{i:03d}", "analyzed")
+    recent = reg.head()["recent"]
+    assert len(recent) == RECENT_SESSIONS
+    assert next(iter(recent)) == "analysis_005"
+
+
+def test_missing_or_stale_head_is_rebuilt_from_log(tmp_path):
+    reg = SessionRegistry(tmp_path)
+    reg.record("analysis_1", "analyzed")
+    reg.head_path.unlink()
+    assert SessionRegistry(tmp_path).latest()["session"] == "analysis_1"
+    reg.head_path.write_text('{"version": 0}', encoding="utf-8")
+    assert SessionRegistry(tmp_path).latest()["session"] == "analysis_1"
@@ -0,0 +1,157 @@
+# filename: test_sourcemap.py
+import json
+import os
+
+import pytest
+
+import sourcemap
+from sourcemap import (
+    SourceMap,
+    SourceMapResolver,
+    decode_vlq_segment,
+    get_source_map_resolver,
+    load_source_map,
+    prune_map_cache,
+)
+
+# gen 1:1 → a.js 1:1; gen 1:3 → a.js 1:3 (isim "foo"); gen 2:1 → a.js 2:3
+MAP = {
+    "version": 3,
+    "sources": ["webpack://app/./src/a.js"],
+    "names": ["foo"],
+    "mappings": "AAAA,EAAEA;AACA",
+}
+
+
+@pytest.mark.parametrize(
+    "segment, expected",
+    [
+        ("A", [0]),
+        ("C", [1]),
+        ("D", [-1]),
+        ("gB", [16]),
+        ("hB", [-16]),
+        ("6B", [29]),
+        ("AAAA", [0, 0, 0, 0]),
+        ("EAAEA", [2, 0, 0, 2, 0]),
+    ],
+)
+def test_decode_vlq_segment(segment, expected):
+    assert decode_vlq_segment(segment) == expected
+
+
+def test_lookup_uses_nearest_preceding_mapping_on_the_same_line():
+    sm = SourceMap.from_json(MAP)
+    src = "webpack://app/./src/a.js"
+    assert sm.lookup(1, 1) == (src, 1, 1, None)
+    assert sm.lookup(1, 2) == (src, 1, 1, None)
+    assert sm.lookup(1, 3) == (src, 1, 3, "foo")
+    assert sm.lookup(1, 99) == (src, 1, 3, "foo")
+    assert sm.lookup(2, 5) == (src, 2, 3, None)
+    assert sm.lookup(3, 1) is None
+
+
+def test_unordered_segments_are_sorted():
+    # gen sütun 3 (→ orig 3), ardından gen sütun 2 (→ orig 2)
+    sm = SourceMap.from_json(dict(MAP, mappings="GAAGA,DAADA"))
+    assert list(sm.keys) == sorted(sm.keys)
+    assert sm.lookup(1, 1) is None
+    assert sm.lookup(1, 3)[1:3] == (1, 3)
+    assert sm.lookup(1, 4)[1:3] == (1, 4)
+
+
+def test_source_root_is_prefixed():
+    sm = SourceMap.from_json(dict(MAP, sourceRoot="/base/", sources=["x.js", "http://h/y.js"]))
+    assert sm.sources == ["/base/x.js", "http://h/y.js"]
+
+
+def test_sectioned_maps_are_rejected():
+    with pytest.raises(ValueError):
+        SourceMap.from_json({"version": 3, "sections": []})
+
+
+def test_dump_load_roundtrip(tmp_path):
+    sm = SourceMap.from_json(MAP)
+    sm.dump(tmp_path / "m.smc")
+    loaded = SourceMap.load(tmp_path / "m.smc")
+    for line, col in [(1, 1), (1, 3), (2, 4), (5, 1)]:
+        assert loaded.lookup(line, col) == sm.lookup(line, col)
+
+
+def test_load_source_map_writes_disk_cache(tmp_path):
+    data = json.dumps(dict(MAP, file="cache-test.js")).encode()
+    sm = load_source_map(data, tmp_path)
+    assert len(list(tmp_path.glob("*.smc"))) == 1
+    assert load_source_map(data, tmp_path) is sm
+
+
+# ---------- Önbellek sınırları (--loop'ta hot-update hash'leri birikir) ----------
+def test_decoded_maps_are_lru_bounded(monkeypatch):
+    monkeypatch.setattr(sourcemap, "MAX_DECODED_MAPS", 3)
+    monkeypatch.setattr(sourcemap, "_DECODED", sourcemap.OrderedDict())
+    blobs = [json.dumps(dict(MAP, file=f"h{i}.js")).encode() for i in range(5)]
+    first = load_source_map(blobs[0])
+    for data in blobs[1:3]:
+        load_source_map(data)
+    assert load_source_map(blobs[0]) is first  # kullanım sıranın sonuna taşır
+    for data in blobs[3:]:
+        load_source_map(data)
+    assert len(sourcemap._DECODED) == 3
+    assert load_source_map(blobs[0]) is first
+
+
+def test_disk_cache_keeps_most_recently_used(tmp_path):
+    for i in range(4):
+        (tmp_path / f"{i}.smc").write_bytes(b"")
+        os.utime(tmp_path / f"{i}.smc", ns=(0, i * 10**9))
+    assert prune_map_cache(tmp_path, keep=2) == 2
+    assert sorted(p.name for p in tmp_path.glob("*.smc")) == ["2.smc", "3.smc"]
+    assert prune_map_cache(tmp_path, keep=2) == 0
+
+
+def test_remote_maps_are_lru_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(sourcemap, "MAX_MAP_URLS", 2)
+    r = SourceMapResolver(tmp_path, fetch_remote=True)
+    monkeypatch.setattr(r, "_remote_map_bytes", lambda url: None)
+    for h in ("a1", "b2", "c3"):
+        r.map_for_url(f"http://localhost:3000/main.{h}.hot-update.js")
+    assert [u.split(".")[1] for u in r._remote] == ["b2", "c3"]
+
+
+def _project(tmp_path, mappings=MAP["mappings"]):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.js").write_text("a\nb\n")
+    js_dir = tmp_path / "build" / "static" / "js"
+    js_dir.mkdir(parents=True)
+    (js_dir / "main.abc123.js").write_text("x\n//# sourceMappingURL=main.abc123.js.map\n")
+    (js_dir / "main.abc123.js.map").write_text(json.dumps(dict(MAP, mappings=mappings)))
+    return js_dir / "main.abc123.js.map"
+
+
+def test_resolver_maps_bundle_frame_to_project_file(tmp_path):
+    _project(tmp_path)
+    r = SourceMapResolver(tmp_path)
+    hit = r.resolve("http://localhost:3000/static/js/main.abc123.js", 2, 1)
+    assert hit == (tmp_path / "src" / "a.js", 2, 3)
+    assert r.resolve("http://localhost:3000/static/js/missing.js", 1, 1) is None
+
+
+def test_resolver_reloads_map_only_when_file_changes(tmp_path):
+    map_path = _project(tmp_path)
+    r = SourceMapResolver(tmp_path)
+    url = "http://localhost:3000/static/js/main.abc123.js"
+    first = r.map_for_url(url)
+    assert r.map_for_url(url) is first
+
+    map_path.write_text(json.dumps(dict(MAP, mappings="AAAA;;AAEA")))
+    st = map_path.stat()
+    os.utime(map_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    second = r.map_for_url(url)
+    assert second is not first
+    assert r.resolve(url, 3, 1) == (tmp_path / "src" / "a.js", 3, 1)
+
+
+def test_get_source_map_resolver_is_shared_per_project(tmp_path):
+    a = get_source_map_resolver(tmp_path)
+    assert get_source_map_resolver(tmp_path) is a
+    assert get_source_map_resolver(tmp_path, fetch_remote=True) is not a
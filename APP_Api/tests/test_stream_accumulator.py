@@ -0,0 +1,69 @@
+# filename: test_stream_accumulator.py
+import time
+
+from python_api import StreamAccumulator, _classify_failure
+
+
+def _chunks(text, size=4):
+    return [{"response": text[i:i + size], "done": False} for i in range(0, len(text), size)]
+
+
+def _run(chunks, error=None, **kwargs):
+    acc = StreamAccumulator(**kwargs)
+    for chunk in chunks:
+        if acc.feed(chunk):
+            break
+    if error is not None:
+        acc.fail(error)
+    return acc.result()
+
+
+def test_complete_stream_is_ok():
+    res = _run(_chunks("UPDATED FILES\nx\n") + [{"done": True, "eval_count": 3}])
+    assert res["ok"] and res["failure"] is None
+    assert res["text"] == "UPDATED FILES\nx"
+
+
+def test_connection_drop_mid_stream_is_a_retryable_failure():
+    res = _run(_chunks("UPDATED FILES\nsrc/a.js\nconst a"), error=ConnectionResetError("reset"))
+    assert not res["ok"]
+    assert res["failure"]["kind"] == "unavailable" and res["failure"]["retryable"]
+    assert res["stderr"].startswith("ConnectionResetError")
+    assert _classify_failure(res) == ("unavailable", True)
+
+
+def test_unexpected_exception_mid_stream_is_still_retryable():
+    res = _run(_chunks("partial text"), error=RuntimeError("boom"))
+    assert not res["ok"]
+    assert res["failure"]["kind"] == "error" and res["failure"]["retryable"]
+
+
+def test_stream_closed_without_done_is_truncated():
+    res = _run(_chunks("partial text"))
+    assert not res["ok"]
+    assert res["failure"]["kind"] == "unavailable" and res["failure"]["retryable"]
+
+
+def test_error_line_mid_stream_fails_the_result():
+    res = _run(_chunks("partial") + [{"error": "model runner crashed"}])
+    assert not res["ok"] and res["stderr"] == "model runner crashed"
+
+
+def test_stop_when_cancel_is_ok_even_if_the_close_raises():
+    chunks = _chunks("How to fix:\nall good\ntrailing half", size=100)
+    res = _run(chunks, error=ConnectionResetError("closed"), stop_when=lambda t: "good\n" in t)
+    assert res["ok"] and res["failure"] is None
+    assert res["text"] == "How to fix:\nall good"
+    assert res["stream"]["cancelled"]
+
+
+def test_deadline_is_not_retryable():
+    res = _run(_chunks("some text\n"), deadline_at=time.monotonic() - 1)
+    assert not res["ok"]
+    assert res["failure"]["kind"] == "deadline" and not res["failure"]["retryable"]
+
+
+def test_empty_done_stream_is_classified_empty():
+    res = _run([{"response": "", "done": True}])
+    assert not res["ok"] and res["failure"] is None
+    assert _classify_failure(res) == ("empty", True)
@@ -0,0 +1,58 @@
+# filename: test_strip_comments.py
+import random
+
+import pytest
+
+from bench_strip import legacy_strip_js_like_comments_and_tighten
+from find_func import (
+    mask_js_comments_and_strings,
+    strip_js_like_comments,
+    strip_js_like_comments_and_tighten,
+)
+
+CASES = [
+    "const a = 1; // yorum\nconst b = 2;\n",
+    "/* çok\nsatırlı */ x();\n",
+    "const s = 'a // değil yorum';\nconst t = \"/* bu da */\";\n",
+    "const u = `şablon ${x} // içeride`;\n",
+    "const e = 'kaçış \\' // hâlâ string';\n",
+    "const f = \"ters bölü \\\\\"; // yorum\n",
+    "a(); /* kapanmamış yorum\nb();\n",
+    "const k = 'kapanmamış string\nc(); // yorum\n",
+    "x = y / z; // bölme\n",
+    "\n\n\n  a();   \n\n\n\nb();\t\n",
+    "",
+]
+
+
+# ---------- Eski döngüyle eşdeğerlik ----------
+@pytest.mark.parametrize("text", CASES)
+def test_tokenizer_matches_legacy_stripper(text):
+    assert strip_js_like_comments_and_tighten(text) == legacy_strip_js_like_comments_and_tighten(text)
+
+
+def test_tokenizer_matches_legacy_stripper_on_random_input():
+    rng = random.Random(1234)
+    alphabet = "/*'\"`\\\n ax"
+    for _ in range(3000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert strip_js_like_comments_and_tighten(text) == legacy_strip_js_like_comments_and_tighten(
+            text
+        ), repr(text)
+
+
+# ---------- Diğer modlar ----------
+def test_without_tighten_only_comments_go():
+    text = "a();   // x\n\n\n\nb(); /* y */  \n"
+    assert strip_js_like_comments_and_tighten(text, tighten=False) == "a();   \n\n\n\nb();   \n"
+    assert strip_js_like_comments(text) == "a();   \n\n\n\nb();   \n"
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_mask_keeps_offsets_and_newlines(text):
+    masked = mask_js_comments_and_strings(text)
+    assert len(masked) == len(text)
+    assert [i for i, c in enumerate(masked) if c == "\n"] == [
+        i for i, c in enumerate(text) if c == "\n"
+    ]
+    assert "yorum" not in masked and "değil" not in masked
@@ -0,0 +1,88 @@
+# filename: test_symbol_index.py
+import os
+
+import pytest
+
+from find_func import DEFAULT_EXTS, contains_target_symbol, find_files_with_index, iter_files
+from symbol_index import SymbolIndex, extract_identifiers, is_indexable_symbol
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "app"
+    (root / "src" / "components").mkdir(parents=True)
+    (root / "node_modules" / "lib").mkdir(parents=True)
+    (root / "src" / "a.js").write_text("export function handleLogging() {}\n")
+    (root / "src" / "components" / "B.jsx").write_text("const other = 1;\n")
+    (root / "node_modules" / "lib" / "x.js").write_text("handleLogging();\n")
+    return root
+
+
+def _plain_scan(root, target):
+    return sorted(
+        (p for p in iter_files(root, DEFAULT_EXTS)
+         if contains_target_symbol(p.read_text(encoding="utf-8"), target)),
+        key=lambda p: p.as_posix(),
+    )
+
+
+def _bump_mtime(path):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_lookup_matches_plain_scan(project, tmp_path):
+    index = tmp_path / "index.db"
+    assert find_files_with_index(project, "handleLogging", index) == [project / "src" / "a.js"]
+    assert find_files_with_index(project, "handleLogging", index) == _plain_scan(project, "handleLogging")
+
+
+def test_in_place_edit_is_seen_on_next_refresh(project, tmp_path):
+    index = tmp_path / "index.db"
+    b = project / "src" / "components" / "B.jsx"
+    assert find_files_with_index(project, "handleLogging", index) == [project / "src" / "a.js"]
+    dir_mtime = b.parent.stat().st_mtime_ns
+
+    with open(b, "a", encoding="utf-8") as f:  # klasör mtime'ı değişmez
+        f.write("handleLogging();\n")
+    _bump_mtime(b)
+    assert b.parent.stat().st_mtime_ns == dir_mtime
+    expected = [project / "src" / "a.js", b]
+    assert find_files_with_index(project, "handleLogging", index) == expected
+    assert _plain_scan(project, "handleLogging") == expected
+
+
+def test_add_rename_and_delete_are_reconciled(project, tmp_path):
+    index = tmp_path / "index.db"
+    find_files_with_index(project, "handleLogging", index)
+    (project / "src" / "new.ts").write_text("handleLogging();\n")
+    (project / "src" / "a.js").rename(project / "src" / "renamed.js")
+    assert find_files_with_index(project, "handleLogging", index) == [
+        project / "src" / "new.ts", project / "src" / "renamed.js",
+    ]
+    (project / "src" / "new.ts").unlink()
+    assert find_files_with_index(project, "handleLogging", index) == [project / "src" / "renamed.js"]
+
+
+def test_touch_without_content_change_skips_tokenizing(project, tmp_path):
+    idx = SymbolIndex.open(tmp_path / "index.db", project, DEFAULT_EXTS, {"node_modules"})
+    idx.refresh()
+    _bump_mtime(project / "src" / "a.js")
+    assert idx.refresh() == (0, 0)
+    (project / "src" / "a.js").write_text("export function renamedFn() {}\n")
+    _bump_mtime(project / "src" / "a.js")
+    assert idx.refresh() == (1, 0)
+    assert idx.lookup("handleLogging") == []
+    assert idx.lookup("renamedFn") == [project / "src" / "a.js"]
+    idx.close()
+
+
+def test_legacy_or_corrupt_index_file_is_rebuilt(project, tmp_path):
+    index = tmp_path / "index.db"
+    index.write_text('{"version": 1, "files": {}}')
+    assert find_files_with_index(project, "handleLogging", index) == [project / "src" / "a.js"]
+
+
+def test_identifier_helpers():
+    assert extract_identifiers("a1 = b_2(3x) // $c") == {"a1", "b_2", "c"}
+    assert is_indexable_symbol("handleLogging") and not is_indexable_symbol("$el")
@@ -1,184 +1,61 @@
 # filename: collect_ctx.py
-import os
+import sys
 from pathlib import Path
-from typing import Iterable, List, Set
-
-# ---------- Ayarlar ----------
-DEFAULT_EXTS = (".js", ".jsx", ".ts", ".tsx")
-SKIP_DIRS: Set[str] = {
-    "node_modules",
-    ".git",
-    ".hg",
-    ".svn",
-    ".idea",
-    ".vscode",
-    "dist",
-    "build",
-    "out",
-    "coverage",
-    ".next",
-    ".turbo",
-    ".cache",
-}
-HEADER_PREFIX = ">>> "  # Dosya bölüm başlığı
-
-
-# ---------- Yardımcılar ----------
-def iter_files(project_root: Path, exts: Iterable[str]) -> Iterable[Path]:
-    for root, dirs, files in os.walk(project_root):
-        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
-        for fn in files:
-            if any(fn.endswith(ext) for ext in exts):
-                yield Path(root) / fn
-
-
-def read_text_safely(p: Path) -> str:
-    try:
-        return p.read_text(encoding="utf-8", errors="ignore")
-    except Exception:
-        return ""
+from typing import List, Optional, Tuple
+
+# Tarama/temizleme motoru APP_Api/find_func.py ile ortak (iki kopya ayrışmasın)
+APP_API_DIR = Path(__file__).resolve().parent.parent / "APP_Api"
+if str(APP_API_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_API_DIR))
+
+from find_func import (  # APP_Api içinde; eski API için yeniden dışa aktarılır
+    DEFAULT_EXTS,
+    MERGED_KEY,
+    SKIP_DIRS,
+    contains_target_symbol,
+    iter_files,
+    iter_scan_files,
+    normalize_rel_path,
+    read_text_safely,
+    strip_js_like_comments_and_tighten,
+)
 
-
-def contains_target_symbol(text: str, target: str) -> bool:
-    import re
-
-    rx = re.compile(rf"\b{re.escape(target)}\b")
-    return rx.search(text) is not None
-
-
-def normalize_rel_path(p: Path, root: Path) -> str:
-    return p.relative_to(root).as_posix()
+HEADER_PREFIX = ">>> "  # Dosya bölüm başlığı
 
 
-# ---------- JS/TS temizleyici ----------
-def strip_js_like_comments_and_tighten(text: str) -> str:
+# ---------- Paralel tarama ----------
+def scan_files(
+    paths: List[Path], target: str, workers: Optional[int] = None
+) -> List[Tuple[Path, str]]:
     """
-    - // ve /* */ yorumlarını kaldırır
-    - string (' " `) içerikleri korur (kaçışlarla birlikte)
-    - satır sonu boşluklarını siler, 2+ boş satırı teke indirir
+    (path, cleaned) listesi döner; sıra `paths` ile aynıdır (deterministik).
+    workers: None/1 → seri, 0 → CPU sayısı kadar, N → N süreçlik havuz.
     """
-    n = len(text)
-    i = 0
-    out: List[str] = []
-    in_sl_comment = in_ml_comment = in_s = in_d = in_bt = False
-    escape = False
-
-    while i < n:
-        ch = text[i]
-        nxt = text[i + 1] if i + 1 < n else ""
-
-        if in_sl_comment:
-            if ch == "\n":
-                in_sl_comment = False
-                out.append(ch)
-            i += 1
-            continue
-
-        if in_ml_comment:
-            if ch == "*" and nxt == "/":
-                in_ml_comment = False
-                i += 2
-            else:
-                i += 1
-            continue
-
-        if in_s:
-            out.append(ch)
-            if not escape and ch == "'":
-                in_s = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
-
-        if in_d:
-            out.append(ch)
-            if not escape and ch == '"':
-                in_d = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
-
-        if in_bt:
-            out.append(ch)
-            if not escape and ch == "`":
-                in_bt = False
-            escape = ch == "\\" and not escape
-            i += 1
-            continue
-
-        if ch == "/" and nxt:
-            if nxt == "/":
-                in_sl_comment = True
-                i += 2
-                continue
-            if nxt == "*":
-                in_ml_comment = True
-                i += 2
-                continue
-
-        if ch == "'":
-            in_s = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
-
-        if ch == '"':
-            in_d = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
-
-        if ch == "`":
-            in_bt = True
-            out.append(ch)
-            escape = False
-            i += 1
-            continue
-
-        out.append(ch)
-        i += 1
-
-    raw = "".join(out)
-    lines = [ln.rstrip() for ln in raw.splitlines()]
-    tightened = []
-    blank = False
-    for ln in lines:
-        if ln == "":
-            if not blank:
-                tightened.append("")
-                blank = True
-        else:
-            tightened.append(ln)
-            blank = False
-    return "\n".join(tightened).strip() + "\n"
+    return [(p, res[MERGED_KEY]) for p, res in iter_scan_files(paths, [target], workers)]
 
 
 # ---------- Ana İş ----------
 def collect_context(
-    project_root: Path, target: str, out_path: Path, exts=DEFAULT_EXTS
+    project_root: Path,
+    target: str,
+    out_path: Path,
+    exts=DEFAULT_EXTS,
+    workers: Optional[int] = None,
 ) -> int:
-    files = []
-    for p in iter_files(project_root, exts):
-        text = read_text_safely(p)
-        if text and contains_target_symbol(text, target):
-            files.append(p)
-    files.sort(key=lambda x: x.as_posix())
+    candidates = sorted(iter_files(project_root, exts), key=lambda x: x.as_posix())
+    found = scan_files(candidates, target, workers=workers)
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if not files:
+    if not found:
         out_path.write_text("", encoding="utf-8")
         return 0
 
     chunks: List[str] = []
-    for i, p in enumerate(files, start=1):
+    for i, (p, cleaned) in enumerate(found, start=1):
         rel = normalize_rel_path(p, project_root)
         base = p.name
         ext = p.suffix or ".txt"
-        code = read_text_safely(p)
-        cleaned = strip_js_like_comments_and_tighten(code)
         total_lines = cleaned.count("\n") if cleaned else 0
         header_name = f"{i:03d}__{base}__ALL__L1-{total_lines}.ctx{ext}"
         # Önceki kalıp + relative path’i parantez içinde göster
@@ -187,7 +64,7 @@ def collect_context(
 
     merged = "\n".join(chunks).strip() + "\n"
     out_path.write_text(merged, encoding="utf-8")
-    return len(files)
+    return len(found)
 
 
 # ---------- Etkileşimli CLI ----------